@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Admission Control
+Sheds low-priority requests with 503 before a saturated worker queues them into timeouts
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+from werkzeug.wsgi import ClosingIterator
+
+from metrics import Counter, Gauge, Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_CRITICAL = 'critical'
+PRIORITY_NORMAL = 'normal'
+PRIORITY_LOW = 'low'
+
+# Share of the in-flight limit each priority may fill, and the longest upstream queue
+# wait (seconds) it still accepts; critical requests are always admitted
+ADMISSION_LIMITS = {
+    PRIORITY_LOW: (0.5, 0.5),
+    PRIORITY_NORMAL: (0.85, 2.0)
+}
+RETRY_AFTER_SECONDS = 2
+
+CRITICAL_PREFIXES = ('/health', '/metrics', '/admin/login', '/admin/logout')
+LOW_PRIORITY_PATHS = ('/', '/admin/dashboard')
+LOW_PRIORITY_PREFIXES = ('/api/platform/', '/api/analytics/', '/api/reports/')
+
+def default_max_in_flight():
+    """Concurrent requests one worker can serve, from the gunicorn settings in the environment.
+
+    A sync worker serves one request at a time and finds nothing in flight when the next
+    one arrives, so it can only shed by queue wait (X-Request-Start), never by in-flight count.
+    """
+    if 'ADMISSION_MAX_IN_FLIGHT' in os.environ:
+        return int(os.environ['ADMISSION_MAX_IN_FLIGHT'])
+    worker_class = os.environ.get('GUNICORN_WORKER_CLASS')
+    if worker_class == 'gevent':
+        return int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+    if worker_class == 'sync':
+        return 1
+    return int(os.environ.get('GUNICORN_THREADS', 8))
+
+def classify_priority(path, method):
+    """Admission priority: probes, login and bookings are critical; pages and reports are low"""
+    if path.startswith(CRITICAL_PREFIXES):
+        return PRIORITY_CRITICAL
+    if path.startswith('/api/reservations') and method not in ('GET', 'HEAD'):
+        return PRIORITY_CRITICAL
+    if path in LOW_PRIORITY_PATHS or path.startswith(LOW_PRIORITY_PREFIXES):
+        return PRIORITY_LOW
+    return PRIORITY_NORMAL
+
+def queue_wait(environ, now=None):
+    """Seconds the request waited before reaching the app, from the proxy's X-Request-Start header"""
+    header = environ.get('HTTP_X_REQUEST_START')
+    if not header:
+        return None
+    try:
+        started = float(header[2:] if header.startswith('t=') else header)
+    except ValueError:
+        return None
+    # Proxies send seconds, milliseconds or microseconds since the epoch
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    return max(0.0, (now or time.time()) - started)
+
+class AdmissionMiddleware:
+    """WSGI middleware that tracks in-flight requests and sheds by priority.
+
+    Requests are rejected with 503 and Retry-After when their priority's share of the
+    in-flight limit is used up, or when they already waited longer than it tolerates
+    in front of the worker. Shedding happens before routing, sessions and tenant lookup.
+    A request stays in flight until the server closes its response iterable.
+    """
+
+    def __init__(self, wsgi_app, max_in_flight=None, limits=ADMISSION_LIMITS, metrics=registry):
+        self.app = wsgi_app
+        self.max_in_flight = max_in_flight or default_max_in_flight()
+        self.limits = limits
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self.shed = Counter('ybh_admission_shed_total', 'Requests rejected by admission control', ('priority', 'reason'))
+        self.admitted = Counter('ybh_admission_admitted_total', 'Requests admitted', ('priority',))
+        self.waits = Histogram(
+            'ybh_admission_queue_wait_seconds', 'Wait in front of the worker (X-Request-Start)', ('priority',)
+        )
+        for metric in (self.shed, self.admitted, self.waits,
+                       Gauge('ybh_admission_in_flight', 'Requests being served by this worker', lambda: self.in_flight)):
+            metrics.register(metric)
+
+    def _reject(self, start_response, priority, reason):
+        self.shed.inc((priority, reason))
+        body = json.dumps({'error': 'Server is busy, retry shortly', 'priority': priority}).encode()
+        start_response('503 Service Unavailable', [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('Retry-After', str(RETRY_AFTER_SECONDS))
+        ])
+        return [body]
+
+    def __call__(self, environ, start_response):
+        priority = classify_priority(environ.get('PATH_INFO', ''), environ.get('REQUEST_METHOD', 'GET'))
+        waited = queue_wait(environ)
+        if waited is not None:
+            self.waits.observe(waited, (priority,))
+        reason = None
+        limit = self.limits.get(priority)
+        with self._lock:
+            if limit is not None:
+                share, max_wait = limit
+                if waited is not None and waited > max_wait:
+                    reason = 'queue_wait'
+                elif self.in_flight >= max(1, int(self.max_in_flight * share)):
+                    reason = 'in_flight'
+            if reason is None:
+                self.in_flight += 1
+        if reason is not None:
+            return self._reject(start_response, priority, reason)
+        self.admitted.inc((priority,))
+        try:
+            response = self.app(environ, start_response)
+        except BaseException:
+            self._release()
+            raise
+        return ClosingIterator(response, self._release)
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
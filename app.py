@@ -343,15 +343,23 @@ def create_fallback_app():
     
     return app
 
-# Try to import main comprehensive application
-try:
-    from ultra_comprehensive_system import app as main_app
-    application = main_app
-    print("✅ Ultra Comprehensive System loaded successfully")
-except Exception as e:
-    print(f"⚠️ Main app import failed: {e}")
-    print("🔄 Using comprehensive fallback application")
-    application = create_fallback_app()
+def create_application():
+    """Build the main application; a startup failure stops the boot instead of being hidden"""
+    try:
+        from ultra_comprehensive_system import create_app
+        application = create_app()
+        print("✅ Ultra Comprehensive System loaded successfully")
+        return application
+    except Exception as e:
+        # The marketing-only fallback is opt-in so a broken deploy fails its health check
+        if os.environ.get('ALLOW_FALLBACK_APP', '').lower() != 'true':
+            print(f"❌ Main app failed to start: {e}")
+            raise
+        print(f"⚠️ Main app failed to start: {e}")
+        print("🔄 Using comprehensive fallback application (ALLOW_FALLBACK_APP=true)")
+        return create_fallback_app()
+
+application = create_application()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,1038 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Performance Benchmarks
+Runs each benchmark against a throwaway SQLite database
+
+Usage: python benchmarks.py forecast --hotels 1000
+       python benchmarks.py load --target gunicorn --hotels 200 --save-baseline
+       python benchmarks.py rss --workers 4 --hotels 200
+       python benchmarks.py workers --workers 2 --hotels 100
+       python benchmarks.py reconcile --hotels 400
+       python benchmarks.py dedup --hotels 200 --guests 1000000
+       python benchmarks.py search --hotels 200 --reservations 5000
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import socket
+import argparse
+import tempfile
+import importlib.util
+import subprocess
+import http.client
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baselines.json')
+
+def open_benchmark_database(label):
+    """Point the application at a fresh temporary database and return a connection"""
+    db_dir = tempfile.mkdtemp(prefix=f'ybh_bench_{label}_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    from ultra_comprehensive_system import create_app, get_db_connection
+    create_app()
+    return get_db_connection()
+
+def seed_reservation_history(conn, hotels, reservations_per_hotel, seed=42):
+    """Insert synthetic hotels, room types and a year of reservations"""
+    from synthetic_data import generate_dataset
+
+    return generate_dataset(conn, hotels, reservations_per_hotel, emails_per_hotel=0, seed=seed)['hotel_ids']
+
+def bench_forecast(args):
+    """Nightly demand forecast over all hotels"""
+    conn = open_benchmark_database('forecast')
+    from forecasting import run_nightly_forecast
+
+    started = time.perf_counter()
+    seed_reservation_history(conn, args.hotels, args.reservations)
+    print(f"Seeded {args.hotels} hotels x {args.reservations} reservations in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    written = run_nightly_forecast(conn)
+    elapsed = time.perf_counter() - started
+    conn.close()
+    print(f"Nightly forecast: {written} rows in {elapsed:.1f}s ({args.hotels / elapsed:.0f} hotels/s)")
+    return elapsed
+
+def bench_segmentation(args):
+    """Nightly RFM segmentation over all hotels, then segment membership lookups"""
+    conn = open_benchmark_database('segmentation')
+    from segmentation import SEGMENTS, run_nightly_segmentation, segment_members
+
+    hotel_ids = seed_reservation_history(conn, args.hotels, args.reservations)
+
+    started = time.perf_counter()
+    scored, updated = run_nightly_segmentation(conn)
+    elapsed = time.perf_counter() - started
+    print(f"Nightly segmentation: {scored} customers ({updated} written) in {elapsed:.1f}s "
+          f"({args.hotels / elapsed:.0f} hotels/s)")
+
+    started = time.perf_counter()
+    _, updated = run_nightly_segmentation(conn)
+    print(f"Re-run with unchanged history: {updated} written in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    for hotel_id in hotel_ids[:200]:
+        for segment in SEGMENTS:
+            segment_members(conn, hotel_id, segment)
+    lookups = time.perf_counter() - started
+    conn.close()
+    print(f"Segment member pages: {lookups / (min(len(hotel_ids), 200) * len(SEGMENTS)) * 1000:.2f}ms each")
+    return elapsed
+
+def bench_pricing(args):
+    """Full-horizon repricing plus incremental reprice of single bookings"""
+    conn = open_benchmark_database('pricing')
+    from pricing import run_nightly_repricing, reprice_stay
+
+    seed_reservation_history(conn, args.hotels, args.reservations)
+
+    started = time.perf_counter()
+    written = run_nightly_repricing(conn)
+    elapsed = time.perf_counter() - started
+    print(f"Full repricing: {written} cells in {elapsed:.1f}s")
+
+    stays = conn.execute('''
+        SELECT room_type_id, check_in, check_out FROM reservations
+        WHERE check_in >= date('now') ORDER BY id LIMIT 1000
+    ''').fetchall()
+    started = time.perf_counter()
+    for room_type_id, check_in, check_out in stays:
+        reprice_stay(conn, room_type_id, check_in, check_out)
+    conn.commit()
+    incremental = time.perf_counter() - started
+    conn.close()
+    print(f"Incremental repricing: {len(stays)} bookings in {incremental:.2f}s "
+          f"({incremental / max(len(stays), 1) * 1000:.2f}ms per booking)")
+    return elapsed
+
+def bench_inventory(args):
+    """365-day calendar reads from the inventory store versus scanning reservation rows"""
+    conn = open_benchmark_database('inventory')
+    from inventory import get_calendar, run_nightly_rebuild, sync_reservation
+
+    hotel_ids = seed_reservation_history(conn, args.hotels, args.reservations)
+    started = time.perf_counter()
+    run_nightly_rebuild(conn)
+    print(f"Inventory rebuild: {time.perf_counter() - started:.1f}s")
+
+    sample = hotel_ids[:200]
+    started = time.perf_counter()
+    for hotel_id in sample:
+        get_calendar(conn, hotel_id, days=365)
+    store = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for hotel_id in sample:
+        conn.execute('''
+            WITH RECURSIVE days(d) AS (
+                SELECT date('now') UNION ALL SELECT date(d, '+1 day') FROM days WHERE d < date('now', '+364 day')
+            )
+            SELECT r.room_type_id, days.d, COUNT(*) FROM days
+            JOIN reservations r ON r.check_in <= days.d AND r.check_out > days.d
+            WHERE r.hotel_id = ? AND r.status != 'cancelled'
+            GROUP BY r.room_type_id, days.d
+        ''', (hotel_id,)).fetchall()
+    scan = time.perf_counter() - started
+    print(f"365-day calendar: store {store / len(sample) * 1000:.2f}ms vs row scan "
+          f"{scan / len(sample) * 1000:.2f}ms per hotel")
+
+    stays = conn.execute('''
+        SELECT room_type_id, check_in, check_out, status FROM reservations
+        WHERE check_in >= date('now') ORDER BY id LIMIT 1000
+    ''').fetchall()
+    started = time.perf_counter()
+    for stay in stays:
+        sync_reservation(conn, None, stay)
+    conn.commit()
+    incremental = time.perf_counter() - started
+    conn.close()
+    print(f"Incremental inventory updates: {incremental / max(len(stays), 1) * 1000:.2f}ms per booking")
+    return store
+
+def bench_booking(args):
+    """Concurrent reservation creation: bookings per second and overbooking check"""
+    import threading
+    conn = open_benchmark_database('booking')
+    from ultra_comprehensive_system import get_db_connection
+    from bookings import BookingError, create_reservation
+    from inventory import run_nightly_rebuild
+
+    seed_reservation_history(conn, 5, 0)
+    run_nightly_rebuild(conn)
+    room_types = conn.execute('SELECT id, hotel_id, total_rooms FROM room_types WHERE hotel_id > 1').fetchall()
+    conn.close()
+
+    results = {'booked': 0, 'sold_out': 0, 'replayed': 0}
+    lock = threading.Lock()
+    check_in = date.today() + timedelta(days=30)
+
+    def worker(worker_id):
+        rng = random.Random(worker_id)
+        worker_conn = get_db_connection()
+        for n in range(args.requests // args.threads):
+            room_type_id, hotel_id, _ = rng.choice(room_types)
+            nights = rng.randint(1, 3)
+            offset = rng.randint(0, 6)
+            payload = {
+                'room_type_id': room_type_id,
+                'guest_name': f'Guest {worker_id}-{n}',
+                'guest_email': f'guest{worker_id}-{n}@bench.test',
+                'check_in': (check_in + timedelta(days=offset)).isoformat(),
+                'check_out': (check_in + timedelta(days=offset + nights)).isoformat()
+            }
+            # Every fifth request is a client retry of the previous one
+            key = f'{worker_id}-{n - (n % 5 == 4)}'
+            if n % 5 == 4:
+                payload = previous
+            try:
+                _, replayed = create_reservation(worker_conn, hotel_id, payload, key)
+                outcome = 'replayed' if replayed else 'booked'
+            except BookingError:
+                outcome = 'sold_out'
+            previous = payload
+            with lock:
+                results[outcome] += 1
+        worker_conn.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    conn = get_db_connection()
+    overbooked = 0
+    for room_type_id, _, total_rooms in room_types:
+        for offset in range(10):
+            night = (check_in + timedelta(days=offset)).isoformat()
+            sold = conn.execute('''
+                SELECT COUNT(*) FROM reservations
+                WHERE room_type_id = ? AND check_in <= ? AND check_out > ? AND status != 'cancelled'
+            ''', (room_type_id, night, night)).fetchone()[0]
+            overbooked += sold > total_rooms
+    conn.close()
+    total = sum(results.values())
+    print(f"{total} requests on {args.threads} threads in {elapsed:.2f}s ({total / elapsed:.0f} req/s): "
+          f"{results['booked']} booked, {results['sold_out']} rejected, {results['replayed']} replayed")
+    print(f"Overbooked room-nights: {overbooked}")
+    return elapsed
+
+def bench_ledger(args):
+    """Month-end finance report per hotel: ledger rollup versus a full scan of payments"""
+    conn = open_benchmark_database('ledger')
+    from ledger import ledger_report, month_range
+
+    started = time.perf_counter()
+    hotel_ids = seed_reservation_history(conn, args.hotels, args.reservations)
+    payments = conn.execute('SELECT COUNT(*) FROM payments').fetchone()[0]
+    print(f"Seeded {len(hotel_ids)} hotels, {payments} payments (ledger maintained by triggers) "
+          f"in {time.perf_counter() - started:.1f}s")
+    last_month = date.today().replace(day=1) - timedelta(days=1)
+    first_day, last_day = month_range(last_month.year, last_month.month)
+
+    started = time.perf_counter()
+    for hotel_id in hotel_ids:
+        conn.execute('''
+            SELECT currency, payment_method, payment_provider, COUNT(*), SUM(amount), SUM(fees),
+                   SUM(net_amount), SUM(refund_amount)
+            FROM payments WHERE hotel_id = ? AND date(COALESCE(payment_date, created_at)) BETWEEN ? AND ?
+            GROUP BY 1, 2, 3
+        ''', (hotel_id, first_day.isoformat(), last_day.isoformat())).fetchall()
+    scan = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for hotel_id in hotel_ids:
+        ledger_report(conn, hotel_id, first_day, last_day)
+    elapsed = time.perf_counter() - started
+    conn.close()
+    print(f"{len(hotel_ids)} month-end reports for {first_day:%Y-%m}: ledger {elapsed * 1000:.0f}ms, "
+          f"payments scan {scan * 1000:.0f}ms ({scan / elapsed:.1f}x)")
+    return elapsed
+
+def bench_reconcile(args):
+    """Settlement file reconciliation against pending payments (target: 100k lines in seconds)"""
+    conn = open_benchmark_database('reconcile')
+    from reconciliation import reconcile_file
+
+    seed_reservation_history(conn, args.hotels, args.reservations)
+    conn.execute("UPDATE payments SET status = 'pending'")
+    conn.execute("UPDATE reservations SET payment_status = 'pending' WHERE payment_status = 'paid'")
+    conn.commit()
+
+    # Provider export: mostly clean lines settled T+0..T+3, plus unknown, mistyped and late ones
+    rng = random.Random(7)
+    path = os.path.join(os.path.dirname(os.environ['DATABASE_URL'][len('sqlite:///'):]), 'settlements.csv')
+    payments = conn.execute('''
+        SELECT transaction_id, payment_reference, amount, currency, date(payment_date) FROM payments
+        ORDER BY id LIMIT ?
+    ''', (args.settlements,)).fetchall()
+    with open(path, 'w') as f:
+        f.write('reference,amount,currency,date\n')
+        for transaction_id, reference, amount, currency, paid_on in payments:
+            roll = rng.random()
+            settled_on = date.fromisoformat(paid_on) + timedelta(days=rng.randint(0, 3))
+            if roll < 0.02:
+                transaction_id = reference = f'UNKNOWN-{rng.getrandbits(40):x}'
+            elif roll < 0.03:
+                amount += 0.01
+            elif roll < 0.04:
+                settled_on += timedelta(days=30)
+            f.write(f"{transaction_id if roll < 0.5 else reference},{amount:.2f},{currency},{settled_on}\n")
+    print(f"Seeded {len(payments)} pending payments and a settlement file of as many lines")
+
+    with open(path, 'rb') as f:
+        report = reconcile_file(conn, f)
+    conn.close()
+    elapsed = report['duration_ms'] / 1000
+    print(f"Reconciled {report['lines']} lines in {elapsed:.2f}s ({report['lines'] / elapsed:.0f} lines/s): "
+          f"{report['matched']} matched, {report['payments_completed']} payments completed, "
+          f"{report['reservations_updated']} reservations updated")
+    print(f"Unmatched: {report['unmatched_by_reason']}")
+    return elapsed
+
+def bench_loyalty(args):
+    """Concurrent loyalty earn / burn writes, then balance reads before and after compaction"""
+    import threading
+    conn = open_benchmark_database('loyalty')
+    from ultra_comprehensive_system import get_db_connection
+    from loyalty import LoyaltyError, compact_loyalty, get_balance, record_entry
+
+    seed_reservation_history(conn, min(args.hotels, 50), args.reservations)
+    customers = conn.execute('SELECT id, hotel_id FROM customers').fetchall()
+    results = {'earned': 0, 'burned': 0, 'refused': 0}
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        rng = random.Random(worker_id)
+        worker_conn = get_db_connection()
+        for _ in range(args.requests // args.threads):
+            customer_id, hotel_id = rng.choice(customers)
+            entry_type = 'burn' if rng.random() < 0.3 else 'earn'
+            try:
+                record_entry(worker_conn, hotel_id, customer_id, rng.randint(10, 200), entry_type)
+                outcome = 'burned' if entry_type == 'burn' else 'earned'
+            except LoyaltyError:
+                outcome = 'refused'
+            with lock:
+                results[outcome] += 1
+        worker_conn.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    print(f"{args.requests} entries on {args.threads} threads in {elapsed:.2f}s ({args.requests / elapsed:.0f}/s): "
+          f"{results['earned']} earned, {results['burned']} burned, {results['refused']} refused")
+
+    overdrawn = conn.execute(
+        'SELECT COUNT(*) FROM (SELECT SUM(points) AS balance FROM loyalty_entries GROUP BY customer_id) WHERE balance < 0'
+    ).fetchone()[0]
+    sample = [customer_id for customer_id, _ in customers[:2000]]
+    for label in ('tail only', 'after compaction'):
+        if label == 'after compaction':
+            started = time.perf_counter()
+            snapshots = compact_loyalty(conn)
+            print(f"Compaction: {snapshots} snapshots in {time.perf_counter() - started:.2f}s")
+        started = time.perf_counter()
+        for customer_id in sample:
+            get_balance(conn, customer_id)
+        print(f"Balance read ({label}): {(time.perf_counter() - started) / len(sample) * 1000:.3f}ms")
+    conn.close()
+    print(f"Overdrawn customers: {overdrawn}")
+    return elapsed
+
+def bench_search(args):
+    """Staff type-ahead over reservations: trigram index versus LIKE scans"""
+    conn = open_benchmark_database('search')
+    from reservation_search import search_reservations
+
+    started = time.perf_counter()
+    seed_reservation_history(conn, args.hotels, args.reservations)
+    total = conn.execute('SELECT COUNT(*) FROM reservations').fetchone()[0]
+    print(f"Seeded and indexed {total} reservations in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(3)
+    sample = conn.execute('''
+        SELECT hotel_id, guest_name, guest_email, guest_phone, confirmation_code FROM reservations
+        WHERE id IN (SELECT abs(random()) % (SELECT MAX(id) FROM reservations) FROM reservations LIMIT 500)
+    ''').fetchall()
+    queries = []
+    for hotel_id, name, email, phone, code in sample:
+        typed = rng.choice([
+            name.split()[-1][:rng.randint(3, 6)], email.split('@')[0][:rng.randint(3, 8)],
+            (phone or code)[-7:], code[-5:], ' '.join(word[:3] for word in name.split()).upper()
+        ])
+        queries.append((hotel_id, typed))
+
+    timings, found = [], 0
+    for hotel_id, typed in queries:
+        started = time.perf_counter()
+        found += bool(search_reservations(conn, hotel_id, typed))
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    p50, p95 = timings[len(timings) // 2], timings[int(len(timings) * 0.95)]
+    print(f"Search: {len(queries)} queries, p50 {p50 * 1000:.2f}ms, p95 {p95 * 1000:.2f}ms, "
+          f"{found / len(queries):.0%} with results")
+
+    started = time.perf_counter()
+    for hotel_id, typed in queries[:20]:
+        pattern = f'%{typed}%'
+        conn.execute('''
+            SELECT id FROM reservations WHERE hotel_id = ?
+              AND (guest_name LIKE ? OR guest_email LIKE ? OR guest_phone LIKE ? OR confirmation_code LIKE ?)
+            ORDER BY id DESC LIMIT 20
+        ''', (hotel_id, pattern, pattern, pattern, pattern)).fetchall()
+    scan = (time.perf_counter() - started) / 20
+    print(f"LIKE scan: {scan * 1000:.2f}ms per query")
+    conn.close()
+    return p95
+
+def bench_settings(args):
+    """Per-request settings reads: in-process cache versus one query per request"""
+    conn = open_benchmark_database('settings')
+    from ultra_comprehensive_system import get_tenant_connection
+    from settings import SettingsStore, load_settings
+
+    hotel_ids = seed_reservation_history(conn, args.hotels, 0)
+    store = SettingsStore(get_tenant_connection)
+    for hotel_id in hotel_ids:
+        store.get_all(hotel_id)
+    store.update(hotel_ids[0], {f'prompt_{n}': 'x' * 500 for n in range(20)})
+    rng = random.Random(5)
+    reads = [rng.choice(hotel_ids) for _ in range(args.requests)]
+
+    started = time.perf_counter()
+    for hotel_id in reads:
+        reader = get_tenant_connection(hotel_id)
+        load_settings(reader, hotel_id)
+        reader.close()
+    uncached = (time.perf_counter() - started) / len(reads)
+
+    started = time.perf_counter()
+    for hotel_id in reads:
+        store.get_all(hotel_id)
+    cached = (time.perf_counter() - started) / len(reads)
+    print(f"Settings per request: query {uncached * 1e6:.0f}us vs cached {cached * 1e6:.1f}us")
+
+    # Every entry due for its version check: one primary-key read each, no reload
+    for entry in store.hotels._entries.values():
+        entry[0]['checked_at'] = 0.0
+    started = time.perf_counter()
+    for hotel_id in hotel_ids:
+        store.get_all(hotel_id, conn)
+    print(f"Version revalidation on the request's connection: "
+          f"{(time.perf_counter() - started) / len(hotel_ids) * 1e6:.0f}us per hotel every "
+          f"{store._version_check_interval:.0f}s")
+
+    started = time.perf_counter()
+    for n, hotel_id in enumerate(hotel_ids[:200]):
+        store.update(hotel_id, {'check_in_time': f'{12 + n % 6}:00', 'auto_reply_enabled': n % 2 == 0})
+    print(f"Bulk update: {(time.perf_counter() - started) / min(len(hotel_ids), 200) * 1000:.2f}ms per hotel")
+    conn.close()
+    return cached
+
+def bench_json(args):
+    """JSON columns: decode-once reads, amenity and AI-classification filters through their indexes"""
+    conn = open_benchmark_database('json')
+    from synthetic_data import generate_dataset
+    from json_columns import EMAIL_CLASSIFICATION_SQL, decode_json, emails_by_classification, room_types_with_amenity
+
+    hotel_ids = generate_dataset(conn, args.hotels, 0, emails_per_hotel=args.emails)['hotel_ids']
+    rng = random.Random(11)
+    amenities = ['WiFi', 'TV', 'AC', 'Mini-bar', 'Balcony', 'Jacuzzi', 'Sea View', 'Kitchenette', 'Safe', 'Bathtub']
+    conn.executemany('UPDATE room_types SET amenities = ? WHERE id = ?', [
+        (json.dumps(rng.sample(amenities, rng.randint(2, 7))), room_type_id)
+        for (room_type_id,) in conn.execute('SELECT id FROM room_types').fetchall()
+    ])
+    classifications = ('booking_request', 'question', 'complaint', 'cancellation', 'spam')
+    conn.executemany('UPDATE email_logs SET ai_analysis = ? WHERE id = ?', [
+        (json.dumps({'classification': rng.choice(classifications), 'sentiment': round(rng.uniform(-1, 1), 2),
+                     'entities': {'dates': [], 'guests': rng.randint(1, 4)}}), email_id)
+        for (email_id,) in conn.execute('SELECT id FROM email_logs').fetchall()
+    ])
+    conn.commit()
+    total = conn.execute('SELECT COUNT(*) FROM email_logs').fetchone()[0]
+
+    for table, column in (('room_types', 'amenities'), ('email_logs', 'ai_analysis')):
+        values = [row[0] for row in conn.execute(f'SELECT {column} FROM {table} LIMIT 5000').fetchall()]
+        started = time.perf_counter()
+        for _ in range(5):
+            for text in values:
+                json.loads(text)
+        parsed = (time.perf_counter() - started) / (5 * len(values))
+        started = time.perf_counter()
+        for _ in range(5):
+            for text in values:
+                decode_json(table, column, text)
+        cached = (time.perf_counter() - started) / (5 * len(values))
+        print(f"{table}.{column} reads: json.loads {parsed * 1e6:.2f}us vs decode-once {cached * 1e6:.2f}us")
+
+    sample = hotel_ids[:200]
+    started = time.perf_counter()
+    for hotel_id in sample:
+        room_types_with_amenity(conn, hotel_id, 'jacuzzi')
+    indexed = (time.perf_counter() - started) / len(sample)
+    started = time.perf_counter()
+    for hotel_id in sample:
+        conn.execute('''
+            SELECT r.id FROM room_types r, json_each(r.amenities) a
+            WHERE r.hotel_id = ? AND lower(a.value) = 'jacuzzi'
+        ''', (hotel_id,)).fetchall()
+    scanned = (time.perf_counter() - started) / len(sample)
+    print(f"Room types with Jacuzzi: index {indexed * 1000:.3f}ms vs json_each scan {scanned * 1000:.3f}ms")
+
+    started = time.perf_counter()
+    for hotel_id in sample:
+        emails_by_classification(conn, hotel_id, 'complaint')
+    indexed = (time.perf_counter() - started) / len(sample)
+    started = time.perf_counter()
+    for hotel_id in sample:
+        conn.execute(f'''
+            SELECT id FROM email_logs NOT INDEXED
+            WHERE hotel_id = ? AND {EMAIL_CLASSIFICATION_SQL} = 'complaint' ORDER BY id DESC LIMIT 50
+        ''', (hotel_id,)).fetchall()
+    scanned = (time.perf_counter() - started) / len(sample)
+    conn.close()
+    print(f"Complaint emails ({total} emails): index {indexed * 1000:.2f}ms vs table scan {scanned * 1000:.2f}ms")
+    return indexed
+
+def seed_guest_variants(conn, hotel_ids, records, seed=7):
+    """Insert guest records as customers, reservations and inbound emails with typical variations.
+
+    Every record carries its true person id (customers.notes, reservations.staff_notes,
+    email_logs.thread_id) so deduplication quality can be measured.
+    """
+    rng = random.Random(seed)
+    firsts = ['Ayşe', 'Mehmet', 'İsmail', 'Işıl', 'Anna', 'Lukas', 'Emma', 'Oliver', 'Chloé', 'Ivan', 'Elif', 'Jan',
+              'Zoë', 'Jürgen', 'Sophie', 'Mateo', 'Nina', 'Omar', 'Lea', 'Can'] + \
+             [''.join(rng.choice('bdfgklmnprstvz') + rng.choice('aeiou') for _ in range(3)).title() for _ in range(300)]
+    lasts = [''.join(rng.choice('bcdfghklmnprstvyz') + rng.choice('aeiouü') for _ in range(rng.randint(2, 4))).title()
+             for _ in range(5000)] + ['Yılmaz', 'Müller', 'Öztürk', 'Çelik', 'Şahin', 'de Vries', "O'Brien"]
+    domains = ('gmail.com', 'gmail.com', 'hotmail.com', 'yahoo.com', 'web.de', 'outlook.com', 'yandex.ru')
+
+    def vary_email(local, domain):
+        roll = rng.random()
+        if roll < 0.15:
+            return f'{local}@{domain}'.upper() if rng.random() < 0.3 else f'{local.title()}@{domain}'
+        if roll < 0.25 and domain == 'gmail.com':
+            return f"{local.replace('.', '')}@googlemail.com" if rng.random() < 0.3 else f"{local.replace('.', '')}@{domain}"
+        if roll < 0.32:
+            return f'{local}+booking@{domain}'
+        if roll < 0.36 and len(local) > 6:
+            cut = rng.randrange(1, len(local) - 1)
+            return f'{local[:cut]}{local[cut + 1:]}@{domain}'
+        return f'{local}@{domain}'
+
+    def vary_name(first, last):
+        roll = rng.random()
+        if roll < 0.1:
+            return f'{first} {last}'.upper()
+        if roll < 0.2:
+            return f'{first} {last}'.encode('ascii', 'ignore').decode() or f'{first} {last}'
+        return f'{first} {last}'
+
+    def vary_phone(digits):
+        roll = rng.random()
+        if roll < 0.4:
+            return None
+        if roll < 0.6:
+            return f'+90 {digits[:3]} {digits[3:6]} {digits[6:8]} {digits[8:]}'
+        return '0' + digits
+
+    persons = []
+    per_hotel = max(1, records // len(hotel_ids) * 2 // 5)
+    for hotel_id in hotel_ids:
+        for _ in range(per_hotel):
+            first, last = rng.choice(firsts), rng.choice(lasts)
+            local = f"{first}.{last}".lower().replace(' ', '').replace("'", '')
+            local = local.encode('ascii', 'ignore').decode() or f'guest{len(persons)}'
+            if rng.random() < 0.3:
+                local += str(rng.randint(1, 99))
+            persons.append((hotel_id, first, last, local, rng.choice(domains), f'5{rng.randint(10 ** 8, 10 ** 9 - 1)}'))
+
+    customers, reservations, emails = [], [], []
+    for _ in range(records):
+        person = rng.randrange(len(persons))
+        hotel_id, first, last, local, domain, phone = persons[person]
+        roll = rng.random()
+        if roll < 0.25:
+            customers.append((hotel_id, vary_email(local, domain), first, last, vary_phone(phone), str(person)))
+        elif roll < 0.8:
+            reservations.append((hotel_id, vary_name(first, last), vary_email(local, domain), vary_phone(phone),
+                                 '2026-01-01', '2026-01-03', str(person)))
+        else:
+            emails.append((hotel_id, f'"{vary_name(first, last)}" <{vary_email(local, domain)}>',
+                           f'reservations@synthetic{hotel_id}.test', str(person)))
+    conn.executemany('''
+        INSERT OR IGNORE INTO customers (hotel_id, email, first_name, last_name, phone, notes) VALUES (?, ?, ?, ?, ?, ?)
+    ''', customers)
+    conn.executemany('''
+        INSERT INTO reservations (hotel_id, guest_name, guest_email, guest_phone, check_in, check_out, staff_notes)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', reservations)
+    conn.executemany('INSERT INTO email_logs (hotel_id, from_email, to_email, thread_id) VALUES (?, ?, ?, ?)', emails)
+    conn.commit()
+    return len(persons)
+
+def bench_dedup(args):
+    """Guest deduplication over customers, reservations and emails (default: 1M records)"""
+    conn = open_benchmark_database('dedup')
+    from guest_dedup import run_dedup
+
+    hotel_ids = seed_reservation_history(conn, args.hotels, 0)
+    conn.execute('DELETE FROM customers')
+    started = time.perf_counter()
+    persons = seed_guest_variants(conn, hotel_ids, args.guests)
+    print(f"Seeded {args.guests} guest records of {persons} people in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    totals = run_dedup(conn)
+    elapsed = time.perf_counter() - started
+    print(f"Dedup: {totals['records']} records -> {totals['guests'] - totals['merged']} guests in {elapsed:.1f}s "
+          f"({totals['records'] / elapsed:.0f} records/s)")
+
+    # Purity: share of records whose guest is mostly their own person; completeness: share
+    # of records in the guest holding most of their person's records
+    truth = conn.execute('''
+        SELECT r.guest_id, COALESCE(c.notes, res.staff_notes, e.thread_id)
+        FROM guest_records r
+        LEFT JOIN customers c ON r.source = 'customer' AND c.id = r.source_id
+        LEFT JOIN reservations res ON r.source = 'reservation' AND res.id = r.source_id
+        LEFT JOIN email_logs e ON r.source = 'email' AND e.id = r.source_id
+        WHERE COALESCE(c.notes, res.staff_notes, e.thread_id) IS NOT NULL
+    ''').fetchall()
+    by_guest, by_person = {}, {}
+    for guest_id, person in truth:
+        by_guest.setdefault(guest_id, {}).setdefault(person, 0)
+        by_guest[guest_id][person] += 1
+        by_person.setdefault(person, {}).setdefault(guest_id, 0)
+        by_person[person][guest_id] += 1
+    purity = sum(max(counts.values()) for counts in by_guest.values()) / len(truth)
+    completeness = sum(max(counts.values()) for counts in by_person.values()) / len(truth)
+    print(f"{len(by_person)} people found as {len(by_guest)} guests: purity {purity:.4f}, "
+          f"completeness {completeness:.4f}")
+
+    extra = max(1, args.guests // 100)
+    seed_guest_variants(conn, hotel_ids, extra, seed=8)
+    started = time.perf_counter()
+    totals = run_dedup(conn)
+    print(f"Incremental run: {totals['records']} new records in {time.perf_counter() - started:.2f}s")
+    conn.close()
+    return elapsed
+
+def bench_metrics(args):
+    """Request latency with instrumentation on versus off (target: under 2% overhead)"""
+    conn = open_benchmark_database('metrics')
+    import ultra_comprehensive_system as system
+    from inventory import run_nightly_rebuild
+    from metrics import registry
+
+    hotel_ids = seed_reservation_history(conn, min(args.hotels, 50), args.reservations)
+    run_nightly_rebuild(conn)
+    conn.close()
+    # Measure instrumentation only, not the tenant's rate limit
+    system.rate_limiter.plan_limits = {
+        plan: {route_class: (1e9, 1e9) for route_class in limits}
+        for plan, limits in system.rate_limiter.plan_limits.items()
+    }
+
+    client = system.app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['hotel_id'] = hotel_ids[0]
+    paths = ['/api/inventory/calendar?days=30', '/api/pricing/rates?days=7', '/health']
+
+    def run(enabled, rounds):
+        registry.enabled = enabled
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for path in paths:
+                # Buffered responses are closed, as a WSGI server closes every response
+                client.get(path, buffered=True)
+        return time.perf_counter() - started
+
+    run(True, 50)
+    rounds = 20
+    batches = max(1, args.requests // (len(paths) * rounds))
+    timings = {True: [], False: []}
+    # Interleave short batches so drift (warm-up, CPU frequency, GC) hits both sides
+    # equally, then compare the fastest batches, which carry the least scheduler noise
+    for batch in range(batches):
+        for enabled in ((False, True) if batch % 2 else (True, False)):
+            timings[enabled].append(run(enabled, rounds))
+    registry.enabled = True
+    fastest = max(1, batches // 10)
+    off = sum(sorted(timings[False])[:fastest]) / fastest
+    on = sum(sorted(timings[True])[:fastest]) / fastest
+    requests_per_batch = rounds * len(paths)
+    print(f"Per request: off {off / requests_per_batch * 1000:.3f}ms, "
+          f"on {on / requests_per_batch * 1000:.3f}ms ({(on - off) / off * 100:+.2f}% overhead)")
+    return on
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(1, math.ceil(pct / 100 * len(sorted_values))) - 1]
+
+class LoadClient:
+    """One simulated user: a Flask test client, or HTTP/1.1 to a local server with a session cookie"""
+
+    def __init__(self, app=None, port=None):
+        self.client = app.test_client() if app is not None else None
+        self.port = port
+        self.cookie = None
+
+    def request(self, method, path, headers=None, form=None, json_body=None):
+        """Send one request and return the status code"""
+        headers = dict(headers or {})
+        if self.client is not None:
+            return self.client.open(
+                path, method=method, headers=headers, data=form, json=json_body, buffered=True
+            ).status_code
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_body is not None:
+            body = json.dumps(json_body)
+            headers['Content-Type'] = 'application/json'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            cookie = response.getheader('Set-Cookie')
+            if cookie and cookie.startswith('session='):
+                self.cookie = cookie.split(';', 1)[0]
+            return response.status
+        finally:
+            connection.close()
+
+def start_gunicorn(workers, preload=False, env=None):
+    """Serve app:application from a local gunicorn; returns (process, port)"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:application', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--log-level', 'warning'] + (['--preload'] if preload else []),
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=dict(os.environ, **(env or {}))
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {process.returncode}')
+        try:
+            if LoadClient(port=port).request('GET', '/health/live') == 200:
+                return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not become ready within 60s')
+
+def compare_with_baseline(path, target, report, tolerance, save):
+    """Regressions against the stored baseline for this target; stores the report when save is set"""
+    baselines = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            baselines = json.load(f)
+    if save:
+        baselines[target] = report
+        with open(path, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline for '{target}' saved to {path}")
+        return []
+    baseline = baselines.get(target)
+    if baseline is None:
+        print(f"No '{target}' baseline in {path}; run with --save-baseline to record one")
+        return []
+
+    regressions = []
+    if report['throughput_rps'] < baseline['throughput_rps'] * (1 - tolerance):
+        regressions.append(f"throughput {report['throughput_rps']:.0f} req/s < baseline {baseline['throughput_rps']:.0f}")
+    for route, stats in report['routes'].items():
+        expected = baseline['routes'].get(route)
+        if expected and stats['p95_ms'] > expected['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{route} p95 {stats['p95_ms']:.2f}ms > baseline {expected['p95_ms']:.2f}ms")
+        if stats['errors']:
+            regressions.append(f"{route}: {stats['errors']} unexpected responses")
+    return regressions
+
+# (name, method, path, authentication, expected status)
+LOAD_ROUTES = [
+    ('health', 'GET', '/health', None, 200),
+    ('login', 'POST', '/admin/login', 'form', 302),
+    ('dashboard', 'GET', '/admin/dashboard', 'session', 200),
+    ('inventory_calendar', 'GET', '/api/inventory/calendar?days=90', 'api_key', 200),
+    ('pricing_rates', 'GET', '/api/pricing/rates?days=30', 'api_key', 200),
+    ('forecast', 'GET', '/api/analytics/forecast?days=30', 'api_key', 200),
+    ('reservation_lookup', 'GET', '/api/reservations/lookup?email={guest_email}', 'api_key', 200),
+]
+BOOKING_ROUTE = ('create_reservation', 'POST', '/api/reservations', 'booking', 201)
+
+def seed_load_database(label, args):
+    """Synthetic tenants with nightly jobs run; returns (hotel_id, api_key, admin_email, guest_email, room_type_id) rows"""
+    conn = open_benchmark_database(label)
+    from synthetic_data import generate_dataset
+    from inventory import run_nightly_rebuild
+    from pricing import run_nightly_repricing
+    from forecasting import run_nightly_forecast
+
+    started = time.perf_counter()
+    dataset = generate_dataset(conn, args.hotels, args.reservations, args.emails)
+    run_nightly_rebuild(conn)
+    run_nightly_repricing(conn)
+    run_nightly_forecast(conn)
+    print(f"Seeded {json.dumps(dataset['rows'])} in {time.perf_counter() - started:.1f}s")
+    hotels = [(hotel_id, dataset['api_keys'][hotel_id]) + tuple(rest) for hotel_id, *rest in conn.execute(f'''
+        SELECT h.id, h.admin_email, MIN(r.guest_email), MIN(r.room_type_id) FROM hotels h
+        JOIN reservations r ON r.hotel_id = h.id
+        WHERE h.id IN ({",".join("?" * len(dataset['hotel_ids']))})
+        GROUP BY h.id ORDER BY h.id
+    ''', dataset['hotel_ids'])]
+    conn.close()
+    return hotels
+
+def drive_traffic(make_client, hotels, routes, threads, requests):
+    """Replay routes round-robin from each thread's own client; returns (latencies, errors, elapsed)"""
+    import threading
+    from synthetic_data import SYNTHETIC_PASSWORD
+
+    latencies = {name: [] for name, _, _, _, _ in routes}
+    errors = {name: 0 for name, _, _, _, _ in routes}
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        client = make_client()
+        rng = random.Random(worker_id)
+        hotel_id, _, admin_email, _, _ = hotels[worker_id % len(hotels)]
+        client.request('POST', '/admin/login', form={'email': admin_email, 'password': SYNTHETIC_PASSWORD})
+        timings = {name: [] for name in latencies}
+        failed = {name: 0 for name in latencies}
+        for n in range(requests // threads):
+            name, method, path, auth, expected = routes[n % len(routes)]
+            # Spread tenants so the per-hotel rate limits are not what gets measured
+            _, api_key, login_email, guest_email, room_type_id = hotels[(n * threads + worker_id) % len(hotels)]
+            headers = {'X-API-Key': api_key} if auth in ('api_key', 'booking') else None
+            form = {'email': login_email, 'password': SYNTHETIC_PASSWORD} if auth == 'form' else None
+            body = None
+            if auth == 'booking':
+                check_in = date.today() + timedelta(days=rng.randint(30, 365))
+                body = {
+                    'room_type_id': room_type_id, 'guest_name': 'Load Test',
+                    'guest_email': f'load{worker_id}.{n}@example.com', 'check_in': check_in.isoformat(),
+                    'check_out': (check_in + timedelta(days=rng.randint(1, 3))).isoformat()
+                }
+            request_started = time.perf_counter()
+            status = client.request(method, path.format(guest_email=guest_email), headers, form, body)
+            timings[name].append(time.perf_counter() - request_started)
+            failed[name] += status != expected
+            if auth == 'form':
+                # Log back in as this worker's own hotel for its dashboard requests
+                client.request('POST', '/admin/login', form={'email': admin_email, 'password': SYNTHETIC_PASSWORD})
+        with lock:
+            for name in latencies:
+                latencies[name].extend(timings[name])
+                errors[name] += failed[name]
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+def latency_report(latencies, errors, elapsed):
+    """Throughput and p50/p95/p99 per route; prints the table and returns the report"""
+    total = sum(len(values) for values in latencies.values())
+    report = {'throughput_rps': round(total / elapsed, 1), 'routes': {}}
+    print(f"{'route':<20}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, values in latencies.items():
+        values.sort()
+        stats = {
+            'count': len(values),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'errors': errors[name]
+        }
+        report['routes'][name] = stats
+        print(f"{name:<20}{stats['count']:>7}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['errors']:>8}")
+    return report
+
+def bench_load(args):
+    """Mixed dashboard, login, health and API traffic; p50/p95/p99 per route against stored baselines"""
+    hotels = seed_load_database('load', args)
+    import ultra_comprehensive_system as system
+
+    process = None
+    if args.target == 'gunicorn':
+        process, port = start_gunicorn(args.workers)
+        make_client = lambda: LoadClient(port=port)
+    else:
+        make_client = lambda: LoadClient(app=system.app)
+    try:
+        latencies, errors, elapsed = drive_traffic(make_client, hotels, LOAD_ROUTES, args.threads, args.requests)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    report = latency_report(latencies, errors, elapsed)
+    total = sum(stats['count'] for stats in report['routes'].values())
+    print(f"{total} requests on {args.threads} threads ({args.target}) in {elapsed:.2f}s: "
+          f"{report['throughput_rps']:.0f} req/s (login timings exclude the re-login after each one)")
+
+    regressions = compare_with_baseline(args.baseline, args.target, report, args.tolerance, args.save_baseline)
+    if regressions:
+        print('Regressions beyond the stored baseline:')
+        for regression in regressions:
+            print(f'  - {regression}')
+        sys.exit(1)
+    return elapsed
+
+def bench_workers(args):
+    """sync, gthread and gevent gunicorn workers on the same mixed dashboard, API and booking traffic"""
+    hotels = seed_load_database('workers', args)
+    routes = LOAD_ROUTES + [BOOKING_ROUTE]
+
+    results = {}
+    for worker_class in ('sync', 'gthread', 'gevent'):
+        if worker_class == 'gevent' and importlib.util.find_spec('gevent') is None:
+            print('\ngevent is not installed; skipping (pip install gevent)')
+            continue
+        env = {'GUNICORN_WORKER_CLASS': worker_class}
+        if worker_class == 'sync':
+            env['GUNICORN_THREADS'] = '1'
+        process, port = start_gunicorn(args.workers, env=env)
+        try:
+            latencies, errors, elapsed = drive_traffic(
+                lambda: LoadClient(port=port), hotels, routes, args.threads, args.requests
+            )
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        print(f"\n{worker_class} ({args.workers} workers, {args.threads} client threads):")
+        results[worker_class] = latency_report(latencies, errors, elapsed)
+
+    print(f"\n{'worker class':<14}{'req/s':>9}{'dashboard p95':>15}{'booking p95':>13}{'errors':>8}")
+    for worker_class, report in results.items():
+        routes_report = report['routes']
+        print(f"{worker_class:<14}{report['throughput_rps']:>9.0f}{routes_report['dashboard']['p95_ms']:>15.2f}"
+              f"{routes_report['create_reservation']['p95_ms']:>13.2f}"
+              f"{sum(stats['errors'] for stats in routes_report.values()):>8}")
+    return results
+
+def bench_startup(args):
+    """Cold-start time of 'import app' in a fresh interpreter: first boot versus current schema"""
+    db_dir = tempfile.mkdtemp(prefix='ybh_bench_startup_')
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(db_dir, 'bench.db')}")
+    script = (
+        'import time, sys; started = time.perf_counter(); import app; '
+        'print(time.perf_counter() - started, "numpy.core.multiarray" in sys.modules)'
+    )
+
+    def boot():
+        output = subprocess.run(
+            [sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env, capture_output=True, text=True, check=True
+        ).stdout.split()
+        return float(output[-2]), output[-1] == 'True'
+
+    first, _ = boot()
+    runs = [boot() for _ in range(max(3, args.requests // 200))]
+    warm = sorted(seconds for seconds, _ in runs)
+    print(f"First boot (creates schema): {first * 1000:.0f}ms")
+    print(f"Boot with current schema: median {warm[len(warm) // 2] * 1000:.0f}ms, "
+          f"min {warm[0] * 1000:.0f}ms over {len(warm)} runs (numpy loaded at boot: {runs[0][1]})")
+    return warm[len(warm) // 2]
+
+def bench_rss(args):
+    """Memory per gunicorn worker (--preload) with and without the pre-fork warm-up"""
+    from prefork import print_server_memory, server_memory
+
+    conn = open_benchmark_database('rss')
+    from synthetic_data import generate_dataset
+    from inventory import run_nightly_rebuild
+    dataset = generate_dataset(conn, args.hotels, args.reservations, args.emails)
+    run_nightly_rebuild(conn)
+    api_keys = [dataset['api_keys'][hotel_id] for hotel_id in dataset['hotel_ids'][:50]]
+    conn.close()
+
+    totals = {}
+    for warm in (False, True):
+        process, port = start_gunicorn(args.workers, preload=True, env={'PREFORK_WARMUP': str(warm).lower()})
+        try:
+            client = LoadClient(port=port)
+            # Enough traffic that every worker renders pages and serves numpy-backed routes
+            for n in range(args.workers * 20):
+                client.request('GET', '/')
+                client.request('GET', '/api/inventory/calendar?days=30', {'X-API-Key': api_keys[n % len(api_keys)]})
+            report = server_memory(process.pid)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        print(f"\nPre-fork warm-up {'on' if warm else 'off'}, {args.workers} workers:")
+        print_server_memory(report)
+        totals[warm] = report['total_pss_kb'] / 1024
+    print(f"\nWarm-up saves {totals[False] - totals[True]:.1f} MiB PSS across {args.workers} workers")
+    return totals[True]
+
+BENCHMARKS = {
+    'forecast': bench_forecast,
+    'segmentation': bench_segmentation,
+    'pricing': bench_pricing,
+    'inventory': bench_inventory,
+    'booking': bench_booking,
+    'ledger': bench_ledger,
+    'reconcile': bench_reconcile,
+    'loyalty': bench_loyalty,
+    'dedup': bench_dedup,
+    'search': bench_search,
+    'settings': bench_settings,
+    'json': bench_json,
+    'metrics': bench_metrics,
+    'load': bench_load,
+    'startup': bench_startup,
+    'rss': bench_rss,
+    'workers': bench_workers,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='YourBookingHub.org performance benchmarks')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--hotels', type=int, default=1000)
+    parser.add_argument('--reservations', type=int, default=300, help='reservations per hotel')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000, help='total requests for concurrent benchmarks')
+    parser.add_argument('--settlements', type=int, default=100000, help='reconcile: settlement file lines')
+    parser.add_argument('--guests', type=int, default=1000000, help='dedup: guest records')
+    parser.add_argument('--emails', type=int, default=100, help='emails per hotel')
+    parser.add_argument('--target', choices=['client', 'gunicorn'], default='client', help='load: in-process or local gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers (load --target gunicorn, rss)')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='load: baseline file')
+    parser.add_argument('--save-baseline', action='store_true', help='load: store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='load: allowed regression (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+    BENCHMARKS[args.benchmark](args)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
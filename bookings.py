@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Reservation Booking Engine
+Overbooking-safe reservation creation with idempotency keys
+"""
+
+import json
+import sqlite3
+import hashlib
+import logging
+from datetime import date
+
+from confirmation_codes import generate_confirmation_code, normalize_confirmation_code
+from forecasting import load_stay_nights, on_books_matrix
+from guest_lookup import invalidate_reservation
+from inventory import get_room_type_stay, sync_reservation
+from lazy_imports import lazy_import
+from loyalty import earn_for_stay
+from pricing import reprice_stay
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+CONFIRMATION_CODE_ATTEMPTS = 5
+
+BOOKING_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        hotel_id INTEGER NOT NULL,
+        idempotency_key TEXT NOT NULL,
+        request_hash TEXT NOT NULL,
+        reservation_id INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (hotel_id, idempotency_key),
+        FOREIGN KEY (hotel_id) REFERENCES hotels (id),
+        FOREIGN KEY (reservation_id) REFERENCES reservations (id)
+    ) WITHOUT ROWID
+    ''',
+]
+
+RESERVATION_STATUSES = ('confirmed', 'cancelled', 'checked_in', 'checked_out', 'no_show')
+UPDATABLE_FIELDS = ('status', 'guest_phone', 'special_requests', 'notes', 'staff_notes')
+
+BOOKING_FIELDS = (
+    'room_type_id', 'guest_name', 'guest_email', 'guest_phone', 'guest_country',
+    'check_in', 'check_out', 'adults', 'children', 'infants', 'special_requests', 'booking_source'
+)
+
+class BookingError(Exception):
+    """Booking request that cannot be fulfilled; carries the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def _parse_booking(payload):
+    """Validate a booking payload and normalize it to BOOKING_FIELDS"""
+    booking = {field: payload.get(field) for field in BOOKING_FIELDS}
+    for field in ('room_type_id', 'guest_name', 'guest_email', 'check_in', 'check_out'):
+        if not booking[field]:
+            raise BookingError(f'{field} is required')
+    try:
+        booking['room_type_id'] = int(booking['room_type_id'])
+        booking['check_in'] = date.fromisoformat(str(booking['check_in']))
+        booking['check_out'] = date.fromisoformat(str(booking['check_out']))
+        for field, default in (('adults', 1), ('children', 0), ('infants', 0)):
+            booking[field] = int(booking[field] if booking[field] is not None else default)
+    except (TypeError, ValueError):
+        raise BookingError('room_type_id and guest counts must be integers, dates YYYY-MM-DD')
+    if booking['check_out'] <= booking['check_in']:
+        raise BookingError('check_out must be after check_in')
+    if booking['check_in'] < date.today():
+        raise BookingError('check_in is in the past')
+    if '@' not in booking['guest_email']:
+        raise BookingError('guest_email is invalid')
+    booking['booking_source'] = booking['booking_source'] or 'api'
+    return booking
+
+def _request_hash(booking):
+    """Stable fingerprint of a booking request, used to detect idempotency-key reuse"""
+    canonical = json.dumps(booking, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def _availability(conn, room_type, check_in, check_out):
+    """Rooms left and nightly rates, from the inventory store or the reservation rows"""
+    stay = get_room_type_stay(conn, room_type['id'], check_in, check_out)
+    if stay is not None:
+        return stay
+
+    first_day, last_day = check_in.toordinal(), check_out.toordinal()
+    series_index, stay_day, _ = load_stay_nights(
+        conn, np.array([room_type['id']], dtype=np.int64), first_day, last_day
+    )
+    sold = on_books_matrix(series_index, stay_day, 1, first_day, last_day - first_day)[0]
+    nights = last_day - first_day
+    return int(room_type['total_rooms'] - sold.max()), [float(room_type['base_price'])] * nights
+
+def _fetch_reservation(conn, reservation_id):
+    """Reservation row as a JSON-ready dict"""
+    cursor = conn.execute('SELECT * FROM reservations WHERE id = ?', (reservation_id,))
+    return dict(zip([column[0] for column in cursor.description], cursor.fetchone()))
+
+def create_reservation(conn, hotel_id, payload, idempotency_key=None, currency=None):
+    """Book a room atomically; returns (reservation, replayed).
+
+    The whole check-then-write runs under BEGIN IMMEDIATE, which takes SQLite's write
+    lock up front, so two concurrent requests can never both see the last free room.
+    Pass the hotel's currency from the catalog (the tenant) when conn is a shard, whose
+    copy of the hotels row may lag.
+    """
+    booking = _parse_booking(payload)
+    request_hash = _request_hash(booking)
+
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if idempotency_key:
+            existing = conn.execute('''
+                SELECT request_hash, reservation_id FROM idempotency_keys
+                WHERE hotel_id = ? AND idempotency_key = ?
+            ''', (hotel_id, idempotency_key)).fetchone()
+            if existing:
+                if existing[0] != request_hash:
+                    raise BookingError('Idempotency key was already used for a different request', 409)
+                reservation = _fetch_reservation(conn, existing[1])
+                conn.execute('COMMIT')
+                return reservation, True
+
+        room_type = conn.execute('''
+            SELECT id, COALESCE(total_rooms, 10) AS total_rooms, base_price, capacity,
+                   minimum_stay, maximum_stay
+            FROM room_types WHERE id = ? AND hotel_id = ? AND is_active = 1
+        ''', (booking['room_type_id'], hotel_id)).fetchone()
+        if not room_type:
+            raise BookingError('Room type not found', 404)
+        nights = (booking['check_out'] - booking['check_in']).days
+        if nights < (room_type['minimum_stay'] or 1) or nights > (room_type['maximum_stay'] or 30):
+            raise BookingError('Stay length is outside the room type limits')
+        if booking['adults'] + booking['children'] > (room_type['capacity'] or 2):
+            raise BookingError('Too many guests for this room type')
+
+        available, nightly_rates = _availability(conn, room_type, booking['check_in'], booking['check_out'])
+        if available <= 0:
+            raise BookingError('No rooms available for the selected dates', 409)
+
+        if currency is None:
+            currency = conn.execute('SELECT currency FROM hotels WHERE id = ?', (hotel_id,)).fetchone()[0]
+        values = (
+            hotel_id, booking['room_type_id'], booking['guest_name'], booking['guest_email'],
+            booking['guest_phone'], booking['guest_country'],
+            booking['check_in'].isoformat(), booking['check_out'].isoformat(),
+            booking['adults'], booking['children'], booking['infants'], booking['special_requests'],
+            round(sum(nightly_rates), 2), currency, booking['booking_source']
+        )
+        for attempt in range(CONFIRMATION_CODE_ATTEMPTS):
+            try:
+                cursor = conn.execute('''
+                    INSERT INTO reservations (
+                        confirmation_code, hotel_id, room_type_id, guest_name, guest_email,
+                        guest_phone, guest_country, check_in, check_out, adults, children, infants,
+                        special_requests, total_price, currency, booking_source
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (generate_confirmation_code(),) + values)
+                break
+            except sqlite3.IntegrityError as e:
+                if 'confirmation_code' not in str(e):
+                    raise
+                # Code collision: only the failed statement is undone, the transaction lives on
+                logger.warning(f"Confirmation code collision, retrying (attempt {attempt + 1})")
+        else:
+            raise BookingError('Could not allocate a confirmation code', 503)
+
+        reservation = _fetch_reservation(conn, cursor.lastrowid)
+        reprice_stay(conn, booking['room_type_id'], booking['check_in'], booking['check_out'])
+        sync_reservation(conn, after=reservation)
+        if idempotency_key:
+            conn.execute('''
+                INSERT INTO idempotency_keys (hotel_id, idempotency_key, request_hash, reservation_id)
+                VALUES (?, ?, ?, ?)
+            ''', (hotel_id, idempotency_key, request_hash, reservation['id']))
+        conn.execute('COMMIT')
+        return reservation, False
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.isolation_level = previous_isolation
+
+def update_reservation(conn, hotel_id, confirmation_code, changes):
+    """Update status or guest details of a reservation; returns the updated row.
+
+    Cancelling releases the nights in the inventory store; reinstating re-checks availability;
+    checking out credits the guest's loyalty points.
+    """
+    changes = {field: value for field, value in changes.items() if field in UPDATABLE_FIELDS}
+    if not changes:
+        raise BookingError(f'Nothing to update; allowed fields: {", ".join(UPDATABLE_FIELDS)}')
+    if 'status' in changes and changes['status'] not in RESERVATION_STATUSES:
+        raise BookingError(f'status must be one of: {", ".join(RESERVATION_STATUSES)}')
+    confirmation_code = normalize_confirmation_code(confirmation_code)
+
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute(
+            'SELECT id FROM reservations WHERE confirmation_code = ? AND hotel_id = ?',
+            (confirmation_code, hotel_id)
+        ).fetchone()
+        if not row:
+            raise BookingError('Reservation not found', 404)
+        before = _fetch_reservation(conn, row[0])
+
+        reinstated = before['status'] == 'cancelled' and changes.get('status', 'cancelled') != 'cancelled'
+        if reinstated:
+            room_type = conn.execute('''
+                SELECT id, COALESCE(total_rooms, 10) AS total_rooms, base_price FROM room_types WHERE id = ?
+            ''', (before['room_type_id'],)).fetchone()
+            available, _ = _availability(
+                conn, room_type, date.fromisoformat(before['check_in']), date.fromisoformat(before['check_out'])
+            )
+            if available <= 0:
+                raise BookingError('No rooms available to reinstate this reservation', 409)
+
+        assignments = ', '.join(f'{field} = ?' for field in changes)
+        conn.execute(
+            f'UPDATE reservations SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+            tuple(changes.values()) + (before['id'],)
+        )
+        after = _fetch_reservation(conn, before['id'])
+        if (before['status'] == 'cancelled') != (after['status'] == 'cancelled'):
+            reprice_stay(conn, after['room_type_id'], after['check_in'], after['check_out'])
+            sync_reservation(conn, before, after)
+        if after['status'] == 'checked_out' and before['status'] != 'checked_out':
+            earn_for_stay(conn, after)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.isolation_level = previous_isolation
+
+    invalidate_reservation(confirmation_code)
+    return after
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Confirmation Codes
+Compact, date-sortable codes: YBH + 3-char booking day + 7 random chars (Crockford base32)
+"""
+
+import secrets
+from datetime import date, timedelta
+
+CODE_PREFIX = 'YBH'
+CODE_EPOCH = date(2020, 1, 1)
+DAY_CHARS = 3
+RANDOM_CHARS = 7
+CODE_LENGTH = len(CODE_PREFIX) + DAY_CHARS + RANDOM_CHARS
+
+# Legacy codes: YBH + YYYYMMDD + 8 hex characters
+LEGACY_CODE_LENGTH = len(CODE_PREFIX) + 8 + 8
+
+# Crockford base32 digits are in ASCII order, so encoded values sort like the numbers they encode
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+CROCKFORD_ALIASES = str.maketrans({'O': '0', 'I': '1', 'L': '1'})
+
+def _encode(value, width):
+    """Fixed-width Crockford base32 encoding of a non-negative integer"""
+    chars = []
+    for _ in range(width):
+        value, digit = divmod(value, 32)
+        chars.append(CROCKFORD_ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+def _decode(text):
+    """Decode Crockford base32 text to an integer"""
+    value = 0
+    for char in text:
+        value = value * 32 + CROCKFORD_ALPHABET.index(char)
+    return value
+
+def day_prefix(day):
+    """Code prefix shared by every code generated on a given day"""
+    return CODE_PREFIX + _encode((day - CODE_EPOCH).days, DAY_CHARS)
+
+def generate_confirmation_code(day=None):
+    """Generate unique confirmation code"""
+    return day_prefix(day or date.today()) + _encode(secrets.randbits(5 * RANDOM_CHARS), RANDOM_CHARS)
+
+def normalize_confirmation_code(code):
+    """Canonical form of user-typed codes (case, spaces, dashes, Crockford look-alikes)"""
+    code = ''.join((code or '').split()).replace('-', '').upper()
+    if len(code) == CODE_LENGTH and code.startswith(CODE_PREFIX):
+        return CODE_PREFIX + code[len(CODE_PREFIX):].translate(CROCKFORD_ALIASES)
+    return code
+
+def confirmation_code_date(code):
+    """Booking day encoded in a confirmation code (current or legacy format), or None"""
+    code = normalize_confirmation_code(code)
+    try:
+        if len(code) == CODE_LENGTH and code.startswith(CODE_PREFIX):
+            return CODE_EPOCH + timedelta(days=_decode(code[len(CODE_PREFIX):len(CODE_PREFIX) + DAY_CHARS]))
+        if len(code) == LEGACY_CODE_LENGTH and code.startswith(CODE_PREFIX):
+            return date(int(code[3:7]), int(code[7:9]), int(code[9:11]))
+    except ValueError:
+        return None
+    return None
+
+def confirmation_code_ranges(start_date, end_date):
+    """Index range bounds [(low, high, length), ...] for codes booked in [start_date, end_date)"""
+    return [
+        (day_prefix(start_date), day_prefix(end_date), CODE_LENGTH),
+        (f"{CODE_PREFIX}{start_date.strftime('%Y%m%d')}", f"{CODE_PREFIX}{end_date.strftime('%Y%m%d')}", LEGACY_CODE_LENGTH)
+    ]
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Multi-Currency Revenue
+Daily exchange rates and ledger revenue converted into a hotel's reporting currency
+
+Usage: python currency.py load eurofxref-hist.csv
+       python currency.py fetch   (needs EXCHANGE_RATE_API_KEY)
+"""
+
+import os
+import csv
+import json
+import logging
+import argparse
+import urllib.request
+from datetime import date
+
+from caching import LRUCache
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+BASE_CURRENCY = 'EUR'
+EXCHANGE_RATE_API_URL = 'https://v6.exchangerate-api.com/v6/{api_key}/latest/' + BASE_CURRENCY
+RATE_CACHE_TTL = 3600
+
+CURRENCY_SCHEMA = [
+    # Units of currency per one BASE_CURRENCY on rate_date; global, kept in the catalog
+    '''
+    CREATE TABLE IF NOT EXISTS exchange_rates (
+        currency TEXT NOT NULL,
+        rate_date DATE NOT NULL,
+        rate REAL NOT NULL,
+        source TEXT,
+        PRIMARY KEY (currency, rate_date)
+    ) WITHOUT ROWID
+    ''',
+]
+
+def store_rates(conn, rate_date, rates, source, base=BASE_CURRENCY):
+    """Upsert one day's rates given as units per base; rebased to BASE_CURRENCY"""
+    rates = {
+        currency.upper(): float(rate) for currency, rate in rates.items()
+        if rate not in (None, '', 'N/A') and float(rate) > 0
+    }
+    if base != BASE_CURRENCY:
+        if BASE_CURRENCY not in rates:
+            raise ValueError(f"Rates quoted in {base} must include {BASE_CURRENCY}")
+        pivot = rates[BASE_CURRENCY]
+        rates[base] = 1.0
+        rates = {currency: rate / pivot for currency, rate in rates.items()}
+    rows = [
+        (currency, rate_date, rate, source)
+        for currency, rate in rates.items() if currency != BASE_CURRENCY
+    ]
+    conn.executemany('''
+        INSERT INTO exchange_rates (currency, rate_date, rate, source) VALUES (?, ?, ?, ?)
+        ON CONFLICT (currency, rate_date) DO UPDATE SET rate = excluded.rate, source = excluded.source
+    ''', rows)
+    return len(rows)
+
+def load_rates_file(conn, path):
+    """Load rates from an ECB-style CSV (Date, USD, GBP, ...) or an exchange-rate API JSON document"""
+    loaded = 0
+    source = os.path.basename(path)
+    if path.endswith('.json'):
+        with open(path) as f:
+            document = json.load(f)
+        rate_date = document.get('date') or date.today().isoformat()
+        rates = document.get('conversion_rates') or document.get('rates') or {}
+        base = document.get('base_code') or document.get('base') or BASE_CURRENCY
+        loaded = store_rates(conn, rate_date, rates, source, base)
+    else:
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                rate_date = row.pop('Date').strip()
+                loaded += store_rates(conn, rate_date, {
+                    currency.strip(): value.strip() for currency, value in row.items() if currency and value
+                }, source)
+    conn.commit()
+    return loaded
+
+def fetch_latest_rates(conn, api_key, timeout=10):
+    """Store today's rates from the exchange-rate API"""
+    with urllib.request.urlopen(EXCHANGE_RATE_API_URL.format(api_key=api_key), timeout=timeout) as response:
+        document = json.load(response)
+    if document.get('result') != 'success':
+        raise RuntimeError(f"Exchange rate API error: {document.get('error-type', 'unknown')}")
+    loaded = store_rates(conn, date.today().isoformat(), document['conversion_rates'], 'exchangerate-api')
+    conn.commit()
+    return loaded
+
+class ExchangeRateStore:
+    """Daily rates from the catalog as day x currency matrices, cached per range"""
+
+    def __init__(self, connection_factory, ttl=RATE_CACHE_TTL):
+        self._connect = connection_factory
+        self.cache = LRUCache(maxsize=64, ttl=ttl)
+
+    def _series(self, currencies):
+        """Known (ordinal days, rates) per currency"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(f'''
+                SELECT currency, rate_date, rate FROM exchange_rates
+                WHERE currency IN ({",".join("?" * len(currencies))})
+                ORDER BY currency, rate_date
+            ''', tuple(currencies)).fetchall()
+        finally:
+            conn.close()
+        series = {}
+        for currency, rate_date, rate in rows:
+            days, rates = series.setdefault(currency, ([], []))
+            days.append(date.fromisoformat(rate_date).toordinal())
+            rates.append(rate)
+        return series
+
+    def matrix(self, currencies, first_day, last_day):
+        """Units per BASE_CURRENCY for each day in [first_day, last_day] (ordinals) and currency.
+
+        A day without a quote uses the latest earlier one; days before the first quote use
+        the earliest. Currencies never quoted are NaN.
+        """
+        key = (tuple(currencies), first_day, last_day)
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+        quoted = [currency for currency in currencies if currency != BASE_CURRENCY]
+        series = self._series(quoted) if quoted else {}
+        days = np.arange(first_day, last_day + 1)
+        result = np.full((len(days), len(currencies)), np.nan)
+        for column, currency in enumerate(currencies):
+            if currency == BASE_CURRENCY:
+                result[:, column] = 1.0
+            elif currency in series:
+                quote_days, rates = (np.asarray(values) for values in series[currency])
+                index = np.clip(np.searchsorted(quote_days, days, side='right') - 1, 0, None)
+                result[:, column] = rates[index]
+        self.cache.set(key, result)
+        return result
+
+def revenue_report(conn, rates, hotel_id, reporting_currency, start_date=None, end_date=None):
+    """Revenue between two dates (inclusive) from the payment ledger, converted at each day's rate.
+
+    Revenue is takings less refunds, each on the day it was posted, so money paid back
+    is not reported. Grouped daily sums are converted in one vectorized pass; amounts in
+    currencies without any rate are returned under 'unconverted' instead of being guessed.
+    """
+    reporting_currency = (reporting_currency or BASE_CURRENCY).upper()
+    end_date = end_date or date.today()
+    if start_date is None:
+        first = conn.execute(
+            'SELECT MIN(ledger_date) FROM payment_ledger_daily WHERE hotel_id = ?', (hotel_id,)
+        ).fetchone()[0]
+        start_date = date.fromisoformat(first) if first else end_date
+    report = {
+        'hotel_id': hotel_id,
+        'currency': reporting_currency,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'total': 0.0,
+        'payments': 0,
+        'by_currency': {},
+        'daily': [],
+        'unconverted': {}
+    }
+    rows = conn.execute('''
+        SELECT ledger_date, currency, SUM(gross), SUM(refunds), SUM(payments) FROM payment_ledger_daily
+        WHERE hotel_id = ? AND ledger_date BETWEEN ? AND ?
+        GROUP BY ledger_date, currency HAVING SUM(payments) > 0 OR SUM(refunds) != 0
+    ''', (hotel_id, start_date.isoformat(), end_date.isoformat())).fetchall()
+    if not rows:
+        return report
+
+    first_day = start_date.toordinal()
+    day_index = np.array([date.fromisoformat(row[0]).toordinal() - first_day for row in rows])
+    currencies, currency_index = np.unique([row[1] for row in rows], return_inverse=True)
+    gross = np.array([row[2] for row in rows], dtype=float)
+    refunds = np.array([row[3] for row in rows], dtype=float)
+    payments = np.array([row[4] for row in rows])
+    revenue = gross - refunds
+
+    columns = list(currencies) + [reporting_currency]
+    matrix = rates.matrix(columns, first_day, end_date.toordinal())
+    converted = revenue * matrix[day_index, len(currencies)] / matrix[day_index, currency_index]
+    convertible = ~np.isnan(converted)
+
+    daily = np.bincount(day_index[convertible], weights=converted[convertible], minlength=len(matrix))
+    gross_by_currency = np.bincount(currency_index, weights=gross, minlength=len(currencies))
+    refunds_by_currency = np.bincount(currency_index, weights=refunds, minlength=len(currencies))
+    converted_by_currency = np.bincount(
+        currency_index[convertible], weights=converted[convertible], minlength=len(currencies)
+    )
+    payments_by_currency = np.bincount(currency_index, weights=payments, minlength=len(currencies))
+    for n, currency in enumerate(currencies.tolist()):
+        if np.isnan(matrix[:, n]).all() or np.isnan(matrix[:, -1]).all():
+            report['unconverted'][currency] = round(float(gross_by_currency[n] - refunds_by_currency[n]), 2)
+            continue
+        report['by_currency'][currency] = {
+            'gross': round(float(gross_by_currency[n]), 2),
+            'refunds': round(float(refunds_by_currency[n]), 2),
+            'converted': round(float(converted_by_currency[n]), 2),
+            'payments': int(payments_by_currency[n])
+        }
+    report['total'] = round(float(daily.sum()), 2)
+    report['payments'] = int(payments[convertible].sum())
+    report['daily'] = [
+        {'date': date.fromordinal(first_day + int(day)).isoformat(), 'revenue': round(float(daily[day]), 2)}
+        for day in np.flatnonzero(daily)
+    ]
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load daily exchange rates into the catalog database')
+    parser.add_argument('command', choices=['load', 'fetch'])
+    parser.add_argument('path', nargs='?', help='load: CSV or JSON rates file')
+    args = parser.parse_args()
+
+    from ultra_comprehensive_system import create_app, get_db_connection
+
+    create_app()
+    conn = get_db_connection()
+    try:
+        if args.command == 'load':
+            if not args.path:
+                parser.error('load needs a rates file')
+            print(f"Loaded {load_rates_file(conn, args.path)} rates from {args.path}")
+        else:
+            api_key = os.environ.get('EXCHANGE_RATE_API_KEY')
+            if not api_key:
+                parser.error('EXCHANGE_RATE_API_KEY is not set')
+            print(f"Stored {fetch_latest_rates(conn, api_key)} rates for {date.today().isoformat()}")
+    finally:
+        conn.close()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Occupancy & Demand Forecasting
+Seasonal baselines and pickup models per hotel room type, vectorized with NumPy
+"""
+
+import json
+import logging
+from datetime import date, timedelta
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+FORECAST_METRIC = 'demand_forecast'
+HISTORY_DAYS = 364
+HORIZON_DAYS = 90
+MAX_LEAD_DAYS = 90
+MAX_STAY_NIGHTS = 60
+HOTEL_BATCH_SIZE = 100
+
+# julianday() of 0001-01-01 is 1721425.5, so this turns SQLite dates into date.toordinal() values
+ORDINAL_OFFSET = 1721424.5
+
+def _weekday(days):
+    """Monday=0 weekday for ordinal day numbers (scalar or array)"""
+    return (days + 6) % 7
+
+def load_room_type_series(conn, hotel_ids=None):
+    """Load active room types as forecast series: (room_type_ids, hotel_ids, total_rooms)"""
+    query = 'SELECT id, hotel_id, COALESCE(total_rooms, 10) FROM room_types WHERE is_active = 1'
+    params = ()
+    if hotel_ids is not None:
+        query += f' AND hotel_id IN ({",".join("?" * len(hotel_ids))})'
+        params = tuple(hotel_ids)
+    query += ' ORDER BY id'
+    series = np.array(conn.execute(query, params).fetchall(), dtype=np.int64).reshape(-1, 3)
+    return series[:, 0], series[:, 1], series[:, 2]
+
+def load_stay_nights(conn, room_type_ids, first_day, last_day):
+    """Expand non-cancelled reservations into one row per occupied night.
+
+    Returns (series_index, stay_day, lead) arrays, where series_index points into
+    room_type_ids, stay_day is an ordinal day and lead is days between booking and night.
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    if len(room_type_ids) == 0:
+        return empty, empty, empty
+
+    rows = conn.execute(f'''
+        SELECT room_type_id,
+               CAST(julianday(check_in) - {ORDINAL_OFFSET} AS INTEGER),
+               CAST(julianday(check_out) - {ORDINAL_OFFSET} AS INTEGER),
+               CAST(julianday(date(COALESCE(created_at, check_in))) - {ORDINAL_OFFSET} AS INTEGER)
+        FROM reservations
+        WHERE status != 'cancelled' AND check_out > ? AND check_in < ?
+          AND room_type_id BETWEEN ? AND ?
+    ''', (
+        date.fromordinal(first_day).isoformat(),
+        date.fromordinal(last_day).isoformat(),
+        int(room_type_ids[0]),
+        int(room_type_ids[-1])
+    )).fetchall()
+    data = np.array(rows, dtype=np.int64).reshape(-1, 4)
+
+    # Map room_type_id -> series index, dropping reservations for inactive room types
+    series_index = np.searchsorted(room_type_ids, data[:, 0])
+    known = series_index < len(room_type_ids)
+    known[known] = room_type_ids[series_index[known]] == data[known, 0]
+    data, series_index = data[known], series_index[known]
+
+    nights = np.clip(data[:, 2] - data[:, 1], 0, MAX_STAY_NIGHTS)
+    total = int(nights.sum())
+    if total == 0:
+        return empty, empty, empty
+    offsets = np.arange(total) - np.repeat(np.cumsum(nights) - nights, nights)
+    stay_day = np.repeat(data[:, 1], nights) + offsets
+    lead = np.clip(stay_day - np.repeat(data[:, 3], nights), 0, MAX_LEAD_DAYS)
+    series_index = np.repeat(series_index, nights)
+
+    in_window = (stay_day >= first_day) & (stay_day < last_day)
+    return series_index[in_window], stay_day[in_window], lead[in_window]
+
+def fit_demand_model(series_index, stay_day, lead, n_series, today, history_days=HISTORY_DAYS):
+    """Fit day-of-week baselines and cumulative pickup curves from historical nights.
+
+    baseline[s, dow] is the mean room-nights sold per night; pickup[s, dow, l] is the mean
+    number of room-nights booked less than l days before arrival.
+    """
+    lead_buckets = MAX_LEAD_DAYS + 1
+    history = (stay_day >= today - history_days) & (stay_day < today)
+    s, dow, l = series_index[history], _weekday(stay_day[history]), lead[history]
+
+    nights_per_weekday = np.bincount(_weekday(np.arange(today - history_days, today)), minlength=7)
+    nights_per_weekday = np.maximum(nights_per_weekday, 1)
+
+    baseline = np.bincount(s * 7 + dow, minlength=n_series * 7).reshape(n_series, 7)
+    baseline = baseline / nights_per_weekday
+
+    by_lead = np.bincount((s * 7 + dow) * lead_buckets + l, minlength=n_series * 7 * lead_buckets)
+    by_lead = by_lead.reshape(n_series, 7, lead_buckets) / nights_per_weekday[None, :, None]
+    pickup = np.zeros_like(by_lead)
+    pickup[:, :, 1:] = np.cumsum(by_lead, axis=2)[:, :, :-1]
+    return baseline, pickup
+
+def on_books_matrix(series_index, stay_day, n_series, first_day, horizon):
+    """Count room-nights already sold per series and night as a (series, horizon) matrix"""
+    window = (stay_day >= first_day) & (stay_day < first_day + horizon)
+    return np.bincount(
+        series_index[window] * horizon + (stay_day[window] - first_day),
+        minlength=n_series * horizon
+    ).reshape(n_series, horizon).astype(float)
+
+def forecast_demand(series_index, stay_day, baseline, pickup, capacity, today, horizon=HORIZON_DAYS):
+    """Forecast room-nights for each series and future night as a (series, horizon) matrix"""
+    on_books = on_books_matrix(series_index, stay_day, len(capacity), today, horizon)
+
+    days_out = np.arange(horizon)
+    dow = _weekday(today + days_out)
+    lead = np.minimum(days_out, MAX_LEAD_DAYS)
+
+    pickup_estimate = on_books + pickup[:, dow, lead]
+    seasonal = baseline[:, dow]
+    # Trust the pickup model close to arrival and lean on the seasonal baseline further out
+    weight = 1.0 - lead / (MAX_LEAD_DAYS + 1.0)
+    forecast = weight * pickup_estimate + (1.0 - weight) * seasonal
+    forecast = np.clip(np.maximum(forecast, on_books), 0, capacity[:, None])
+    return {
+        'on_books': on_books,
+        'baseline': seasonal,
+        'forecast': forecast,
+        'occupancy': forecast / np.maximum(capacity[:, None], 1)
+    }
+
+def write_forecasts(conn, hotel_ids, room_type_ids, today, result):
+    """Replace stored forecasts for the given series in analytics_data"""
+    n_series, horizon = result['forecast'].shape
+    unique_hotels = sorted(set(hotel_ids.tolist()))
+    if unique_hotels:
+        conn.execute(f'''
+            DELETE FROM analytics_data
+            WHERE metric_name = ? AND hotel_id IN ({",".join("?" * len(unique_hotels))})
+        ''', (FORECAST_METRIC,) + tuple(unique_hotels))
+
+    dates = [date.fromordinal(today + offset).isoformat() for offset in range(horizon)]
+    forecast = np.round(result['forecast'], 2).tolist()
+    occupancy = np.round(result['occupancy'], 4).tolist()
+    on_books = result['on_books'].astype(int).tolist()
+    baseline = np.round(result['baseline'], 2).tolist()
+
+    rows = []
+    for s, (hotel_id, room_type_id) in enumerate(zip(hotel_ids.tolist(), room_type_ids.tolist())):
+        for d in range(horizon):
+            rows.append((
+                hotel_id, FORECAST_METRIC, forecast[s][d], 'forecast', 'daily', dates[d],
+                json.dumps({
+                    'room_type_id': room_type_id,
+                    'occupancy': occupancy[s][d],
+                    'on_books': on_books[s][d],
+                    'baseline': baseline[s][d]
+                })
+            ))
+    conn.executemany('''
+        INSERT INTO analytics_data (
+            hotel_id, metric_name, metric_value, metric_type, time_period, date_recorded, additional_data
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    return len(rows)
+
+def run_forecast(conn, hotel_ids=None, today=None, horizon=HORIZON_DAYS):
+    """Fit and store forecasts for one batch of hotels (all hotels when hotel_ids is None)"""
+    today = (today or date.today()).toordinal()
+    room_type_ids, series_hotels, capacity = load_room_type_series(conn, hotel_ids)
+    series_index, stay_day, lead = load_stay_nights(
+        conn, room_type_ids, today - HISTORY_DAYS, today + horizon
+    )
+    baseline, pickup = fit_demand_model(series_index, stay_day, lead, len(room_type_ids), today)
+    result = forecast_demand(series_index, stay_day, baseline, pickup, capacity, today, horizon)
+    written = write_forecasts(conn, series_hotels, room_type_ids, today, result)
+    conn.commit()
+    return written
+
+def run_nightly_forecast(conn, today=None, horizon=HORIZON_DAYS, batch_size=HOTEL_BATCH_SIZE):
+    """Forecast every active hotel in batches to keep memory bounded"""
+    hotel_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM hotels WHERE status = 'active' ORDER BY id"
+    ).fetchall()]
+    written = 0
+    for start in range(0, len(hotel_ids), batch_size):
+        written += run_forecast(conn, hotel_ids[start:start + batch_size], today, horizon)
+    logger.info(f"Nightly forecast stored {written} rows for {len(hotel_ids)} hotels")
+    return written
+
+def get_stored_forecast(conn, hotel_id, start_date=None, days=HORIZON_DAYS):
+    """Read stored forecasts for a hotel, grouped by room type"""
+    start_date = start_date or date.today()
+    end_date = start_date + timedelta(days=days)
+    rows = conn.execute('''
+        SELECT date_recorded, metric_value, additional_data
+        FROM analytics_data
+        WHERE hotel_id = ? AND metric_name = ? AND date_recorded >= ? AND date_recorded < ?
+        ORDER BY date_recorded
+    ''', (hotel_id, FORECAST_METRIC, start_date.isoformat(), end_date.isoformat())).fetchall()
+
+    forecasts = {}
+    for date_recorded, metric_value, additional_data in rows:
+        details = json.loads(additional_data)
+        forecasts.setdefault(details['room_type_id'], []).append({
+            'date': date_recorded,
+            'forecast': metric_value,
+            'occupancy': details['occupancy'],
+            'on_books': details['on_books'],
+            'baseline': details['baseline']
+        })
+    return forecasts
+
+if __name__ == '__main__':
+    from ultra_comprehensive_system import create_app, shards
+
+    create_app()
+    shards.run_everywhere(run_nightly_forecast)
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Guest Deduplication
+Links customers, reservation guests and email senders of a hotel into one guest profile
+
+Usage: python guest_dedup.py   (incremental; picks up rows added since the last run)
+"""
+
+import re
+import logging
+import unicodedata
+from difflib import SequenceMatcher
+from email.utils import parseaddr
+
+from loyalty import get_balance
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 20000
+# Fuzzy comparisons are skipped in blocks this large: the key is too common to tell guests apart
+MAX_BLOCK_SIZE = 50
+NAME_SIMILARITY = 0.85
+EMAIL_SIMILARITY = 0.85
+PHONE_DIGITS = 9
+
+# Mailboxes that ignore dots in the local part, and domains that are the same mailbox
+DOTLESS_DOMAINS = ('gmail.com',)
+DOMAIN_ALIASES = {'googlemail.com': 'gmail.com'}
+# dotless ı and ß do not decompose under NFKD
+NAME_FOLDS = str.maketrans({'ı': 'i', 'ß': 'ss', 'ø': 'o', 'æ': 'ae', 'ł': 'l'})
+# Anything beyond a bare address needs the full parser: display names, comments, lists
+ADDRESS_SYNTAX = re.compile(r'[<>"(),;:\\]')
+# The usual Name <address> / "Name" <address> form, parsed without it
+NAMED_ADDRESS = re.compile(r'\s*"?([^"<>(),;:\\]*)"?\s*<([^<>"(),;:\\\s]+)>\s*$')
+SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'), **dict.fromkeys('cgjkqsxz', '2'), **dict.fromkeys('dt', '3'),
+    'l': '4', **dict.fromkeys('mn', '5'), 'r': '6'
+}
+
+# Customers go first so a guest's profile points at the CRM record where there is one.
+# Each source yields (id, hotel_id, email, phone, name) in id order.
+SOURCES = {
+    'customer': '''
+        SELECT id, hotel_id, email, phone, TRIM(COALESCE(first_name, '') || ' ' || COALESCE(last_name, ''))
+        FROM customers WHERE id > ? ORDER BY id LIMIT ?
+    ''',
+    'reservation': '''
+        SELECT id, hotel_id, guest_email, guest_phone, guest_name
+        FROM reservations WHERE id > ? ORDER BY id LIMIT ?
+    ''',
+    # Only mail the guest sent; the hotel's own replies carry the hotel's address
+    'email': '''
+        SELECT e.id, e.hotel_id, e.from_email, NULL, NULL
+        FROM email_logs e JOIN hotels h ON h.id = e.hotel_id
+        WHERE e.id > ? AND e.from_email NOT IN (h.email, h.admin_email) ORDER BY e.id LIMIT ?
+    ''',
+}
+
+GUEST_DEDUP_SCHEMA = [
+    # merged_into points from a guest absorbed by a later merge to the one that survived
+    '''
+    CREATE TABLE IF NOT EXISTS guests (
+        id INTEGER PRIMARY KEY,
+        hotel_id INTEGER NOT NULL,
+        customer_id INTEGER,
+        email TEXT,
+        name TEXT,
+        phone TEXT,
+        records INTEGER NOT NULL DEFAULT 0,
+        merged_into INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (hotel_id) REFERENCES hotels (id),
+        FOREIGN KEY (customer_id) REFERENCES customers (id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_guests_hotel ON guests (hotel_id, merged_into)',
+    # One row per source row, with the normalized values its blocking keys come from
+    '''
+    CREATE TABLE IF NOT EXISTS guest_records (
+        source TEXT NOT NULL,
+        source_id INTEGER NOT NULL,
+        hotel_id INTEGER NOT NULL,
+        guest_id INTEGER NOT NULL,
+        email TEXT,
+        phone TEXT,
+        name TEXT,
+        name_key TEXT,
+        PRIMARY KEY (source, source_id)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_guest_records_email ON guest_records (hotel_id, email) WHERE email IS NOT NULL',
+    'CREATE INDEX IF NOT EXISTS idx_guest_records_phone ON guest_records (hotel_id, phone) WHERE phone IS NOT NULL',
+    'CREATE INDEX IF NOT EXISTS idx_guest_records_name ON guest_records (hotel_id, name_key) WHERE name_key IS NOT NULL',
+    'CREATE INDEX IF NOT EXISTS idx_guest_records_guest ON guest_records (guest_id)',
+]
+
+def split_address(value):
+    """(display name, address) of a From-style value; bare addresses skip the RFC 5322 parser"""
+    value = value or ''
+    if not ADDRESS_SYNTAX.search(value):
+        return '', value
+    match = NAMED_ADDRESS.match(value)
+    if match:
+        return match.group(1).strip(), match.group(2)
+    return parseaddr(value)
+
+def normalize_email(value):
+    """Lower-cased address without +tags (and without dots where the mailbox ignores them)"""
+    address = split_address(value)[1].strip().lower()
+    local, at, domain = address.rpartition('@')
+    if not at or not local or '.' not in domain:
+        return None
+    domain = DOMAIN_ALIASES.get(domain, domain)
+    local = local.split('+', 1)[0]
+    if domain in DOTLESS_DOMAINS:
+        local = local.replace('.', '')
+    return f'{local}@{domain}' if local else None
+
+def normalize_phone(value):
+    """Last PHONE_DIGITS digits, so +90 532..., 0532... and 532... agree"""
+    digits = re.sub(r'\D', '', value or '')
+    return digits[-PHONE_DIGITS:] if len(digits) >= 7 else None
+
+def normalize_name(value):
+    """Case-, accent- and punctuation-free name; Turkish İ/ı fold to i"""
+    value = unicodedata.normalize('NFKD', (value or '').translate(NAME_FOLDS)).casefold().translate(NAME_FOLDS)
+    value = ''.join(char if char.isalpha() else ' ' for char in value if not unicodedata.combining(char))
+    return ' '.join(value.split()) or None
+
+def soundex(word):
+    """Four-character American Soundex code"""
+    codes = [SOUNDEX_CODES.get(char, '') for char in word]
+    code, previous = word[0].upper(), codes[0]
+    for char, digit in zip(word[1:], codes[1:]):
+        if digit and digit != previous:
+            code += digit
+        if char not in 'hw':
+            previous = digit
+    return (code + '000')[:4]
+
+def name_key(name, email):
+    """Blocking key: Soundex of the last name, first initial and email domain"""
+    if not name:
+        return None
+    tokens = name.split()
+    return f"{soundex(tokens[-1])}{tokens[0][0]}@{email.rpartition('@')[2] if email else '-'}"
+
+def make_record(source, source_id, hotel_id, email, phone, name):
+    """Normalized guest record as stored in guest_records (guest_id left out)"""
+    if name is None:
+        # Email senders carry their name only in the From header
+        name = split_address(email)[0] or None
+    email, name = normalize_email(email), normalize_name(name)
+    return (source, source_id, hotel_id, email, normalize_phone(phone), name, name_key(name, email))
+
+def _similarity(a, b):
+    """Similarity ratio of two strings, 0..1"""
+    matcher = SequenceMatcher(None, a, b)
+    return matcher.ratio() if matcher.quick_ratio() >= min(NAME_SIMILARITY, EMAIL_SIMILARITY) else 0.0
+
+def _mailbox(email):
+    """Letters and digits of an address's local part, compared separately"""
+    local = email.rpartition('@')[0]
+    return ''.join(char for char in local if char.isalpha()), ''.join(char for char in local if char.isdigit())
+
+def same_guest(a, b):
+    """Whether two normalized records (..., email, phone, name, name_key) are the same guest.
+
+    Equal addresses always match. Otherwise the names must be alike and either the phone
+    or a near-identical mailbox must agree; digits in mailboxes must agree exactly, since
+    john1@ and john2@ are usually two people.
+    """
+    email_a, phone_a, name_a = a[3:6]
+    email_b, phone_b, name_b = b[3:6]
+    if email_a and email_a == email_b:
+        return True
+    if not (name_a and name_b and _similarity(name_a, name_b) >= NAME_SIMILARITY):
+        return False
+    if phone_a and phone_a == phone_b:
+        return True
+    if email_a and email_b and email_a.rpartition('@')[2] == email_b.rpartition('@')[2]:
+        letters_a, digits_a = _mailbox(email_a)
+        letters_b, digits_b = _mailbox(email_b)
+        return digits_a == digits_b and _similarity(letters_a, letters_b) >= EMAIL_SIMILARITY
+    return False
+
+class _Components:
+    """Union-find over hashable nodes"""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, node):
+        root = node
+        while self.parent.setdefault(root, root) != root:
+            root = self.parent[root]
+        while node != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+
+def _existing_candidates(conn, records):
+    """Stored records sharing an email, phone or name key with the batch, via the block indexes"""
+    conn.execute('DROP TABLE IF EXISTS temp.dedup_keys')
+    conn.execute('CREATE TEMP TABLE dedup_keys (hotel_id INTEGER, kind TEXT, key TEXT)')
+    conn.executemany('INSERT INTO temp.dedup_keys VALUES (?, ?, ?)', {
+        (record[2], kind, value)
+        for record in records
+        for kind, value in (('email', record[3]), ('phone', record[4]), ('name_key', record[6]))
+        if value
+    })
+    rows = conn.execute('''
+        SELECT r.source, r.source_id, r.hotel_id, r.email, r.phone, r.name, r.name_key, r.guest_id
+        FROM temp.dedup_keys k JOIN guest_records r ON r.hotel_id = k.hotel_id AND r.email = k.key
+        WHERE k.kind = 'email'
+        UNION
+        SELECT r.source, r.source_id, r.hotel_id, r.email, r.phone, r.name, r.name_key, r.guest_id
+        FROM temp.dedup_keys k JOIN guest_records r ON r.hotel_id = k.hotel_id AND r.phone = k.key
+        WHERE k.kind = 'phone'
+        UNION
+        SELECT r.source, r.source_id, r.hotel_id, r.email, r.phone, r.name, r.name_key, r.guest_id
+        FROM temp.dedup_keys k JOIN guest_records r ON r.hotel_id = k.hotel_id AND r.name_key = k.key
+        WHERE k.kind = 'name_key'
+    ''').fetchall()
+    conn.execute('DROP TABLE temp.dedup_keys')
+    return rows
+
+def cluster(records, existing):
+    """Group new records with each other and with stored guests.
+
+    Candidate pairs come only from shared blocking keys (email, phone, name key), so the
+    work grows with block sizes rather than with the square of the guest count. Pairs of
+    two stored records were settled by an earlier run and are not compared again.
+    Returns the component root of every new record and the stored guest ids per root.
+    """
+    components = _Components()
+    for record in existing:
+        components.union(('guest', record[7]), ('record', record[0], record[1]))
+    nodes = [('new', n) for n in range(len(records))] + [('record', row[0], row[1]) for row in existing]
+    rows = list(records) + list(existing)
+    blocks = {}
+    for index, row in enumerate(rows):
+        for kind, position in (('email', 3), ('phone', 4), ('name_key', 6)):
+            if row[position]:
+                blocks.setdefault((row[2], kind, row[position]), []).append(index)
+
+    new_count = len(records)
+    for (_, kind, _), members in blocks.items():
+        if kind == 'email':
+            for index in members[1:]:
+                components.union(nodes[members[0]], nodes[index])
+            continue
+        if len(members) > MAX_BLOCK_SIZE:
+            continue
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                if (first < new_count or second < new_count) and same_guest(rows[first], rows[second]):
+                    components.union(nodes[first], nodes[second])
+
+    guests_by_root = {}
+    for row in existing:
+        guests_by_root.setdefault(components.find(('guest', row[7])), set()).add(row[7])
+    return [components.find(('new', n)) for n in range(new_count)], guests_by_root
+
+def _write_batch(conn, records, roots, guests_by_root):
+    """Assign guest ids, merge guests that now belong together and store the new records"""
+    next_id = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM guests').fetchone()[0]
+    guest_for_root, new_guests, merges = {}, [], []
+    for record, root in zip(records, roots):
+        if root in guest_for_root:
+            continue
+        stored = guests_by_root.get(root)
+        if stored:
+            survivor = min(stored)
+            merges.extend((survivor, absorbed) for absorbed in stored if absorbed != survivor)
+        else:
+            survivor = next_id
+            next_id += 1
+            new_guests.append((survivor, record[2], record[3], record[5], record[4]))
+        guest_for_root[root] = survivor
+
+    conn.executemany('INSERT INTO guests (id, hotel_id, email, name, phone) VALUES (?, ?, ?, ?, ?)', new_guests)
+    conn.executemany('UPDATE guest_records SET guest_id = ? WHERE guest_id = ?', merges)
+    conn.executemany('''
+        UPDATE guests SET merged_into = ?, records = 0, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+    ''', merges)
+    conn.executemany('''
+        INSERT INTO guest_records (source, source_id, hotel_id, email, phone, name, name_key, guest_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [record + (guest_for_root[root],) for record, root in zip(records, roots)])
+
+    touched = set(guest_for_root.values())
+    conn.execute('DROP TABLE IF EXISTS temp.dedup_touched')
+    conn.execute('CREATE TEMP TABLE dedup_touched (guest_id INTEGER PRIMARY KEY)')
+    conn.executemany('INSERT INTO temp.dedup_touched VALUES (?)', [(guest_id,) for guest_id in touched])
+    # The oldest customer record is the profile's CRM record; gaps are filled from any record
+    conn.execute('''
+        UPDATE guests SET
+            records = (SELECT COUNT(*) FROM guest_records r WHERE r.guest_id = guests.id),
+            customer_id = (
+                SELECT MIN(source_id) FROM guest_records r WHERE r.guest_id = guests.id AND r.source = 'customer'
+            ),
+            email = COALESCE(email, (
+                SELECT MIN(email) FROM guest_records r WHERE r.guest_id = guests.id
+            )),
+            name = COALESCE(name, (SELECT MIN(name) FROM guest_records r WHERE r.guest_id = guests.id)),
+            phone = COALESCE(phone, (SELECT MIN(phone) FROM guest_records r WHERE r.guest_id = guests.id)),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id IN (SELECT guest_id FROM temp.dedup_touched)
+    ''')
+    merged_loyalty = _merge_loyalty(conn)
+    conn.execute('DROP TABLE temp.dedup_touched')
+    return len(new_guests), len(merges), merged_loyalty
+
+def _merge_loyalty(conn):
+    """Move the points of duplicate customer records onto the guest's CRM record"""
+    duplicates = conn.execute('''
+        SELECT g.hotel_id, g.customer_id, r.source_id FROM temp.dedup_touched t
+        JOIN guests g ON g.id = t.guest_id
+        JOIN guest_records r ON r.guest_id = g.id AND r.source = 'customer' AND r.source_id != g.customer_id
+    ''').fetchall()
+    transfers = []
+    for hotel_id, customer_id, duplicate_id in duplicates:
+        balance = get_balance(conn, duplicate_id)
+        if balance:
+            reference = f'merged customer {duplicate_id} into {customer_id}'
+            transfers.append((hotel_id, duplicate_id, -balance, reference))
+            transfers.append((hotel_id, customer_id, balance, reference))
+    conn.executemany('''
+        INSERT INTO loyalty_entries (hotel_id, customer_id, points, entry_type, reference)
+        VALUES (?, ?, ?, 'adjust', ?)
+    ''', transfers)
+    return len(transfers) // 2
+
+def run_dedup(conn, batch_size=BATCH_SIZE):
+    """Link every source row added since the last run, batch_size rows per transaction"""
+    totals = {'records': 0, 'guests': 0, 'merged': 0, 'loyalty_transfers': 0}
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        for source, query in SOURCES.items():
+            while True:
+                batch = _link_batch(conn, source, query, batch_size)
+                if batch is None:
+                    break
+                records, created, merged, transfers = batch
+                totals['records'] += records
+                totals['guests'] += created
+                totals['merged'] += merged
+                totals['loyalty_transfers'] += transfers
+    finally:
+        conn.isolation_level = previous_isolation
+    if totals['records']:
+        logger.info(f"Guest dedup: {totals}")
+    return totals
+
+def _link_batch(conn, source, query, batch_size):
+    """Link the next batch of one source in a single write transaction; None when none are left.
+
+    BEGIN IMMEDIATE takes the write lock before the high-water mark and the next guest id
+    are read, so a concurrent run or a booking cannot claim the same rows or ids.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        last_id = conn.execute(
+            'SELECT COALESCE(MAX(source_id), 0) FROM guest_records WHERE source = ?', (source,)
+        ).fetchone()[0]
+        rows = conn.execute(query, (last_id, batch_size)).fetchall()
+        if not rows:
+            conn.execute('COMMIT')
+            return None
+        records = [make_record(source, *row) for row in rows]
+        roots, guests_by_root = cluster(records, _existing_candidates(conn, records))
+        created, merged, transfers = _write_batch(conn, records, roots, guests_by_root)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return len(records), created, merged, transfers
+
+def guest_stats(conn, hotel_id):
+    """Distinct guests of a hotel next to its raw customer and reservation guest counts"""
+    guests, with_customer = conn.execute('''
+        SELECT COUNT(*), COUNT(customer_id) FROM guests WHERE hotel_id = ? AND merged_into IS NULL
+    ''', (hotel_id,)).fetchone()
+    duplicate_customers = conn.execute('''
+        SELECT COUNT(*) FROM guest_records r JOIN guests g ON g.id = r.guest_id
+        WHERE r.hotel_id = ? AND r.source = 'customer' AND r.source_id != g.customer_id
+    ''', (hotel_id,)).fetchone()[0]
+    return {
+        'hotel_id': hotel_id,
+        'guests': guests,
+        'guests_with_customer_record': with_customer,
+        'duplicate_customers': duplicate_customers,
+        'customers': conn.execute('SELECT COUNT(*) FROM customers WHERE hotel_id = ?', (hotel_id,)).fetchone()[0],
+        'reservation_emails': conn.execute('''
+            SELECT COUNT(DISTINCT lower(guest_email)) FROM reservations WHERE hotel_id = ?
+        ''', (hotel_id,)).fetchone()[0]
+    }
+
+def get_guest(conn, hotel_id, guest_id):
+    """A guest profile with its linked records, following merges; None when unknown"""
+    guest = None
+    while guest_id is not None:
+        cursor = conn.execute('SELECT * FROM guests WHERE id = ? AND hotel_id = ?', (guest_id, hotel_id))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        guest = dict(zip([column[0] for column in cursor.description], row))
+        guest_id = guest['merged_into']
+    cursor = conn.execute('''
+        SELECT source, source_id, email, phone, name FROM guest_records WHERE guest_id = ? ORDER BY source, source_id
+    ''', (guest['id'],))
+    columns = [column[0] for column in cursor.description]
+    guest['linked_records'] = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    return guest
+
+if __name__ == '__main__':
+    from ultra_comprehensive_system import create_app, shards
+
+    create_app()
+    shards.run_everywhere(run_dedup)
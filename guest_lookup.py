@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Reservation Lookup
+Indexed lookups by confirmation code and guest email with a hot-reservation LRU cache
+"""
+
+import logging
+
+from caching import LRUCache
+from confirmation_codes import confirmation_code_ranges, normalize_confirmation_code
+
+logger = logging.getLogger(__name__)
+
+EMAIL_LOOKUP_LIMIT = 20
+DATE_RANGE_LIMIT = 500
+# invalidate_reservation only reaches this process, so this bounds how long another
+# worker may serve a reservation that changed
+RESERVATION_CACHE_TTL = 5
+
+LOOKUP_COLUMNS = '''
+    id, hotel_id, room_type_id, confirmation_code, guest_name, guest_email, guest_phone,
+    check_in, check_out, adults, children, infants, total_price, currency,
+    payment_status, status, special_requests, created_at, updated_at
+'''
+
+# Hot reservations by confirmation code. Updates made through this process invalidate
+# entries directly; the TTL bounds staleness for updates made by other workers.
+reservation_cache = LRUCache(maxsize=2048, ttl=RESERVATION_CACHE_TTL)
+
+def _rows_to_dicts(cursor):
+    """Materialize a cursor as a list of dicts keyed by column name"""
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def find_by_confirmation_code(conn, code, hotel_id=None):
+    """Reservation for a confirmation code (served from the cache when hot), or None"""
+    code = normalize_confirmation_code(code)
+    reservation = reservation_cache.get(code)
+    if reservation is None:
+        rows = _rows_to_dicts(conn.execute(
+            f'SELECT {LOOKUP_COLUMNS} FROM reservations WHERE confirmation_code = ?', (code,)
+        ))
+        if not rows:
+            return None
+        reservation = rows[0]
+        reservation_cache.set(code, reservation)
+    if hotel_id is not None and reservation['hotel_id'] != hotel_id:
+        return None
+    return dict(reservation)
+
+def find_by_guest_email(conn, hotel_id, email, limit=EMAIL_LOOKUP_LIMIT):
+    """Most recent reservations of a guest email within one hotel (case-insensitive)"""
+    return _rows_to_dicts(conn.execute(f'''
+        SELECT {LOOKUP_COLUMNS} FROM reservations
+        WHERE hotel_id = ? AND lower(guest_email) = ?
+        ORDER BY check_in DESC
+        LIMIT ?
+    ''', (hotel_id, (email or '').strip().lower(), limit)))
+
+def find_by_booking_date(conn, hotel_id, start_date, end_date, limit=DATE_RANGE_LIMIT):
+    """Reservations booked in [start_date, end_date), via range scans on the code index.
+
+    The unary + keeps the planner from picking the (hotel_id, email) index instead.
+    """
+    reservations = []
+    for low, high, length in confirmation_code_ranges(start_date, end_date):
+        reservations.extend(_rows_to_dicts(conn.execute(f'''
+            SELECT {LOOKUP_COLUMNS} FROM reservations
+            WHERE confirmation_code >= ? AND confirmation_code < ?
+              AND length(confirmation_code) = ? AND +hotel_id = ?
+            ORDER BY confirmation_code
+            LIMIT ?
+        ''', (low, high, length, hotel_id, limit - len(reservations)))))
+        if len(reservations) >= limit:
+            break
+    return reservations
+
+def invalidate_reservation(code):
+    """Forget a cached reservation after it changes"""
+    reservation_cache.pop(normalize_confirmation_code(code))
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Gunicorn Configuration
+Worker model and fork hooks; gunicorn reads this file from the working directory
+
+GUNICORN_WORKER_CLASS selects the concurrency model:
+  gthread (default)  each worker serves GUNICORN_THREADS requests at once
+  gevent             each worker serves GUNICORN_WORKER_CONNECTIONS greenlets (pip install gevent)
+  sync               one request per worker
+"""
+
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    # Patch before the preloaded app creates its locks, thread-locals and sockets, so
+    # they are greenlet-aware in every worker. SQLite calls still run without yielding.
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+# gunicorn turns sync workers into gthread ones whenever threads > 1
+threads = 1 if worker_class == 'sync' else int(os.environ.get('GUNICORN_THREADS', 8))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Import the app once in the master so workers share it copy-on-write (see prefork.py)
+preload_app = True
+
+def when_ready(server):
+    """Warm up the preloaded app in the master, once, before any worker is forked"""
+    if server.cfg.preload_app and os.environ.get('PREFORK_WARMUP', 'true').lower() != 'false':
+        from ultra_comprehensive_system import warm_up_workers
+        warm_up_workers()
+
+def post_fork(server, worker):
+    """Drop state inherited from the master before the worker serves requests"""
+    from ultra_comprehensive_system import reset_after_fork
+    reset_after_fork()
+    server.log.info(f"Worker {worker.pid} ready ({worker_class})")
+
+def worker_exit(server, worker):
+    """Write the worker's buffered usage counters before it goes away"""
+    from ultra_comprehensive_system import usage_meter
+    usage_meter.flush()
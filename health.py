@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Health Probes
+Liveness and cached readiness checks that measure the instance's dependencies
+"""
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+STATUS_OK = 'ok'
+STATUS_DEGRADED = 'degraded'
+STATUS_FAIL = 'fail'
+
+READINESS_TTL = 2.0
+DATABASE_SLOW_MS = 250
+POOL_SATURATION_LIMIT = 0.9
+QUEUE_DEPTH_LIMIT = 1000
+
+def check_database(connection_factory, slow_ms=DATABASE_SLOW_MS):
+    """Round trip to the catalog database: a real read, not just opening the file"""
+    started = time.perf_counter()
+    conn = connection_factory()
+    try:
+        conn.execute("SELECT version FROM cache_versions WHERE name = 'hotels'").fetchone()
+    finally:
+        conn.close()
+    latency_ms = round((time.perf_counter() - started) * 1000, 2)
+    return {'status': STATUS_DEGRADED if latency_ms > slow_ms else STATUS_OK, 'latency_ms': latency_ms}
+
+def check_pool(router, limit=POOL_SATURATION_LIMIT):
+    """Shard connection pool saturation: handles checked out relative to the cap"""
+    stats = router.stats()
+    saturation = round(stats['in_use'] / stats['max_open'], 3) if stats['max_open'] else 0.0
+    stats.update({'status': STATUS_DEGRADED if saturation >= limit else STATUS_OK, 'saturation': saturation})
+    return stats
+
+def check_queue(depth_function, limit=QUEUE_DEPTH_LIMIT):
+    """Backlog of a work queue; degraded beyond limit"""
+    depth = depth_function()
+    return {'status': STATUS_DEGRADED if depth > limit else STATUS_OK, 'depth': depth, 'limit': limit}
+
+class ReadinessProbe:
+    """Named dependency checks whose combined result is cached for a short window.
+
+    critical checks fail readiness (HTTP 503) when they raise or report fail; other
+    checks can only degrade it. Concurrent probes during a refresh get the previous result.
+    """
+
+    def __init__(self, ttl=READINESS_TTL):
+        self.ttl = ttl
+        self._checks = {}
+        self._result = None
+        self._expires = 0.0
+        self._refreshing = threading.Lock()
+
+    def register(self, name, check, critical=False):
+        """Add a check: a callable returning a dict with at least a 'status' key"""
+        self._checks[name] = (check, critical)
+
+    def invalidate(self):
+        """Force the next status() call to run the checks again"""
+        self._expires = 0.0
+
+    def _run(self):
+        """Run every check and combine their statuses"""
+        started = time.perf_counter()
+        checks = {}
+        ready = True
+        degraded = False
+        for name, (check, critical) in self._checks.items():
+            try:
+                result = check()
+            except Exception as e:
+                logger.error(f"Readiness check {name} failed: {e}")
+                result = {'status': STATUS_FAIL, 'error': str(e)}
+            result['critical'] = critical
+            checks[name] = result
+            if result['status'] == STATUS_FAIL and critical:
+                ready = False
+            elif result['status'] != STATUS_OK:
+                degraded = True
+        return {
+            'status': 'unavailable' if not ready else STATUS_DEGRADED if degraded else STATUS_OK,
+            'ready': ready,
+            'checks': checks,
+            'checked_at': time.time(),
+            'check_duration_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def status(self):
+        """Cached readiness result, refreshed by one caller at a time once it expires"""
+        if self._result is None or time.monotonic() >= self._expires:
+            if self._refreshing.acquire(blocking=self._result is None):
+                try:
+                    if self._result is None or time.monotonic() >= self._expires:
+                        self._result = self._run()
+                        self._expires = time.monotonic() + self.ttl
+                finally:
+                    self._refreshing.release()
+        return self._result
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Inventory Calendar Store
+Materialized sold / available / rate arrays per room type, sliced for every calendar read
+"""
+
+import logging
+from datetime import date
+
+from forecasting import ORDINAL_OFFSET, load_stay_nights, on_books_matrix
+from lazy_imports import lazy_import
+from pricing import base_rate_matrix, load_pricing_room_types
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+CALENDAR_DAYS = 400
+HOTEL_BATCH_SIZE = 100
+SOLD_DTYPE = '<i2'
+RATE_DTYPE = '<f4'
+
+INVENTORY_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS inventory_calendars (
+        room_type_id INTEGER PRIMARY KEY,
+        hotel_id INTEGER NOT NULL,
+        start_date DATE NOT NULL,
+        total_rooms INTEGER NOT NULL,
+        sold BLOB NOT NULL,
+        rate BLOB NOT NULL,
+        version INTEGER DEFAULT 1,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (hotel_id) REFERENCES hotels (id),
+        FOREIGN KEY (room_type_id) REFERENCES room_types (id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_inventory_calendars_hotel ON inventory_calendars (hotel_id)',
+]
+
+def _ordinal(value):
+    """Ordinal day number for a date or ISO date string"""
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+def _overlay_recommended_rates(conn, room_type_ids, hotel_ids, rate, first_day, days):
+    """Replace rate-card cells with stored dynamic-pricing recommendations where present"""
+    hotels = sorted(set(hotel_ids.tolist()))
+    rows = conn.execute(f'''
+        SELECT room_type_id, CAST(julianday(stay_date) - {ORDINAL_OFFSET} AS INTEGER), recommended_price
+        FROM rate_recommendations
+        WHERE hotel_id IN ({",".join("?" * len(hotels))}) AND stay_date >= ? AND stay_date < ?
+    ''', tuple(hotels) + (
+        date.fromordinal(first_day).isoformat(), date.fromordinal(first_day + days).isoformat()
+    )).fetchall()
+    if not rows:
+        return
+    data = np.array(rows, dtype=float).reshape(-1, 3)
+    series_index = np.searchsorted(room_type_ids, data[:, 0].astype(np.int64))
+    known = series_index < len(room_type_ids)
+    known[known] = room_type_ids[series_index[known]] == data[known, 0]
+    rate[series_index[known], data[known, 1].astype(np.int64) - first_day] = data[known, 2]
+
+def rebuild_inventory(conn, hotel_ids=None, today=None, days=CALENDAR_DAYS):
+    """Recompute calendars from reservations and re-anchor them at today"""
+    first_day = (today or date.today()).toordinal()
+    room_types = load_pricing_room_types(conn, hotel_ids)
+    room_type_ids = room_types['ids']
+    if len(room_type_ids) == 0:
+        return 0
+
+    series_index, stay_day, _ = load_stay_nights(conn, room_type_ids, first_day, first_day + days)
+    sold = on_books_matrix(series_index, stay_day, len(room_type_ids), first_day, days).astype(SOLD_DTYPE)
+    rate = base_rate_matrix(room_types, first_day, days)
+    _overlay_recommended_rates(conn, room_type_ids, room_types['hotel_ids'], rate, first_day, days)
+    rate = rate.astype(RATE_DTYPE)
+
+    start_date = date.fromordinal(first_day).isoformat()
+    conn.executemany('''
+        INSERT INTO inventory_calendars (room_type_id, hotel_id, start_date, total_rooms, sold, rate)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (room_type_id) DO UPDATE SET
+            hotel_id = excluded.hotel_id,
+            start_date = excluded.start_date,
+            total_rooms = excluded.total_rooms,
+            sold = excluded.sold,
+            rate = excluded.rate,
+            version = inventory_calendars.version + 1,
+            updated_at = CURRENT_TIMESTAMP
+    ''', [
+        (room_type_id, hotel_id, start_date, int(capacity), sold[s].tobytes(), rate[s].tobytes())
+        for s, (room_type_id, hotel_id, capacity) in enumerate(zip(
+            room_type_ids.tolist(), room_types['hotel_ids'].tolist(), room_types['capacity'].tolist()
+        ))
+    ])
+    conn.commit()
+    return len(room_type_ids)
+
+def run_nightly_rebuild(conn, today=None, batch_size=HOTEL_BATCH_SIZE):
+    """Roll every active hotel's calendar window forward"""
+    hotel_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM hotels WHERE status = 'active' ORDER BY id"
+    ).fetchall()]
+    rebuilt = 0
+    for start in range(0, len(hotel_ids), batch_size):
+        rebuilt += rebuild_inventory(conn, hotel_ids[start:start + batch_size], today)
+    logger.info(f"Inventory rebuilt for {rebuilt} room types across {len(hotel_ids)} hotels")
+    return rebuilt
+
+def apply_reservation_change(conn, room_type_id, check_in, check_out, delta):
+    """Add delta sold rooms to each night of a stay and refresh those nights' rates.
+
+    Runs inside the caller's transaction. Returns False when the room type has no calendar yet.
+    """
+    row = conn.execute(
+        'SELECT start_date, sold FROM inventory_calendars WHERE room_type_id = ?', (room_type_id,)
+    ).fetchone()
+    if row is None:
+        return False
+
+    start_day = _ordinal(row[0])
+    sold = np.frombuffer(row[1], dtype=SOLD_DTYPE).copy()
+    first = max(_ordinal(check_in) - start_day, 0)
+    last = min(_ordinal(check_out) - start_day, len(sold))
+    if last <= first:
+        return True
+    sold[first:last] = np.maximum(sold[first:last] + delta, 0)
+
+    conn.execute('''
+        UPDATE inventory_calendars
+        SET sold = ?, version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE room_type_id = ?
+    ''', (sold.tobytes(), room_type_id))
+    refresh_rates(conn, room_type_id, date.fromordinal(start_day + first), date.fromordinal(start_day + last))
+    return True
+
+def refresh_rates(conn, room_type_id, first_date, last_date):
+    """Copy stored recommendations for [first_date, last_date) into the rate array"""
+    row = conn.execute(
+        'SELECT start_date, rate FROM inventory_calendars WHERE room_type_id = ?', (room_type_id,)
+    ).fetchone()
+    if row is None:
+        return False
+    recommendations = conn.execute(f'''
+        SELECT CAST(julianday(stay_date) - {ORDINAL_OFFSET} AS INTEGER), recommended_price
+        FROM rate_recommendations
+        WHERE room_type_id = ? AND stay_date >= ? AND stay_date < ?
+    ''', (room_type_id, first_date.isoformat(), last_date.isoformat())).fetchall()
+    if not recommendations:
+        return True
+
+    rate = np.frombuffer(row[1], dtype=RATE_DTYPE).copy()
+    data = np.array(recommendations, dtype=float)
+    offsets = data[:, 0].astype(np.int64) - _ordinal(row[0])
+    in_window = (offsets >= 0) & (offsets < len(rate))
+    rate[offsets[in_window]] = data[in_window, 1]
+    conn.execute('''
+        UPDATE inventory_calendars
+        SET rate = ?, version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE room_type_id = ?
+    ''', (rate.tobytes(), room_type_id))
+    return True
+
+def sync_reservation(conn, before=None, after=None):
+    """Apply a reservation insert (before=None), update, or cancel to the calendars.
+
+    before/after are reservation rows or dicts with room_type_id, check_in, check_out and status.
+    """
+    for reservation, delta in ((before, -1), (after, 1)):
+        if reservation is None or reservation['status'] == 'cancelled' or not reservation['room_type_id']:
+            continue
+        apply_reservation_change(
+            conn, reservation['room_type_id'], reservation['check_in'], reservation['check_out'], delta
+        )
+
+def load_hotel_calendars(conn, hotel_id):
+    """Load every calendar of a hotel as zero-copy array views over the stored blobs"""
+    calendars = {}
+    for room_type_id, start_date, total_rooms, sold, rate in conn.execute('''
+        SELECT room_type_id, start_date, total_rooms, sold, rate
+        FROM inventory_calendars WHERE hotel_id = ? ORDER BY room_type_id
+    ''', (hotel_id,)):
+        calendars[room_type_id] = {
+            'start': _ordinal(start_date),
+            'total_rooms': total_rooms,
+            'sold': np.frombuffer(sold, dtype=SOLD_DTYPE),
+            'rate': np.frombuffer(rate, dtype=RATE_DTYPE)
+        }
+    return calendars
+
+def _window(calendar, first_day, last_day):
+    """Array slice bounds and first ordinal day for [first_day, last_day) clipped to the calendar"""
+    first = min(max(first_day - calendar['start'], 0), len(calendar['sold']))
+    last = min(max(last_day - calendar['start'], first), len(calendar['sold']))
+    return first, last, calendar['start'] + first
+
+def get_calendar(conn, hotel_id, start_date=None, days=365):
+    """Availability calendar per room type for the admin UI"""
+    first_day = (start_date or date.today()).toordinal()
+    result = {}
+    for room_type_id, calendar in load_hotel_calendars(conn, hotel_id).items():
+        first, last, day = _window(calendar, first_day, first_day + days)
+        sold = calendar['sold'][first:last]
+        result[room_type_id] = {
+            'start_date': date.fromordinal(day).isoformat(),
+            'total_rooms': calendar['total_rooms'],
+            'sold': sold.tolist(),
+            'available': (calendar['total_rooms'] - sold).tolist(),
+            'rate': np.round(calendar['rate'][first:last].astype(float), 2).tolist()
+        }
+    return result
+
+def get_channel_ari(conn, hotel_id, start_date=None, days=365):
+    """Availability, rates and inventory rows for channel-manager sync"""
+    first_day = (start_date or date.today()).toordinal()
+    rows = []
+    for room_type_id, calendar in load_hotel_calendars(conn, hotel_id).items():
+        first, last, day = _window(calendar, first_day, first_day + days)
+        available = (calendar['total_rooms'] - calendar['sold'][first:last]).tolist()
+        rates = np.round(calendar['rate'][first:last].astype(float), 2).tolist()
+        for offset, (rooms, rate) in enumerate(zip(available, rates)):
+            rows.append({
+                'room_type_id': room_type_id,
+                'date': date.fromordinal(day + offset).isoformat(),
+                'available': rooms,
+                'rate': rate
+            })
+    return rows
+
+def get_stay_availability(conn, hotel_id, check_in, check_out):
+    """Bookable rooms and total price per room type for a stay, as shown by the booking widget"""
+    first_day, last_day = _ordinal(check_in), _ordinal(check_out)
+    result = {}
+    if last_day <= first_day:
+        return result
+    for room_type_id, calendar in load_hotel_calendars(conn, hotel_id).items():
+        first, last, day = _window(calendar, first_day, last_day)
+        if day != first_day or last - first != last_day - first_day:
+            continue  # stay falls outside the materialized window
+        rates = calendar['rate'][first:last].astype(float)
+        result[room_type_id] = {
+            'available': int(calendar['total_rooms'] - calendar['sold'][first:last].max()),
+            'total_price': round(float(np.round(rates, 2).sum()), 2),
+            'nightly_rates': np.round(rates, 2).tolist()
+        }
+    return result
+
+def get_room_type_stay(conn, room_type_id, check_in, check_out):
+    """(available rooms, nightly rates) for one room type's stay, or None outside the stored window"""
+    row = conn.execute('''
+        SELECT start_date, total_rooms, sold, rate FROM inventory_calendars WHERE room_type_id = ?
+    ''', (room_type_id,)).fetchone()
+    if row is None:
+        return None
+    calendar = {
+        'start': _ordinal(row[0]),
+        'sold': np.frombuffer(row[2], dtype=SOLD_DTYPE),
+        'rate': np.frombuffer(row[3], dtype=RATE_DTYPE)
+    }
+    first_day, last_day = _ordinal(check_in), _ordinal(check_out)
+    first, last, day = _window(calendar, first_day, last_day)
+    if last_day <= first_day or day != first_day or last - first != last_day - first_day:
+        return None
+    rates = np.round(calendar['rate'][first:last].astype(float), 2).tolist()
+    return int(row[1] - calendar['sold'][first:last].max()), rates
+
+if __name__ == '__main__':
+    from ultra_comprehensive_system import create_app, shards
+
+    create_app()
+    shards.run_everywhere(run_nightly_rebuild)
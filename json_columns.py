@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - JSON Columns
+Decode-once accessors for JSON text columns and JSON1 indexes for filtering on them
+"""
+
+import json
+import logging
+
+from caching import LRUCache
+
+logger = logging.getLogger(__name__)
+
+AMENITY_LIMIT = 200
+EMAIL_PAGE_SIZE = 50
+
+# (table, column) -> type the decoded value must have; anything else reads as an empty one
+JSON_COLUMNS = {
+    ('room_types', 'amenities'): list,
+    ('room_types', 'images'): list,
+    ('hotels', 'branding_colors'): dict,
+    ('email_logs', 'ai_analysis'): dict,
+}
+
+# Decoded values by (table, column, stored text). The text is the row version: a changed
+# row has a new key and the old entry ages out.
+decoded_cache = LRUCache(maxsize=8192)
+
+def _valid(expression, fallback):
+    """SQL: a JSON text expression, or fallback when it is not well-formed JSON"""
+    return f"CASE WHEN json_valid({expression}) THEN {expression} ELSE {fallback} END"
+
+# Index expression for the AI classification of an email; queries must repeat it verbatim
+# for the planner to use idx_email_logs_classification
+EMAIL_CLASSIFICATION_SQL = f"json_extract({_valid('ai_analysis', 'NULL')}, '$.classification')"
+
+def _amenities(row):
+    """SELECT of the normalized amenity names of a room_types row (NEW / OLD)"""
+    return f'''
+        SELECT DISTINCT {row}.hotel_id, lower(trim(value)), {row}.id
+        FROM json_each({_valid(f'{row}.amenities', "'[]'")})
+        WHERE type = 'text' AND trim(value) != '' AND {row}.hotel_id IS NOT NULL
+    '''
+
+JSON_COLUMNS_SCHEMA = [
+    f'''
+    CREATE INDEX IF NOT EXISTS idx_email_logs_classification
+    ON email_logs (hotel_id, {EMAIL_CLASSIFICATION_SQL}, id)
+    ''',
+    # One row per amenity of a room type, so membership filters are index lookups
+    '''
+    CREATE TABLE IF NOT EXISTS room_type_amenities (
+        hotel_id INTEGER NOT NULL,
+        amenity TEXT NOT NULL,
+        room_type_id INTEGER NOT NULL,
+        PRIMARY KEY (hotel_id, amenity, room_type_id),
+        FOREIGN KEY (room_type_id) REFERENCES room_types (id)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_room_type_amenities_room_type ON room_type_amenities (room_type_id)',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_room_types_amenities_insert AFTER INSERT ON room_types
+    BEGIN
+        INSERT OR IGNORE INTO room_type_amenities (hotel_id, amenity, room_type_id) {_amenities('NEW')};
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_room_types_amenities_update AFTER UPDATE OF hotel_id, amenities ON room_types
+    BEGIN
+        DELETE FROM room_type_amenities WHERE room_type_id = OLD.id;
+        INSERT OR IGNORE INTO room_type_amenities (hotel_id, amenity, room_type_id) {_amenities('NEW')};
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_room_types_amenities_delete AFTER DELETE ON room_types
+    BEGIN
+        DELETE FROM room_type_amenities WHERE room_type_id = OLD.id;
+    END
+    ''',
+]
+
+def backfill_room_type_amenities(cursor):
+    """Index the amenities of existing room types when the table is still empty"""
+    if cursor.execute('SELECT 1 FROM room_type_amenities LIMIT 1').fetchone():
+        return 0
+    return cursor.execute(f'''
+        INSERT OR IGNORE INTO room_type_amenities (hotel_id, amenity, room_type_id)
+        SELECT DISTINCT r.hotel_id, lower(trim(a.value)), r.id
+        FROM room_types r, json_each({_valid('r.amenities', "'[]'")}) a
+        WHERE a.type = 'text' AND trim(a.value) != '' AND r.hotel_id IS NOT NULL
+    ''').rowcount
+
+def decode_json(table, column, text):
+    """Decoded value of a JSON column, parsed once per distinct stored text.
+
+    Missing, malformed or wrongly shaped values read as an empty list / dict. The value
+    is shared between callers: treat it as read-only.
+    """
+    expected = JSON_COLUMNS[(table, column)]
+    if not text:
+        return expected()
+    key = (table, column, text)
+    value = decoded_cache.get(key)
+    if value is None:
+        try:
+            value = json.loads(text)
+        except ValueError:
+            logger.debug(f"Malformed JSON in {table}.{column}: {text[:100]!r}")
+            value = None
+        if not isinstance(value, expected):
+            value = expected()
+        decoded_cache.set(key, value)
+    return value
+
+def decode_row(table, row):
+    """A row (dict or sqlite3.Row) as a dict with its JSON columns decoded"""
+    row = dict(row)
+    for json_table, column in JSON_COLUMNS:
+        if json_table == table and column in row:
+            row[column] = decode_json(table, column, row[column])
+    return row
+
+def room_types_with_amenity(conn, hotel_id, amenity=None):
+    """Active room types of a hotel, optionally only those offering an amenity (any case)"""
+    if amenity is None:
+        cursor = conn.execute('''
+            SELECT id, name, description, capacity, bed_type, size_sqm, amenities, images, base_price, total_rooms
+            FROM room_types WHERE hotel_id = ? AND is_active = 1 ORDER BY id
+        ''', (hotel_id,))
+    else:
+        cursor = conn.execute('''
+            SELECT r.id, r.name, r.description, r.capacity, r.bed_type, r.size_sqm, r.amenities, r.images,
+                   r.base_price, r.total_rooms
+            FROM room_type_amenities a JOIN room_types r ON r.id = a.room_type_id
+            WHERE a.hotel_id = ? AND a.amenity = lower(trim(?)) AND r.is_active = 1
+            ORDER BY r.id
+            LIMIT ?
+        ''', (hotel_id, amenity, AMENITY_LIMIT))
+    columns = [column[0] for column in cursor.description]
+    return [decode_row('room_types', zip(columns, row)) for row in cursor.fetchall()]
+
+def emails_by_classification(conn, hotel_id, classification, limit=EMAIL_PAGE_SIZE, before_id=None):
+    """Newest emails of a hotel whose AI analysis has this classification (keyset pages)"""
+    cursor = conn.execute(f'''
+        SELECT id, reservation_id, from_email, subject, language_detected, sentiment_score,
+               priority_level, email_type, ai_analysis, status, created_at
+        FROM email_logs
+        WHERE hotel_id = ? AND {EMAIL_CLASSIFICATION_SQL} = ? AND id < ?
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (hotel_id, classification, before_id or 2 ** 63 - 1, limit))
+    columns = [column[0] for column in cursor.description]
+    return [decode_row('email_logs', zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Lazy Imports
+Defers heavy third-party modules (numpy, openai, googleapiclient, langdetect) until first use
+"""
+
+import sys
+import threading
+import importlib.util
+
+_lock = threading.Lock()
+
+def lazy_import(name):
+    """Module whose body runs on first attribute access; a missing package still fails here"""
+    with _lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        return module
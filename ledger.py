@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Payment Ledger
+Daily per-hotel rollup of gross, fees, net and refunds by currency, method and provider
+"""
+
+import logging
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+# Payments that moved money; a refund does not erase the original takings
+SETTLED_STATUSES = ('completed', 'refunded', 'partially_refunded')
+UNKNOWN = 'unknown'
+
+def _settled(row):
+    """SQL condition: the payments row (NEW / OLD) is settled"""
+    return f"{row}.status IN ({', '.join(repr(status) for status in SETTLED_STATUSES)})"
+
+def _key(row, day):
+    """Ledger key columns of a payments row (NEW / OLD) posted on day"""
+    return (f"{row}.hotel_id, date({day}), COALESCE({row}.currency, 'EUR'), "
+            f"COALESCE({row}.payment_method, '{UNKNOWN}'), COALESCE({row}.payment_provider, '{UNKNOWN}')")
+
+def _match(row, day):
+    """WHERE clause selecting the ledger row a payments row posts to"""
+    return (f"hotel_id = {row}.hotel_id AND ledger_date = date({day}) "
+            f"AND currency = COALESCE({row}.currency, 'EUR') "
+            f"AND payment_method = COALESCE({row}.payment_method, '{UNKNOWN}') "
+            f"AND payment_provider = COALESCE({row}.payment_provider, '{UNKNOWN}')")
+
+def _paid_on(row):
+    """Day a payment's takings are posted"""
+    return f"COALESCE({row}.payment_date, {row}.created_at)"
+
+def _refunded_on(row):
+    """Day a payment's refund is posted"""
+    return f"COALESCE({row}.refund_date, {row}.payment_date, {row}.created_at)"
+
+def _net(row):
+    """Net amount, derived from amount and fees when the provider gave none"""
+    return f"COALESCE({row}.net_amount, {row}.amount - COALESCE({row}.fees, 0))"
+
+def _post(row):
+    """Statements adding a payments row's takings and refund to the ledger"""
+    return f'''
+        INSERT INTO payment_ledger_daily (
+            hotel_id, ledger_date, currency, payment_method, payment_provider, payments, gross, fees, net
+        )
+        SELECT {_key(row, _paid_on(row))}, 1, {row}.amount, COALESCE({row}.fees, 0), {_net(row)}
+        WHERE {_settled(row)}
+        ON CONFLICT (hotel_id, ledger_date, currency, payment_method, payment_provider) DO UPDATE SET
+            payments = payments + 1, gross = gross + excluded.gross,
+            fees = fees + excluded.fees, net = net + excluded.net;
+        INSERT INTO payment_ledger_daily (
+            hotel_id, ledger_date, currency, payment_method, payment_provider, refunds, refunded_payments
+        )
+        SELECT {_key(row, _refunded_on(row))}, {row}.refund_amount, 1
+        WHERE {_settled(row)} AND COALESCE({row}.refund_amount, 0) > 0
+        ON CONFLICT (hotel_id, ledger_date, currency, payment_method, payment_provider) DO UPDATE SET
+            refunds = refunds + excluded.refunds, refunded_payments = refunded_payments + 1;
+    '''
+
+def _unpost(row):
+    """Statements removing a payments row's takings and refund from the ledger"""
+    return f'''
+        UPDATE payment_ledger_daily SET
+            payments = payments - 1, gross = gross - {row}.amount,
+            fees = fees - COALESCE({row}.fees, 0), net = net - {_net(row)}
+        WHERE {_settled(row)} AND {_match(row, _paid_on(row))};
+        UPDATE payment_ledger_daily SET
+            refunds = refunds - {row}.refund_amount, refunded_payments = refunded_payments - 1
+        WHERE {_settled(row)} AND COALESCE({row}.refund_amount, 0) > 0 AND {_match(row, _refunded_on(row))};
+    '''
+
+LEDGER_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS payment_ledger_daily (
+        hotel_id INTEGER NOT NULL,
+        ledger_date DATE NOT NULL,
+        currency TEXT NOT NULL,
+        payment_method TEXT NOT NULL,
+        payment_provider TEXT NOT NULL,
+        payments INTEGER NOT NULL DEFAULT 0,
+        gross REAL NOT NULL DEFAULT 0,
+        fees REAL NOT NULL DEFAULT 0,
+        net REAL NOT NULL DEFAULT 0,
+        refunds REAL NOT NULL DEFAULT 0,
+        refunded_payments INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (hotel_id, ledger_date, currency, payment_method, payment_provider)
+    ) WITHOUT ROWID
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_payments_ledger_insert AFTER INSERT ON payments
+    BEGIN {_post('NEW')} END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_payments_ledger_delete AFTER DELETE ON payments
+    BEGIN {_unpost('OLD')} END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_payments_ledger_update
+    AFTER UPDATE OF hotel_id, amount, currency, status, payment_date, payment_method, payment_provider,
+                    fees, net_amount, refund_amount, refund_date ON payments
+    BEGIN {_unpost('OLD')} {_post('NEW')} END
+    ''',
+]
+
+def backfill_payment_ledger(cursor):
+    """Build the ledger from existing payments when it is still empty"""
+    if cursor.execute('SELECT 1 FROM payment_ledger_daily LIMIT 1').fetchone():
+        return 0
+    settled = ', '.join('?' * len(SETTLED_STATUSES))
+    posted = cursor.execute(f'''
+        INSERT INTO payment_ledger_daily (
+            hotel_id, ledger_date, currency, payment_method, payment_provider, payments, gross, fees, net
+        )
+        SELECT hotel_id, date(COALESCE(payment_date, created_at)), COALESCE(currency, 'EUR'),
+               COALESCE(payment_method, '{UNKNOWN}'), COALESCE(payment_provider, '{UNKNOWN}'),
+               COUNT(*), SUM(amount), SUM(COALESCE(fees, 0)),
+               SUM(COALESCE(net_amount, amount - COALESCE(fees, 0)))
+        FROM payments WHERE status IN ({settled})
+        GROUP BY 1, 2, 3, 4, 5
+    ''', SETTLED_STATUSES).rowcount
+    cursor.execute(f'''
+        INSERT INTO payment_ledger_daily (
+            hotel_id, ledger_date, currency, payment_method, payment_provider, refunds, refunded_payments
+        )
+        SELECT hotel_id, date(COALESCE(refund_date, payment_date, created_at)), COALESCE(currency, 'EUR'),
+               COALESCE(payment_method, '{UNKNOWN}'), COALESCE(payment_provider, '{UNKNOWN}'),
+               SUM(refund_amount), COUNT(*)
+        FROM payments WHERE status IN ({settled}) AND refund_amount > 0
+        GROUP BY 1, 2, 3, 4, 5
+        ON CONFLICT (hotel_id, ledger_date, currency, payment_method, payment_provider) DO UPDATE SET
+            refunds = refunds + excluded.refunds, refunded_payments = refunded_payments + excluded.refunded_payments
+    ''', SETTLED_STATUSES)
+    return posted
+
+def _totals(payments=0, gross=0.0, fees=0.0, net=0.0, refunds=0.0, refunded_payments=0):
+    """Ledger amounts as a dict"""
+    return {
+        'payments': payments, 'gross': gross, 'fees': fees, 'net': net,
+        'refunds': refunds, 'refunded_payments': refunded_payments
+    }
+
+def _add(target, values):
+    """Accumulate one ledger row's amounts into a totals dict"""
+    for field, value in zip(('payments', 'gross', 'fees', 'net', 'refunds', 'refunded_payments'), values):
+        target[field] += value
+
+def _rounded(totals):
+    """Totals rounded to cents, with net after refunds"""
+    totals = dict(totals)
+    for field in ('gross', 'fees', 'net', 'refunds'):
+        totals[field] = round(totals[field], 2)
+    totals['net_after_refunds'] = round(totals['net'] - totals['refunds'], 2)
+    return totals
+
+def ledger_report(conn, hotel_id, start_date, end_date, daily=False):
+    """Ledger totals for [start_date, end_date], per currency and by method and provider.
+
+    Answered from the rollup's primary key range: the work grows with the number of days,
+    methods and providers, never with the number of payments. Amounts stay in their
+    original currency.
+    """
+    rows = conn.execute('''
+        SELECT currency, payment_method, payment_provider,
+               SUM(payments), SUM(gross), SUM(fees), SUM(net), SUM(refunds), SUM(refunded_payments)
+        FROM payment_ledger_daily
+        WHERE hotel_id = ? AND ledger_date BETWEEN ? AND ?
+        GROUP BY currency, payment_method, payment_provider
+    ''', (hotel_id, start_date.isoformat(), end_date.isoformat())).fetchall()
+    totals, by_method, by_provider = {}, {}, {}
+    for currency, method, provider, *values in rows:
+        _add(totals.setdefault(currency, _totals()), values)
+        _add(by_method.setdefault(method, {}).setdefault(currency, _totals()), values)
+        _add(by_provider.setdefault(provider, {}).setdefault(currency, _totals()), values)
+    report = {
+        'hotel_id': hotel_id,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'totals': {currency: _rounded(values) for currency, values in totals.items()},
+        'by_method': {method: {currency: _rounded(values) for currency, values in currencies.items()}
+                      for method, currencies in by_method.items()},
+        'by_provider': {provider: {currency: _rounded(values) for currency, values in currencies.items()}
+                        for provider, currencies in by_provider.items()}
+    }
+    if daily:
+        report['daily'] = [
+            dict(_rounded(_totals(*values)), date=ledger_date, currency=currency)
+            for ledger_date, currency, *values in conn.execute('''
+                SELECT ledger_date, currency,
+                       SUM(payments), SUM(gross), SUM(fees), SUM(net), SUM(refunds), SUM(refunded_payments)
+                FROM payment_ledger_daily
+                WHERE hotel_id = ? AND ledger_date BETWEEN ? AND ?
+                GROUP BY ledger_date, currency ORDER BY ledger_date, currency
+            ''', (hotel_id, start_date.isoformat(), end_date.isoformat()))
+        ]
+    return report
+
+def month_range(year, month):
+    """First and last day of a calendar month"""
+    first = date(year, month, 1)
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return first, date.fromordinal(following.toordinal() - 1)
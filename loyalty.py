@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Loyalty Points Ledger
+Append-only earn / burn entries with per-customer balance snapshots and batched compaction
+
+Usage: python loyalty.py   (nightly compaction over the catalog and every shard)
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENTRY_TYPES = ('earn', 'burn', 'adjust')
+# Points per unit of the hotel's currency spent on a completed stay
+POINTS_PER_CURRENCY_UNIT = 0.1
+COMPACTION_BATCH_SIZE = 50000
+RECENT_ENTRIES = 20
+
+LOYALTY_SCHEMA = [
+    # Never updated or deleted; corrections are entries of their own
+    '''
+    CREATE TABLE IF NOT EXISTS loyalty_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        hotel_id INTEGER NOT NULL,
+        customer_id INTEGER NOT NULL,
+        points INTEGER NOT NULL,
+        entry_type TEXT NOT NULL,
+        reservation_id INTEGER,
+        reference TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (hotel_id) REFERENCES hotels (id),
+        FOREIGN KEY (customer_id) REFERENCES customers (id),
+        FOREIGN KEY (reservation_id) REFERENCES reservations (id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_loyalty_entries_customer ON loyalty_entries (customer_id, id)',
+    # A stay earns once, however often its check-out is replayed
+    '''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_loyalty_entries_stay ON loyalty_entries (reservation_id, entry_type)
+    WHERE reservation_id IS NOT NULL
+    ''',
+    # Balance of every entry up to last_entry_id; written only by compaction
+    '''
+    CREATE TABLE IF NOT EXISTS loyalty_snapshots (
+        customer_id INTEGER PRIMARY KEY,
+        hotel_id INTEGER NOT NULL,
+        balance INTEGER NOT NULL,
+        earned INTEGER NOT NULL,
+        burned INTEGER NOT NULL,
+        last_entry_id INTEGER NOT NULL,
+        compacted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (customer_id) REFERENCES customers (id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_loyalty_snapshots_entry ON loyalty_snapshots (last_entry_id)',
+]
+
+# Snapshot balance plus the entries appended since; the tail is a short range of the
+# (customer_id, id) index, bounded by how often compaction runs
+BALANCE_SQL = '''
+    COALESCE((SELECT balance FROM loyalty_snapshots WHERE customer_id = :customer_id), 0)
+    + COALESCE((
+        SELECT SUM(points) FROM loyalty_entries
+        WHERE customer_id = :customer_id AND id > COALESCE(
+            (SELECT last_entry_id FROM loyalty_snapshots WHERE customer_id = :customer_id), 0
+        )
+    ), 0)
+'''
+
+class LoyaltyError(Exception):
+    """Loyalty request that cannot be fulfilled; carries the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def get_balance(conn, customer_id):
+    """Current points balance of a customer"""
+    return conn.execute(f'SELECT {BALANCE_SQL}', {'customer_id': customer_id}).fetchone()[0]
+
+def _customer(conn, hotel_id, customer_id):
+    """Raise unless the customer belongs to the hotel"""
+    if not conn.execute(
+        'SELECT 1 FROM customers WHERE id = ? AND hotel_id = ?', (customer_id, hotel_id)
+    ).fetchone():
+        raise LoyaltyError('Customer not found', 404)
+
+def record_entry(conn, hotel_id, customer_id, points, entry_type, reference=None):
+    """Append an entry and return the new balance.
+
+    Earning is a plain INSERT and never touches the customers row. A burn is inserted
+    only if the balance covers it, checked within the same statement, so concurrent
+    redemptions cannot overdraw.
+    """
+    if entry_type not in ENTRY_TYPES:
+        raise LoyaltyError(f'type must be one of: {", ".join(ENTRY_TYPES)}')
+    if not isinstance(points, int) or isinstance(points, bool) or points == 0:
+        raise LoyaltyError('points must be a non-zero integer')
+    if entry_type in ('earn', 'burn') and points < 0:
+        raise LoyaltyError(f'{entry_type} points must be positive')
+    _customer(conn, hotel_id, customer_id)
+
+    params = {
+        'hotel_id': hotel_id, 'customer_id': customer_id, 'entry_type': entry_type, 'reference': reference,
+        'points': -points if entry_type == 'burn' else points
+    }
+    inserted = conn.execute(f'''
+        INSERT INTO loyalty_entries (hotel_id, customer_id, points, entry_type, reference)
+        SELECT :hotel_id, :customer_id, :points, :entry_type, :reference
+        WHERE :points >= 0 OR {BALANCE_SQL} + :points >= 0
+    ''', params).rowcount
+    conn.commit()
+    if not inserted:
+        raise LoyaltyError('Not enough points', 409)
+    return get_balance(conn, customer_id)
+
+def earn_for_stay(conn, reservation):
+    """Credit a checked-out stay to the guest's customer record, once per reservation.
+
+    Runs inside the caller's transaction; guests without a customer record earn nothing.
+    """
+    points = int((reservation['total_price'] or 0) * POINTS_PER_CURRENCY_UNIT)
+    if points <= 0:
+        return 0
+    return conn.execute('''
+        INSERT OR IGNORE INTO loyalty_entries (hotel_id, customer_id, points, entry_type, reservation_id, reference)
+        SELECT hotel_id, id, ?, 'earn', ?, ? FROM customers WHERE hotel_id = ? AND email = ? COLLATE NOCASE
+    ''', (
+        points, reservation['id'], reservation['confirmation_code'],
+        reservation['hotel_id'], reservation['guest_email']
+    )).rowcount
+
+def get_loyalty(conn, hotel_id, customer_id, limit=RECENT_ENTRIES):
+    """Balance, snapshot totals and the most recent entries of a customer"""
+    _customer(conn, hotel_id, customer_id)
+    snapshot = conn.execute(
+        'SELECT earned, burned, last_entry_id, compacted_at FROM loyalty_snapshots WHERE customer_id = ?',
+        (customer_id,)
+    ).fetchone()
+    cursor = conn.execute('''
+        SELECT id, points, entry_type, reservation_id, reference, created_at FROM loyalty_entries
+        WHERE customer_id = ? ORDER BY id DESC LIMIT ?
+    ''', (customer_id, limit))
+    columns = [column[0] for column in cursor.description]
+    return {
+        'customer_id': customer_id,
+        'balance': get_balance(conn, customer_id),
+        'snapshot': dict(zip(('earned', 'burned', 'last_entry_id', 'compacted_at'), snapshot)) if snapshot else None,
+        'entries': [dict(zip(columns, row)) for row in cursor.fetchall()]
+    }
+
+def compact_loyalty(conn, batch_size=COMPACTION_BATCH_SIZE):
+    """Fold appended entries into the snapshots, one transaction per batch_size entry ids.
+
+    Entry ids only grow, so everything at or below the highest snapshotted id is already
+    folded in. Each batch also refreshes customers.loyalty_points, which stays as a
+    read-only copy of the balance as of the last compaction.
+    """
+    since = conn.execute('SELECT COALESCE(MAX(last_entry_id), 0) FROM loyalty_snapshots').fetchone()[0]
+    last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM loyalty_entries').fetchone()[0]
+    snapshots = 0
+    while since < last_id:
+        window = {'since': since, 'upto': min(last_id, since + batch_size)}
+        snapshots += conn.execute('''
+            INSERT INTO loyalty_snapshots (customer_id, hotel_id, balance, earned, burned, last_entry_id)
+            SELECT customer_id, MIN(hotel_id), SUM(points),
+                   SUM(MAX(points, 0)), -SUM(MIN(points, 0)), MAX(id)
+            FROM loyalty_entries WHERE id > :since AND id <= :upto
+            GROUP BY customer_id
+            ON CONFLICT (customer_id) DO UPDATE SET
+                balance = balance + excluded.balance, earned = earned + excluded.earned,
+                burned = burned + excluded.burned, last_entry_id = excluded.last_entry_id,
+                compacted_at = CURRENT_TIMESTAMP
+        ''', window).rowcount
+        conn.execute('''
+            UPDATE customers SET loyalty_points = s.balance
+            FROM loyalty_snapshots s
+            WHERE s.last_entry_id > :since AND s.last_entry_id <= :upto AND customers.id = s.customer_id
+        ''', window)
+        conn.commit()
+        since = window['upto']
+    if snapshots:
+        logger.info(f"Loyalty compaction: {snapshots} snapshots updated, entries folded up to id {last_id}")
+    return snapshots
+
+def backfill_loyalty_ledger(cursor):
+    """Open the ledger with each customer's existing loyalty_points when it is still empty"""
+    if cursor.execute('SELECT 1 FROM loyalty_entries LIMIT 1').fetchone():
+        return 0
+    return cursor.execute('''
+        INSERT INTO loyalty_entries (hotel_id, customer_id, points, entry_type, reference)
+        SELECT hotel_id, id, loyalty_points, 'adjust', 'opening balance' FROM customers
+        WHERE loyalty_points != 0
+    ''').rowcount
+
+if __name__ == '__main__':
+    from ultra_comprehensive_system import create_app, shards
+
+    create_app()
+    shards.run_everywhere(compact_loyalty)
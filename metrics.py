@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Metrics
+Request, SQL and template timings exported in Prometheus text format
+"""
+
+import os
+import time
+import bisect
+import sqlite3
+import logging
+import threading
+
+from jinja2 import Template
+from werkzeug.wsgi import ClosingIterator
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+ROUTE_ENVIRON_KEY = 'ybh.route'
+UNMATCHED_ROUTE = '<unmatched>'
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value):
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=''):
+    """Render {name="value",...}; extra is appended as-is (used for le)"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values=(), amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, label_values=()):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_labels(self.labels, key)} {value}' for key, value in values]
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, label_values=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, label_values=()):
+        """(count, sum) for one label set"""
+        with self._lock:
+            series = self._series.get(label_values)
+            return (series[2], series[1]) if series else (0, 0.0)
+
+    def totals(self):
+        """(count, sum) across every label set"""
+        with self._lock:
+            return (sum(series[2] for series in self._series.values()),
+                    sum(series[1] for series in self._series.values()))
+
+    def render(self):
+        with self._lock:
+            series = sorted((key, [list(value[0]), value[1], value[2]]) for key, value in self._series.items())
+        lines = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, key)} {total:.6f}')
+            lines.append(f'{self.name}_count{_labels(self.labels, key)} {count}')
+        return lines
+
+class Gauge:
+    """Point-in-time value read from a callable at scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, function):
+        self.name = name
+        self.help_text = help_text
+        self.function = function
+
+    def render(self):
+        return [f'{self.name} {self.function()}']
+
+class MetricsRegistry:
+    """Process-wide metrics; each worker process exports its own"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.started = time.time()
+        self._local = threading.local()
+        self.requests = Histogram(
+            'ybh_http_request_duration_seconds', 'HTTP request latency by route', ('method', 'route', 'status')
+        )
+        self.request_queries = Histogram(
+            'ybh_http_request_sql_queries', 'SQL statements executed per request', ('route',), QUERY_COUNT_BUCKETS
+        )
+        self.request_sql_time = Histogram(
+            'ybh_http_request_sql_seconds', 'Time spent in SQL per request', ('route',)
+        )
+        self.queries = Counter('ybh_sql_queries_total', 'SQL statements executed')
+        self.query_time = Counter('ybh_sql_query_seconds_total', 'Time spent executing SQL statements')
+        self.templates = Histogram(
+            'ybh_template_render_seconds', 'Template render time by route', ('route',)
+        )
+        self.metrics = [self.requests, self.request_queries, self.request_sql_time,
+                        self.queries, self.query_time, self.templates]
+
+    def register(self, metric):
+        """Export another module's metric from /metrics"""
+        self.metrics.append(metric)
+        return metric
+
+    def begin_request(self):
+        """Start per-request SQL accounting for the current thread"""
+        self._local.sql = [0, 0.0]
+
+    def end_request(self):
+        """(queries, seconds) spent in SQL by the current thread's request"""
+        sql = getattr(self._local, 'sql', None)
+        self._local.sql = None
+        if not sql:
+            return 0, 0.0
+        # Folded into the process totals once per request rather than per statement
+        self.queries.inc(amount=sql[0])
+        self.query_time.inc(amount=sql[1])
+        return sql[0], sql[1]
+
+    def record_query(self, seconds):
+        """Account one SQL statement to the current request (or straight to the process totals)"""
+        sql = getattr(self._local, 'sql', None)
+        if sql is None:
+            self.queries.inc()
+            self.query_time.inc(amount=seconds)
+        else:
+            sql[0] += 1
+            sql[1] += seconds
+
+    @property
+    def current_route(self):
+        return getattr(self._local, 'route', None) or UNMATCHED_ROUTE
+
+    def render(self):
+        """All metrics in Prometheus text exposition format"""
+        lines = [
+            '# HELP ybh_process_uptime_seconds Seconds since the process started',
+            '# TYPE ybh_process_uptime_seconds gauge',
+            f'ybh_process_uptime_seconds {time.time() - self.started:.3f}'
+        ]
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry(enabled=os.environ.get('METRICS_ENABLED', 'true').lower() != 'false')
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times execute calls into the metrics registry"""
+
+    def execute(self, sql, parameters=()):
+        if not registry.enabled:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            registry.record_query(time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not registry.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            registry.record_query(time.perf_counter() - started)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose statements are counted and timed per request"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # Timed here directly: the C implementation does not route through cursor()
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            registry.record_query(time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            registry.record_query(time.perf_counter() - started)
+
+def connection_factory():
+    """sqlite3 connection class to use: instrumented unless metrics are switched off"""
+    return InstrumentedConnection if registry.enabled else sqlite3.Connection
+
+class TimedTemplate(Template):
+    """Jinja template that reports render time for the current route"""
+
+    def render(self, *args, **kwargs):
+        if not registry.enabled:
+            return super().render(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            registry.templates.observe(time.perf_counter() - started, (registry.current_route,))
+
+class MetricsMiddleware:
+    """WSGI middleware recording latency and SQL usage per route.
+
+    A request is timed until the server closes its response iterable, so streamed bodies
+    and the queries they run are included.
+    """
+
+    def __init__(self, wsgi_app, metrics=registry):
+        self.app = wsgi_app
+        self.metrics = metrics
+
+    def __call__(self, environ, start_response):
+        if not self.metrics.enabled:
+            return self.app(environ, start_response)
+        status_holder = []
+
+        def capture_status(status, headers, exc_info=None):
+            status_holder.append(status.split(' ', 1)[0])
+            return start_response(status, headers, exc_info)
+
+        self.metrics.begin_request()
+        self.metrics._local.route = None
+        started = time.perf_counter()
+
+        def finish():
+            elapsed = time.perf_counter() - started
+            route = environ.get(ROUTE_ENVIRON_KEY) or UNMATCHED_ROUTE
+            queries, sql_seconds = self.metrics.end_request()
+            status = status_holder[0] if status_holder else '500'
+            self.metrics.requests.observe(elapsed, (environ.get('REQUEST_METHOD', ''), route, status))
+            self.metrics.request_queries.observe(queries, (route,))
+            self.metrics.request_sql_time.observe(sql_seconds, (route,))
+
+        try:
+            response = self.app(environ, capture_status)
+        except BaseException:
+            finish()
+            raise
+        return ClosingIterator(response, finish)
+
+def instrument_app(app, metrics=registry):
+    """Wrap a Flask app: WSGI timing, route labels and template render timing"""
+    from flask import request
+
+    @app.url_value_preprocessor
+    def tag_route(endpoint, values):
+        # Label by the URL rule, not the concrete path, to keep cardinality bounded
+        rule = request.url_rule.rule if request.url_rule else None
+        request.environ[ROUTE_ENVIRON_KEY] = rule
+        metrics._local.route = rule
+
+    app.jinja_env.template_class = TimedTemplate
+    app.wsgi_app = MetricsMiddleware(app.wsgi_app, metrics)
+    return app
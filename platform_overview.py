@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Platform Overview
+Per-tenant email, reservation, revenue and AI latency totals for platform operators
+"""
+
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from caching import LRUCache
+
+logger = logging.getLogger(__name__)
+
+OVERVIEW_TTL = 30
+OVERVIEW_PAGE_SIZE = 100
+MAX_OVERVIEW_PAGE_SIZE = 1000
+# Shards read at once; sqlite3 releases the GIL, so threads overlap the I/O without
+# forking a request-serving worker
+OVERVIEW_WORKERS = 4
+
+# Whole overview cached under one key; recomputed at most every OVERVIEW_TTL seconds per process
+overview_cache = LRUCache(maxsize=1, ttl=OVERVIEW_TTL)
+# Concurrent misses wait for one recompute instead of each starting their own
+overview_lock = threading.Lock()
+
+def _empty_totals():
+    """Zeroed counters for a hotel with no activity"""
+    return {
+        'emails': 0,
+        'ai_latency_ms_avg': None,
+        'ai_latency_ms_max': None,
+        'reservations': 0,
+        'cancelled_reservations': 0,
+        'revenue': {}
+    }
+
+def tenant_totals(conn):
+    """Counters for every hotel in one database, one grouped pass per table"""
+    totals = {}
+    for hotel_id, emails, latency_avg, latency_max in conn.execute('''
+        SELECT hotel_id, COUNT(*), AVG(processing_time_ms), MAX(processing_time_ms)
+        FROM email_logs GROUP BY hotel_id
+    '''):
+        hotel = totals.setdefault(hotel_id, _empty_totals())
+        hotel['emails'] = emails
+        hotel['ai_latency_ms_avg'] = round(latency_avg, 1) if latency_avg is not None else None
+        hotel['ai_latency_ms_max'] = latency_max
+    for hotel_id, reservations, cancelled in conn.execute('''
+        SELECT hotel_id, COUNT(*), SUM(status = 'cancelled')
+        FROM reservations GROUP BY hotel_id
+    '''):
+        hotel = totals.setdefault(hotel_id, _empty_totals())
+        hotel['reservations'] = reservations
+        hotel['cancelled_reservations'] = cancelled or 0
+    # Revenue net of refunds, from the ledger like the hotels' own reports; it stays per
+    # currency because hotels bill in their own
+    for hotel_id, currency, amount in conn.execute('''
+        SELECT hotel_id, currency, SUM(gross - refunds)
+        FROM payment_ledger_daily GROUP BY hotel_id, currency
+    '''):
+        hotel = totals.setdefault(hotel_id, _empty_totals())
+        hotel['revenue'][currency] = round(hotel['revenue'].get(currency, 0) + (amount or 0), 2)
+    return totals
+
+def shard_totals(shard_path):
+    """tenant_totals for one shard file (runs in a pool thread)"""
+    conn = sqlite3.connect(shard_path, check_same_thread=False)
+    try:
+        return tenant_totals(conn)
+    finally:
+        conn.close()
+
+def collect_overview(catalog_conn, max_workers=OVERVIEW_WORKERS):
+    """Overview rows for every hotel, fanning out over a thread pool when hotels are sharded"""
+    hotels = catalog_conn.execute('''
+        SELECT id, name, subdomain, subscription_plan, subscription_status, currency, status
+        FROM hotels ORDER BY id
+    ''').fetchall()
+    shard_paths = dict(catalog_conn.execute(
+        "SELECT hotel_id, shard_path FROM tenant_shards WHERE status = 'active'"
+    ).fetchall())
+
+    totals = {
+        hotel_id: counters for hotel_id, counters in tenant_totals(catalog_conn).items()
+        if hotel_id not in shard_paths
+    }
+    paths = sorted(set(shard_paths.values()))
+    if len(paths) == 1:
+        totals.update(shard_totals(paths[0]))
+    elif paths:
+        with ThreadPoolExecutor(max_workers=min(len(paths), max_workers)) as pool:
+            for shard_result in pool.map(shard_totals, paths):
+                totals.update(shard_result)
+
+    overview = []
+    for hotel_id, name, subdomain, plan, subscription_status, currency, status in hotels:
+        row = {
+            'hotel_id': hotel_id,
+            'name': name,
+            'subdomain': subdomain,
+            'subscription_plan': plan,
+            'subscription_status': subscription_status,
+            'currency': currency,
+            'status': status,
+            'sharded': hotel_id in shard_paths
+        }
+        row.update(totals.get(hotel_id) or _empty_totals())
+        overview.append(row)
+    return overview
+
+def get_platform_overview(connection_factory):
+    """Cached overview rows; computed at most once per OVERVIEW_TTL by one thread at a time"""
+    overview = overview_cache.get('overview')
+    if overview is not None:
+        return overview
+    with overview_lock:
+        overview = overview_cache.get('overview')
+        if overview is None:
+            conn = connection_factory()
+            try:
+                overview = collect_overview(conn)
+            finally:
+                conn.close()
+            overview_cache.set('overview', overview)
+    return overview
+
+def overview_page(overview, after_id=0, limit=OVERVIEW_PAGE_SIZE):
+    """Keyset page of overview rows with hotel_id > after_id, plus platform-wide totals"""
+    limit = max(1, min(limit, MAX_OVERVIEW_PAGE_SIZE))
+    hotels = [row for row in overview if row['hotel_id'] > after_id][:limit]
+    summary = {'hotels': len(overview), 'emails': 0, 'reservations': 0, 'revenue': {}}
+    for row in overview:
+        summary['emails'] += row['emails']
+        summary['reservations'] += row['reservations']
+        for currency, amount in row['revenue'].items():
+            summary['revenue'][currency] = round(summary['revenue'].get(currency, 0) + amount, 2)
+    has_more = bool(hotels) and hotels[-1]['hotel_id'] < overview[-1]['hotel_id']
+    return {
+        'summary': summary,
+        'hotels': hotels,
+        'next_after': hotels[-1]['hotel_id'] if has_more else None
+    }
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Pre-fork Warm-up
+Loads shared state in the gunicorn master so forked workers share it copy-on-write
+
+Usage: python prefork.py rss [--pid <gunicorn master pid>]
+"""
+
+import os
+import gc
+import sys
+import time
+import inspect
+import logging
+import argparse
+
+from flask.templating import Environment
+
+from caching import LRUCache
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_MARKERS = ('{{', '{%', '<html')
+
+class CachedStringEnvironment(Environment):
+    """Jinja environment that compiles each render_template_string source once per process.
+
+    Flask compiles the source on every call; the inline templates are constants, so
+    keying compiled templates by their source is bounded and never stale.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compiled = LRUCache(maxsize=256)
+
+    def from_string(self, source, globals=None, template_class=None):
+        if globals or template_class is not None:
+            return super().from_string(source, globals, template_class)
+        template = self.compiled.get(source)
+        if template is None:
+            template = super().from_string(source)
+            self.compiled.set(source, template)
+        return template
+
+def compile_view_templates(app):
+    """Compile every inline template found among the view functions' constants"""
+    compiled = 0
+    for endpoint, view in app.view_functions.items():
+        code = getattr(inspect.unwrap(view), '__code__', None)
+        if code is None:
+            continue
+        for constant in code.co_consts:
+            if not isinstance(constant, str) or not any(marker in constant for marker in TEMPLATE_MARKERS):
+                continue
+            try:
+                app.jinja_env.from_string(constant)
+                compiled += 1
+            except Exception as e:
+                logger.error(f"Template warm-up error in {endpoint}: {e}")
+    return compiled
+
+def warm_up(app, tenants=None, modules=()):
+    """Load templates, heavy modules and tenant caches, then freeze them out of the GC.
+
+    Meant for the master process of a preloading server, right before it forks.
+    Frozen objects are never scanned by the collector, so workers do not dirty
+    (and thereby copy) the pages holding them.
+    """
+    started = time.perf_counter()
+    summary = {'templates': compile_view_templates(app), 'modules': [], 'tenants': 0}
+    for module in modules:
+        # Touching any attribute makes a lazy import execute
+        getattr(module, '__file__', None)
+        summary['modules'].append(module.__name__)
+    if tenants is not None:
+        summary['tenants'] = tenants.preload()
+    gc.collect()
+    gc.freeze()
+    summary['frozen_objects'] = gc.get_freeze_count()
+    summary['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Pre-fork warm-up: {summary}")
+    return summary
+
+def memory_usage(pid):
+    """RSS, PSS and private memory of one process in KiB, from /proc/<pid>/smaps_rollup"""
+    usage = {'pid': pid}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            field, _, value = line.partition(':')
+            if field in ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty'):
+                usage[field.lower()] = int(value.split()[0])
+    usage['private'] = usage.get('private_clean', 0) + usage.get('private_dirty', 0)
+    usage['shared'] = usage.get('shared_clean', 0) + usage.get('shared_dirty', 0)
+    return usage
+
+def child_pids(pid):
+    """Direct children of a process"""
+    children = set()
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as f:
+            children.update(int(child) for child in f.read().split())
+    return sorted(children)
+
+def server_memory(master_pid):
+    """Memory of a gunicorn master and each of its workers.
+
+    PSS splits shared pages between the processes using them, so the PSS total is
+    what the whole server costs against a container memory limit.
+    """
+    master = memory_usage(master_pid)
+    workers = [memory_usage(pid) for pid in child_pids(master_pid)]
+    return {
+        'master': master,
+        'workers': workers,
+        'total_pss_kb': master['pss'] + sum(worker['pss'] for worker in workers),
+        'total_rss_kb': master['rss'] + sum(worker['rss'] for worker in workers)
+    }
+
+def print_server_memory(report, out=sys.stdout):
+    """Table of the server_memory report in MiB"""
+    out.write(f"{'process':<16}{'pid':>8}{'rss MiB':>10}{'pss MiB':>10}{'shared MiB':>12}{'private MiB':>13}\n")
+    rows = [('master', report['master'])] + [(f'worker {n}', worker) for n, worker in enumerate(report['workers'], 1)]
+    for name, usage in rows:
+        out.write(f"{name:<16}{usage['pid']:>8}{usage['rss'] / 1024:>10.1f}{usage['pss'] / 1024:>10.1f}"
+                  f"{usage['shared'] / 1024:>12.1f}{usage['private'] / 1024:>13.1f}\n")
+    out.write(f"Total: {report['total_pss_kb'] / 1024:.1f} MiB PSS "
+              f"({report['total_rss_kb'] / 1024:.1f} MiB summed RSS)\n")
+
+def find_gunicorn_master():
+    """Pid of the first gunicorn master process serving app:application"""
+    for pid in sorted(int(entry) for entry in os.listdir('/proc') if entry.isdigit()):
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                cmdline = f.read().split(b'\0')
+            with open(f'/proc/{pid}/stat') as f:
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+            with open(f'/proc/{parent}/cmdline', 'rb') as f:
+                parent_cmdline = f.read()
+        except OSError:
+            continue
+        # Workers are forked from the master, so only the master has a non-gunicorn parent
+        if any(b'gunicorn' in part for part in cmdline) and b'app:application' in cmdline \
+                and b'gunicorn' not in parent_cmdline:
+            return pid
+    return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-worker memory of a running gunicorn server')
+    parser.add_argument('command', choices=['rss'])
+    parser.add_argument('--pid', type=int, help='gunicorn master pid (found automatically when omitted)')
+    args = parser.parse_args()
+
+    master_pid = args.pid or find_gunicorn_master()
+    if master_pid is None:
+        sys.exit('No gunicorn master serving app:application found')
+    print_server_memory(server_memory(master_pid))
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Dynamic Pricing Engine
+Batch rate recommendations over a date x room type matrix, stored for O(1) lookups
+"""
+
+import logging
+from datetime import date, timedelta
+
+from forecasting import (
+    HISTORY_DAYS, MAX_LEAD_DAYS, _weekday,
+    fit_demand_model, load_stay_nights, on_books_matrix
+)
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+PRICING_HORIZON_DAYS = 365
+HOTEL_BATCH_SIZE = 50
+WEEKEND_NIGHTS = (4, 5)  # Friday and Saturday nights
+PEAK_SEASON_MONTHS = (6, 7, 8, 12)
+MIN_MULTIPLIER = 0.7
+MAX_MULTIPLIER = 1.6
+
+PRICING_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS rate_recommendations (
+        room_type_id INTEGER NOT NULL,
+        stay_date DATE NOT NULL,
+        hotel_id INTEGER NOT NULL,
+        base_rate DECIMAL(10,2) NOT NULL,
+        recommended_price DECIMAL(10,2) NOT NULL,
+        on_books INTEGER DEFAULT 0,
+        expected_on_books DECIMAL(10,2) DEFAULT 0,
+        occupancy DECIMAL(5,4) DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (room_type_id, stay_date),
+        FOREIGN KEY (hotel_id) REFERENCES hotels (id),
+        FOREIGN KEY (room_type_id) REFERENCES room_types (id)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_rate_recommendations_hotel ON rate_recommendations (hotel_id, stay_date)',
+]
+
+def load_pricing_room_types(conn, hotel_ids=None):
+    """Load active room types with their static price points, ordered by id"""
+    query = '''
+        SELECT id, hotel_id, COALESCE(total_rooms, 10), base_price,
+               COALESCE(weekend_price, base_price), COALESCE(peak_season_price, base_price)
+        FROM room_types WHERE is_active = 1
+    '''
+    params = ()
+    if hotel_ids is not None:
+        query += f' AND hotel_id IN ({",".join("?" * len(hotel_ids))})'
+        params = tuple(hotel_ids)
+    rows = conn.execute(query + ' ORDER BY id', params).fetchall()
+    data = np.array(rows, dtype=float).reshape(-1, 6)
+    return {
+        'ids': data[:, 0].astype(np.int64),
+        'hotel_ids': data[:, 1].astype(np.int64),
+        'capacity': data[:, 2],
+        'base': data[:, 3],
+        'weekend': data[:, 4],
+        'peak': data[:, 5]
+    }
+
+def base_rate_matrix(room_types, first_day, horizon):
+    """Static rate card (base / weekend / peak season) as a (room type, horizon) matrix"""
+    days = first_day + np.arange(horizon)
+    is_weekend = np.isin(_weekday(days), WEEKEND_NIGHTS)
+    months = np.array([date.fromordinal(int(day)).month for day in days])
+    is_peak = np.isin(months, PEAK_SEASON_MONTHS)
+    return np.where(
+        is_peak[None, :], room_types['peak'][:, None],
+        np.where(is_weekend[None, :], room_types['weekend'][:, None], room_types['base'][:, None])
+    )
+
+def recommend_prices(base_rate, on_books, expected_on_books, capacity, lead):
+    """Price multiplier from occupancy, booking pace and lead time; all inputs broadcast"""
+    occupancy = np.clip(on_books / np.maximum(capacity, 1), 0, 1)
+    occupancy_factor = 0.85 + 0.5 * occupancy
+    # Pace: ahead of the usual booking curve at this lead time pushes rates up
+    pace = (on_books + 1.0) / (expected_on_books + 1.0)
+    pace_factor = np.clip(1.0 + 0.15 * (pace - 1.0), 0.9, 1.15)
+    # Last-minute nights with spare rooms get discounted
+    lead_factor = np.where(lead <= 3, 1.0 - 0.1 * (1.0 - occupancy), 1.0)
+    multiplier = np.clip(occupancy_factor * pace_factor * lead_factor, MIN_MULTIPLIER, MAX_MULTIPLIER)
+    return np.round(base_rate * multiplier, 2), occupancy
+
+def reprice_hotels(conn, hotel_ids=None, today=None, horizon=PRICING_HORIZON_DAYS):
+    """Recompute the full rolling horizon for a batch of hotels"""
+    today = (today or date.today()).toordinal()
+    room_types = load_pricing_room_types(conn, hotel_ids)
+    n_series = len(room_types['ids'])
+    if n_series == 0:
+        return 0
+
+    series_index, stay_day, lead = load_stay_nights(
+        conn, room_types['ids'], today - HISTORY_DAYS, today + horizon
+    )
+    baseline, pickup = fit_demand_model(series_index, stay_day, lead, n_series, today)
+    on_books = on_books_matrix(series_index, stay_day, n_series, today, horizon)
+
+    days_out = np.arange(horizon)
+    dow = _weekday(today + days_out)
+    expected = np.maximum(baseline[:, dow] - pickup[:, dow, np.minimum(days_out, MAX_LEAD_DAYS)], 0)
+    base_rate = base_rate_matrix(room_types, today, horizon)
+    price, occupancy = recommend_prices(
+        base_rate, on_books, expected, room_types['capacity'][:, None], days_out[None, :]
+    )
+
+    dates = [date.fromordinal(today + offset).isoformat() for offset in range(horizon)]
+    base_rate, price = base_rate.tolist(), price.tolist()
+    on_books, expected = on_books.astype(int).tolist(), np.round(expected, 2).tolist()
+    occupancy = np.round(occupancy, 4).tolist()
+    rows = [
+        (room_type_id, dates[d], hotel_id, base_rate[s][d], price[s][d],
+         on_books[s][d], expected[s][d], occupancy[s][d])
+        for s, (room_type_id, hotel_id) in enumerate(zip(
+            room_types['ids'].tolist(), room_types['hotel_ids'].tolist()
+        ))
+        for d in range(horizon)
+    ]
+    conn.executemany('''
+        INSERT OR REPLACE INTO rate_recommendations (
+            room_type_id, stay_date, hotel_id, base_rate, recommended_price,
+            on_books, expected_on_books, occupancy, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', rows)
+    hotels = sorted(set(room_types['hotel_ids'].tolist()))
+    conn.execute(f'''
+        DELETE FROM rate_recommendations
+        WHERE stay_date < ? AND hotel_id IN ({",".join("?" * len(hotels))})
+    ''', (dates[0],) + tuple(hotels))
+    conn.commit()
+    return len(rows)
+
+def run_nightly_repricing(conn, today=None, horizon=PRICING_HORIZON_DAYS, batch_size=HOTEL_BATCH_SIZE):
+    """Reprice every active hotel in batches"""
+    hotel_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM hotels WHERE status = 'active' ORDER BY id"
+    ).fetchall()]
+    written = 0
+    for start in range(0, len(hotel_ids), batch_size):
+        written += reprice_hotels(conn, hotel_ids[start:start + batch_size], today, horizon)
+    logger.info(f"Nightly repricing stored {written} rates for {len(hotel_ids)} hotels")
+    return written
+
+def reprice_stay(conn, room_type_id, check_in, check_out, today=None):
+    """Reprice only the stored cells covered by one reservation's nights.
+
+    Runs inside the caller's transaction so the rates move together with the booking.
+    """
+    today = (today or date.today()).toordinal()
+    first_day = max(date.fromisoformat(str(check_in)).toordinal(), today)
+    last_day = date.fromisoformat(str(check_out)).toordinal()
+    if last_day <= first_day:
+        return 0
+
+    cells = conn.execute('''
+        SELECT r.stay_date, r.base_rate, r.expected_on_books, COALESCE(t.total_rooms, 10)
+        FROM rate_recommendations r JOIN room_types t ON t.id = r.room_type_id
+        WHERE r.room_type_id = ? AND r.stay_date >= ? AND r.stay_date < ?
+        ORDER BY r.stay_date
+    ''', (
+        room_type_id, date.fromordinal(first_day).isoformat(), date.fromordinal(last_day).isoformat()
+    )).fetchall()
+    if not cells:
+        return 0
+
+    series_index, stay_day, _ = load_stay_nights(
+        conn, np.array([room_type_id], dtype=np.int64), first_day, last_day
+    )
+    sold = on_books_matrix(series_index, stay_day, 1, first_day, last_day - first_day)[0]
+
+    stay_dates = [cell[0] for cell in cells]
+    offsets = np.array([date.fromisoformat(d).toordinal() - first_day for d in stay_dates])
+    data = np.array([cell[1:] for cell in cells], dtype=float)
+    price, occupancy = recommend_prices(data[:, 0], sold[offsets], data[:, 1], data[:, 2], offsets + (first_day - today))
+
+    conn.executemany('''
+        UPDATE rate_recommendations
+        SET recommended_price = ?, on_books = ?, occupancy = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE room_type_id = ? AND stay_date = ?
+    ''', [
+        (p, n, o, room_type_id, d)
+        for p, n, o, d in zip(price.tolist(), sold[offsets].astype(int).tolist(),
+                              np.round(occupancy, 4).tolist(), stay_dates)
+    ])
+    return len(cells)
+
+def get_recommended_rates(conn, hotel_id, room_type_id=None, start_date=None, days=30):
+    """Read stored recommendations; never computes prices on the request path"""
+    start_date = start_date or date.today()
+    query = '''
+        SELECT room_type_id, stay_date, base_rate, recommended_price, occupancy
+        FROM rate_recommendations
+        WHERE hotel_id = ? AND stay_date >= ? AND stay_date < ?
+    '''
+    params = [hotel_id, start_date.isoformat(), (start_date + timedelta(days=days)).isoformat()]
+    if room_type_id is not None:
+        query += ' AND room_type_id = ?'
+        params.append(room_type_id)
+    rows = conn.execute(query + ' ORDER BY room_type_id, stay_date', params).fetchall()
+
+    rates = {}
+    for row_room_type_id, stay_date, base_rate, recommended_price, occupancy in rows:
+        rates.setdefault(row_room_type_id, []).append({
+            'date': stay_date,
+            'base_rate': base_rate,
+            'recommended_price': recommended_price,
+            'occupancy': occupancy
+        })
+    return rates
+
+if __name__ == '__main__':
+    from ultra_comprehensive_system import create_app, shards
+
+    create_app()
+    shards.run_everywhere(run_nightly_repricing)
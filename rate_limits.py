@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Rate Limiting & Usage Metering
+Per-tenant token buckets by subscription plan and batched usage counters per billing period
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Server-rendered pages that query the database on every request
+PAGE_ROUTES = ('/', '/admin/dashboard')
+
+# (tokens per second, burst size) per route class
+PLAN_LIMITS = {
+    'basic': {
+        'api': (5, 20),
+        'booking': (2, 10),
+        'public': (10, 40),
+        'page': (10, 60)
+    },
+    'enterprise': {
+        'api': (50, 200),
+        'booking': (20, 100),
+        'public': (100, 400),
+        'page': (100, 600)
+    }
+}
+DEFAULT_PLAN = 'basic'
+# Buckets kept per process; anonymous clients get one each, so the least recently used go
+MAX_BUCKETS = 100000
+
+METRIC_API_REQUESTS = 'api_requests'
+
+USAGE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS usage_counters (
+        hotel_id INTEGER NOT NULL,
+        period TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (hotel_id, period, metric),
+        FOREIGN KEY (hotel_id) REFERENCES hotels (id)
+    ) WITHOUT ROWID
+    ''',
+]
+
+def billing_period(moment=None):
+    """Monthly billing period key, e.g. '2024-06'"""
+    return (moment or datetime.utcnow()).strftime('%Y-%m')
+
+def classify_route(path, method):
+    """Route class used for rate limiting, or None for static pages and probes that are not limited"""
+    if path.startswith('/api/widget/') or path.startswith('/api/guest/'):
+        return 'public'
+    if path.startswith('/api/reservations') and method not in ('GET', 'HEAD'):
+        return 'booking'
+    if path.startswith('/api/'):
+        return 'api'
+    if path in PAGE_ROUTES:
+        return 'page'
+    return None
+
+class TokenBucketLimiter:
+    """In-memory token buckets keyed by (hotel_id or client, route class).
+
+    At most max_buckets are kept; the least recently used is dropped first, which only
+    forgets a bucket that has long since refilled.
+    """
+
+    def __init__(self, plan_limits=PLAN_LIMITS, max_buckets=MAX_BUCKETS):
+        self.plan_limits = plan_limits
+        self.max_buckets = max_buckets
+        self.rejected = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, hotel_id, plan, route_class, cost=1.0):
+        """Take tokens from a bucket; returns (allowed, retry_after_seconds, remaining_tokens)"""
+        limits = self.plan_limits.get(plan) or self.plan_limits[DEFAULT_PLAN]
+        rate, burst = limits[route_class]
+        now = time.monotonic()
+        key = (hotel_id, route_class)
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            else:
+                self.rejected += 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        if allowed:
+            return True, 0.0, int(tokens)
+        return False, (cost - tokens) / rate, 0
+
+class UsageMeter:
+    """Usage counters held in memory and written to usage_counters in batches"""
+
+    def __init__(self, connection_factory, flush_interval=30.0, flush_threshold=1000):
+        self._connect = connection_factory
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._counts = {}
+        self._pending = 0
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, hotel_id, metric, amount=1):
+        """Count usage for the current billing period"""
+        key = (hotel_id, billing_period(), metric)
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + amount
+            self._pending += 1
+
+    def maybe_flush(self):
+        """Flush when the interval elapsed or enough events are buffered"""
+        if self._pending >= self.flush_threshold or time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write buffered counters with one batched upsert; keeps them on failure"""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            pending, self._pending = self._pending, 0
+            self._flushed_at = time.monotonic()
+        if not counts:
+            return 0
+        try:
+            conn = self._connect()
+            try:
+                conn.executemany('''
+                    INSERT INTO usage_counters (hotel_id, period, metric, count) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (hotel_id, period, metric) DO UPDATE SET
+                        count = usage_counters.count + excluded.count,
+                        updated_at = CURRENT_TIMESTAMP
+                ''', [key + (count,) for key, count in counts.items()])
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.error(f"Usage flush failed: {e}")
+            with self._lock:
+                for key, count in counts.items():
+                    self._counts[key] = self._counts.get(key, 0) + count
+                self._pending += pending
+            return 0
+        return len(counts)
+
+    def discard(self):
+        """Drop buffered counters without writing them (a forked worker's copy of its parent's)"""
+        with self._lock:
+            self._counts = {}
+            self._pending = 0
+            self._flushed_at = time.monotonic()
+
+    @property
+    def pending(self):
+        """Usage events recorded since the last flush"""
+        return self._pending
+
+    def buffered(self, hotel_id, period):
+        """Counts recorded but not yet flushed for a hotel and period"""
+        with self._lock:
+            return {
+                metric: count for (key_hotel, key_period, metric), count in self._counts.items()
+                if key_hotel == hotel_id and key_period == period
+            }
+
+def get_usage(conn, meter, hotel_id, period=None):
+    """Usage per metric for a billing period: flushed counters plus this process's buffer"""
+    period = period or billing_period()
+    usage = {
+        metric: count for metric, count in conn.execute(
+            'SELECT metric, count FROM usage_counters WHERE hotel_id = ? AND period = ?',
+            (hotel_id, period)
+        )
+    }
+    for metric, count in meter.buffered(hotel_id, period).items():
+        usage[metric] = usage.get(metric, 0) + count
+    return usage
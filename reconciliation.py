@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Payment Reconciliation
+Matches provider settlement files against payments and reservations in bulk
+
+Usage: python reconciliation.py settlements.csv [--hotel-id 7] [--unmatched unmatched.csv] [--dry-run]
+"""
+
+import csv
+import time
+import codecs
+import logging
+import argparse
+from datetime import date, datetime, timezone
+
+from ledger import SETTLED_STATUSES
+from guest_lookup import invalidate_reservation
+
+logger = logging.getLogger(__name__)
+
+# Settlement columns and the header names providers use for them (first match wins)
+SETTLEMENT_COLUMNS = {
+    'reference': ('reference', 'payment_reference', 'transaction_id', 'source_id', 'charge_id', 'id'),
+    'amount': ('amount', 'gross', 'gross_amount'),
+    'currency': ('currency',),
+    'settled_on': ('date', 'settled_on', 'settlement_date', 'value_date', 'available_on', 'created_utc', 'created')
+}
+
+# Days a settlement may be booked away from its payment; providers pay out T+0 to T+7
+DATE_TOLERANCE_DAYS = 7
+PENDING_STATUSES = ('pending', 'processing')
+UNMATCHED_REPORT_LIMIT = 1000
+
+def _header_positions(header):
+    """Index of each settlement column in a CSV header row"""
+    names = [name.strip().lower().replace(' ', '_') for name in header]
+    positions = {}
+    for column, aliases in SETTLEMENT_COLUMNS.items():
+        positions[column] = next((names.index(alias) for alias in aliases if alias in names), None)
+    missing = [column for column in ('reference', 'amount') if positions[column] is None]
+    if missing:
+        raise ValueError(f"Settlement file has no {' or '.join(missing)} column")
+    return positions
+
+def _parse_cents(value):
+    """Decimal amount as integer cents; None when unreadable"""
+    try:
+        return round(float(value.replace(',', '').strip()) * 100)
+    except (AttributeError, ValueError):
+        return None
+
+def _parse_day(value):
+    """ISO date or timestamp, or Unix seconds, as YYYY-MM-DD; None when unreadable"""
+    value = (value or '').strip()
+    if value.isdigit():
+        return datetime.fromtimestamp(int(value), timezone.utc).date().isoformat()
+    try:
+        return date.fromisoformat(value[:10]).isoformat()
+    except ValueError:
+        return None
+
+def read_settlements(rows):
+    """Settlement lines (line, reference, amount_cents, currency, settled_on, valid) from CSV rows, lazily.
+
+    A line is valid when it has a reference and its amount, and date if the file has a
+    date column, parse; files without dates are matched on reference and amount alone.
+    """
+    rows = iter(rows)
+    positions = _header_positions(next(rows, []))
+    dated = positions['settled_on'] is not None
+
+    def field(row, column):
+        position = positions[column]
+        return row[position].strip() if position is not None and position < len(row) else None
+
+    for line, row in enumerate(rows, 2):
+        if not any(row):
+            continue
+        reference, amount_cents = field(row, 'reference') or None, _parse_cents(field(row, 'amount'))
+        currency, settled_on = field(row, 'currency'), _parse_day(field(row, 'settled_on'))
+        valid = reference is not None and amount_cents is not None and (settled_on is not None or not dated)
+        yield line, reference, amount_cents, currency.upper() if currency else None, settled_on, int(valid)
+
+def _load(cursor, settlements):
+    """Stream settlement lines into a temp table; nothing is held in memory"""
+    for table in ('settlement_lines', 'settlement_candidates', 'settlement_matches'):
+        cursor.execute(f'DROP TABLE IF EXISTS temp.{table}')
+    cursor.execute('''
+        CREATE TEMP TABLE settlement_lines (
+            line INTEGER PRIMARY KEY,
+            reference TEXT,
+            amount_cents INTEGER,
+            currency TEXT,
+            settled_on DATE,
+            valid INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TEMP TABLE settlement_candidates (
+            line INTEGER NOT NULL,
+            payment_id INTEGER,
+            reservation_id INTEGER,
+            amount_ok INTEGER NOT NULL,
+            date_ok INTEGER NOT NULL,
+            drift REAL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TEMP TABLE settlement_matches (
+            line INTEGER PRIMARY KEY,
+            payment_id INTEGER,
+            reservation_id INTEGER
+        )
+    ''')
+    cursor.executemany('INSERT INTO temp.settlement_lines VALUES (?, ?, ?, ?, ?, ?)', settlements)
+    return cursor.execute('SELECT COUNT(*) FROM temp.settlement_lines').fetchone()[0]
+
+def _collect_candidates(cursor, params):
+    """Every payment and reservation sharing a line's reference, flagged by amount and date fit.
+
+    Each branch drives from the settlement lines into an index on the reference column,
+    so the work grows with the file, not with the payments table. Invalid lines are left
+    out; a line without a date fits any date, and a missing payment amount or date fits none.
+    """
+    payment_fit = '''
+        SELECT s.line, p.id, p.reservation_id,
+               COALESCE(s.amount_cents = CAST(ROUND(p.amount * 100) AS INTEGER), 0)
+                   AND (s.currency IS NULL OR s.currency = COALESCE(p.currency, 'EUR')),
+               s.settled_on IS NULL OR COALESCE(
+                   ABS(julianday(s.settled_on) - julianday(date(COALESCE(p.payment_date, p.created_at)))) <= :tolerance, 0
+               ),
+               ABS(julianday(s.settled_on) - julianday(date(COALESCE(p.payment_date, p.created_at))))
+        FROM temp.settlement_lines s JOIN payments p ON p.{column} = s.reference
+        WHERE s.valid AND (:hotel_id IS NULL OR p.hotel_id = :hotel_id)
+    '''
+    # Direct payments are settled between booking and a few days after check-out
+    reservation_fit = '''
+        SELECT s.line, NULL, r.id,
+               COALESCE(s.amount_cents = CAST(ROUND(r.total_price * 100) AS INTEGER), 0)
+                   AND (s.currency IS NULL OR s.currency = COALESCE(r.currency, 'EUR')),
+               s.settled_on IS NULL OR COALESCE(
+                   s.settled_on BETWEEN date(r.created_at, '-1 day') AND date(r.check_out, '+' || :tolerance || ' days'), 0
+               ),
+               ABS(julianday(s.settled_on) - julianday(date(r.created_at)))
+        FROM temp.settlement_lines s JOIN reservations r ON r.{column} = s.reference
+        WHERE s.valid AND (:hotel_id IS NULL OR r.hotel_id = :hotel_id)
+    '''
+    cursor.execute(f'''
+        INSERT INTO temp.settlement_candidates (line, payment_id, reservation_id, amount_ok, date_ok, drift)
+        {payment_fit.format(column='payment_reference')}
+        UNION {payment_fit.format(column='transaction_id')}
+        UNION {reservation_fit.format(column='confirmation_code')}
+        UNION {reservation_fit.format(column='payment_reference')}
+    ''', params)
+
+def _pick(cursor, key):
+    """Match each line to its closest fitting candidate, using each payment / reservation once"""
+    return cursor.execute(f'''
+        INSERT INTO temp.settlement_matches (line, payment_id, reservation_id)
+        SELECT line, payment_id, reservation_id FROM (
+            SELECT line, payment_id, reservation_id,
+                   ROW_NUMBER() OVER (PARTITION BY line ORDER BY drift, {key}) AS line_rank,
+                   ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY drift, line) AS key_rank
+            FROM temp.settlement_candidates
+            WHERE amount_ok AND date_ok AND {key} IS NOT NULL
+              {'AND payment_id IS NULL' if key == 'reservation_id' else ''}
+              AND line NOT IN (SELECT line FROM temp.settlement_matches)
+        )
+        WHERE line_rank = 1 AND key_rank = 1
+    ''').rowcount
+
+def _apply(cursor):
+    """Complete matched pending payments and set the payment status of their reservations.
+
+    Returns the counts and the confirmation codes of the reservations updated.
+    """
+    pending = ', '.join(repr(status) for status in PENDING_STATUSES)
+    settled = ', '.join(repr(status) for status in SETTLED_STATUSES)
+    payments_completed = cursor.execute(f'''
+        UPDATE payments SET status = 'completed', payment_date = COALESCE(payments.payment_date, s.settled_on)
+        FROM temp.settlement_matches m JOIN temp.settlement_lines s ON s.line = m.line
+        WHERE payments.id = m.payment_id AND payments.status IN ({pending})
+    ''').rowcount
+    # A reservation is paid once its settled payments and direct settlements cover the total
+    updated_codes = [code for code, in cursor.execute(f'''
+        UPDATE reservations SET
+            payment_status = CASE
+                WHEN t.direct_cents + COALESCE((
+                    SELECT CAST(ROUND(SUM(p.amount) * 100) AS INTEGER) FROM payments p
+                    WHERE p.reservation_id = t.reservation_id AND p.status IN ({settled})
+                ), 0) >= CAST(ROUND(reservations.total_price * 100) AS INTEGER) THEN 'paid'
+                ELSE 'partially_paid'
+            END,
+            payment_reference = COALESCE(reservations.payment_reference, t.reference),
+            updated_at = CURRENT_TIMESTAMP
+        FROM (
+            SELECT m.reservation_id, MIN(s.reference) AS reference,
+                   SUM(CASE WHEN m.payment_id IS NULL THEN s.amount_cents ELSE 0 END) AS direct_cents
+            FROM temp.settlement_matches m JOIN temp.settlement_lines s ON s.line = m.line
+            WHERE m.reservation_id IS NOT NULL
+            GROUP BY m.reservation_id
+        ) t
+        WHERE reservations.id = t.reservation_id AND reservations.payment_status IS NOT 'paid'
+        RETURNING reservations.confirmation_code
+    ''').fetchall()]
+    return payments_completed, len(updated_codes), updated_codes
+
+def _unmatched(cursor, limit):
+    """Unmatched lines with the reason they did not match, and counts per reason"""
+    cursor.execute('''
+        CREATE TEMP VIEW IF NOT EXISTS settlement_unmatched AS
+        SELECT s.line, s.reference, s.amount_cents, s.currency, s.settled_on,
+               CASE
+                   WHEN NOT s.valid THEN 'invalid'
+                   WHEN s.amount_cents <= 0 THEN 'not_a_charge'
+                   WHEN c.line IS NULL THEN 'unknown_reference'
+                   WHEN NOT c.amount_ok THEN 'amount_mismatch'
+                   WHEN NOT c.fits THEN 'date_mismatch'
+                   ELSE 'duplicate'
+               END AS reason
+        FROM temp.settlement_lines s
+        LEFT JOIN (
+            SELECT line, MAX(amount_ok) AS amount_ok, MAX(amount_ok AND date_ok) AS fits
+            FROM temp.settlement_candidates GROUP BY line
+        ) c ON c.line = s.line
+        WHERE s.line NOT IN (SELECT line FROM temp.settlement_matches)
+    ''')
+    by_reason = dict(cursor.execute(
+        'SELECT reason, COUNT(*) FROM temp.settlement_unmatched GROUP BY reason ORDER BY reason'
+    ).fetchall())
+    rows = [
+        {
+            'line': line, 'reference': reference,
+            'amount': amount_cents / 100 if amount_cents is not None else None,
+            'currency': currency, 'settled_on': settled_on, 'reason': reason
+        }
+        for line, reference, amount_cents, currency, settled_on, reason in cursor.execute(
+            'SELECT * FROM temp.settlement_unmatched ORDER BY line LIMIT ?', (-1 if limit is None else limit,)
+        )
+    ]
+    return by_reason, rows
+
+def reconcile(conn, settlements, hotel_id=None, dry_run=False, unmatched_limit=UNMATCHED_REPORT_LIMIT):
+    """Reconcile settlement lines (see read_settlements) against one hotel's or all payments.
+
+    A line matches a payment whose payment_reference or transaction_id equals its
+    reference, with the same amount and currency, settled within DATE_TOLERANCE_DAYS;
+    failing that, a reservation by confirmation code or payment reference. Matching,
+    payment completion and reservation payment_status updates are a handful of
+    set-based statements in one transaction; dry runs roll them back.
+    """
+    started = time.perf_counter()
+    params = {'hotel_id': hotel_id, 'tolerance': DATE_TOLERANCE_DAYS}
+    cursor = conn.cursor()
+    try:
+        lines = _load(cursor, settlements)
+        _collect_candidates(cursor, params)
+        matched_payments = _pick(cursor, 'payment_id')
+        matched_reservations = _pick(cursor, 'reservation_id')
+        payments_completed, reservations_updated, updated_codes = _apply(cursor)
+        unmatched_by_reason, unmatched_rows = _unmatched(cursor, unmatched_limit)
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+            for code in updated_codes:
+                if code:
+                    invalidate_reservation(code)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute('DROP VIEW IF EXISTS temp.settlement_unmatched')
+        for table in ('settlement_lines', 'settlement_candidates', 'settlement_matches'):
+            cursor.execute(f'DROP TABLE IF EXISTS temp.{table}')
+    report = {
+        'hotel_id': hotel_id,
+        'dry_run': dry_run,
+        'lines': lines,
+        'matched': matched_payments + matched_reservations,
+        'matched_payments': matched_payments,
+        'matched_reservations': matched_reservations,
+        'payments_completed': payments_completed,
+        'reservations_updated': reservations_updated,
+        'unmatched': sum(unmatched_by_reason.values()),
+        'unmatched_by_reason': unmatched_by_reason,
+        'unmatched_rows': unmatched_rows,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+    logger.info(f"Reconciled {lines} settlement lines for hotel {hotel_id or 'all'}: "
+                f"{report['matched']} matched, {report['unmatched']} unmatched in {report['duration_ms']}ms")
+    return report
+
+def reconcile_file(conn, fileobj, hotel_id=None, dry_run=False, unmatched_limit=UNMATCHED_REPORT_LIMIT):
+    """Reconcile a binary CSV stream (an upload or an open file) without reading it whole"""
+    rows = csv.reader(codecs.iterdecode(fileobj, 'utf-8-sig'))
+    return reconcile(conn, read_settlements(rows), hotel_id, dry_run, unmatched_limit)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Reconcile a provider settlement file against payments')
+    parser.add_argument('path', help='settlement CSV (reference, amount, currency, date)')
+    parser.add_argument('--hotel-id', type=int, help='reconcile one hotel (default: the whole catalog)')
+    parser.add_argument('--unmatched', help='write every unmatched line to this CSV')
+    parser.add_argument('--dry-run', action='store_true', help='report without updating anything')
+    args = parser.parse_args()
+
+    from ultra_comprehensive_system import create_app, get_db_connection, get_tenant_connection
+
+    create_app()
+    conn = get_tenant_connection(args.hotel_id) if args.hotel_id else get_db_connection()
+    try:
+        with open(args.path, 'rb') as f:
+            report = reconcile_file(conn, f, args.hotel_id, args.dry_run, unmatched_limit=None)
+    finally:
+        conn.close()
+
+    unmatched_rows = report.pop('unmatched_rows')
+    if args.unmatched:
+        with open(args.unmatched, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['line', 'reference', 'amount', 'currency', 'settled_on', 'reason'])
+            writer.writeheader()
+            writer.writerows(unmatched_rows)
+    print(f"{report['lines']} lines: {report['matched']} matched "
+          f"({report['matched_payments']} payments, {report['matched_reservations']} reservations), "
+          f"{report['unmatched']} unmatched {report['unmatched_by_reason']}")
+    print(f"{report['payments_completed']} payments completed, {report['reservations_updated']} reservations updated"
+          f"{' (dry run, rolled back)' if args.dry_run else ''} in {report['duration_ms']:.0f}ms")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Reservation Search
+Type-ahead search over guest name, email, phone and confirmation code (FTS5 trigram index)
+"""
+
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# Trigram index: shorter terms cannot be looked up
+MIN_TERM_LENGTH = 3
+
+# The trigram tokenizer folds case one character at a time and keeps accents, so İ, ı
+# and i never meet; Turkish letters are folded in SQL before indexing and in Python
+# before matching, so yilmaz, YILMAZ and Yılmaz all find each other
+SEARCH_FOLDS = {
+    'İ': 'i', 'ı': 'i', 'Ş': 's', 'ş': 's', 'Ğ': 'g', 'ğ': 'g', 'Ç': 'c', 'ç': 'c',
+    'Ö': 'o', 'ö': 'o', 'Ü': 'u', 'ü': 'u', 'Â': 'a', 'â': 'a', 'Î': 'i', 'î': 'i', 'Û': 'u', 'û': 'u'
+}
+SEARCH_TRANSLATION = str.maketrans(SEARCH_FOLDS)
+# Marks the hotel in the index, so the MATCH itself is scoped to one tenant
+HOTEL_MARKER = '#'
+# Separators dropped from phone numbers, so 0532 111 22 33 is found by 5321112233
+PHONE_SEPARATORS = (' ', '-', '.', '(', ')', '/', '+')
+
+SEARCH_COLUMNS = '''
+    r.id, r.confirmation_code, r.guest_name, r.guest_email, r.guest_phone,
+    r.room_type_id, r.check_in, r.check_out, r.status, r.payment_status
+'''
+
+def _fold(expression):
+    """SQL expression applying SEARCH_FOLDS to a text expression"""
+    for char, folded in SEARCH_FOLDS.items():
+        expression = f"replace({expression}, '{char}', '{folded}')"
+    return expression
+
+def _digits(expression):
+    """SQL expression dropping PHONE_SEPARATORS from a text expression"""
+    for separator in PHONE_SEPARATORS:
+        expression = f"replace({expression}, '{separator}', '')"
+    return expression
+
+def _document(row):
+    """Indexed column values of a reservations row (NEW / OLD)"""
+    return (f"'{HOTEL_MARKER}' || {row}.hotel_id || '{HOTEL_MARKER}', {_fold(f'{row}.guest_name')}, {_fold(f'{row}.guest_email')}, "
+            f"{_digits(f'{row}.guest_phone')}, {row}.confirmation_code")
+
+def _index(row):
+    """Statement adding a reservations row to the search index"""
+    return f'''
+        INSERT INTO reservation_search (rowid, hotel, name, email, phone, code)
+        VALUES ({row}.id, {_document(row)});
+    '''
+
+def _unindex(row):
+    """Statement removing a reservations row from the search index.
+
+    The index is contentless, so removal repeats the exact values that were indexed.
+    """
+    return f'''
+        INSERT INTO reservation_search (reservation_search, rowid, hotel, name, email, phone, code)
+        VALUES ('delete', {row}.id, {_document(row)});
+    '''
+
+RESERVATION_SEARCH_SCHEMA = [
+    # Contentless: the index holds trigrams only and results are read from reservations by rowid
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS reservation_search USING fts5(
+        hotel, name, email, phone, code, content='', tokenize='trigram'
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_reservations_search_insert AFTER INSERT ON reservations
+    BEGIN {_index('NEW')} END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_reservations_search_delete AFTER DELETE ON reservations
+    BEGIN {_unindex('OLD')} END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_reservations_search_update
+    AFTER UPDATE OF hotel_id, guest_name, guest_email, guest_phone, confirmation_code ON reservations
+    BEGIN {_unindex('OLD')} {_index('NEW')} END
+    ''',
+]
+
+def backfill_reservation_search(cursor):
+    """Index existing reservations when the search index is still empty"""
+    if cursor.execute('SELECT rowid FROM reservation_search LIMIT 1').fetchone():
+        return 0
+    indexed = cursor.execute(f'''
+        INSERT INTO reservation_search (rowid, hotel, name, email, phone, code)
+        SELECT id, {_document('reservations')} FROM reservations
+    ''').rowcount
+    if indexed:
+        logger.info(f"Reservation search index built for {indexed} reservations")
+    return indexed
+
+def search_query(text):
+    """FTS5 query for what staff typed, or None when no term is long enough.
+
+    Digits-only input is a phone number and searched as one run of digits (leading zeros
+    dropped, so 0532... also finds +90 532...); otherwise every term of at least
+    MIN_TERM_LENGTH characters must appear in some column, in any order.
+    """
+    text = (text or '').translate(SEARCH_TRANSLATION).strip()
+    if text and not re.search(r'[^\d\s\-.()/+]', text):
+        digits = re.sub(r'\D', '', text).lstrip('0')
+        return f'phone : "{digits}"' if len(digits) >= MIN_TERM_LENGTH else None
+    terms = [term.replace('"', '""') for term in text.split() if len(term) >= MIN_TERM_LENGTH]
+    return ' AND '.join(f'{{name email phone code}} : "{term}"' for term in terms) or None
+
+def search_reservations(conn, hotel_id, text, limit=SEARCH_LIMIT):
+    """Newest reservations of a hotel matching the search text.
+
+    The hotel marker is part of the MATCH, so the index only yields this hotel's rows
+    and the newest-first walk stops after limit of them.
+    """
+    query = search_query(text)
+    if query is None:
+        return []
+    query = f'hotel : "{HOTEL_MARKER}{hotel_id}{HOTEL_MARKER}" AND ({query})'
+    cursor = conn.execute(f'''
+        SELECT {SEARCH_COLUMNS}
+        FROM reservation_search s JOIN reservations r ON r.id = s.rowid
+        WHERE reservation_search MATCH ? AND r.hotel_id = ?
+        ORDER BY s.rowid DESC
+        LIMIT ?
+    ''', (query, hotel_id, limit))
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Customer Segmentation
+Nightly RFM (recency, frequency, monetary) scoring per hotel, vectorized with NumPy
+"""
+
+import logging
+from datetime import date
+
+from lazy_imports import lazy_import
+from forecasting import ORDINAL_OFFSET
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+HOTEL_BATCH_SIZE = 100
+SCORE_LEVELS = 5
+MEMBER_PAGE_SIZE = 100
+
+# First matching rule wins; scores run from 1 (worst) to SCORE_LEVELS (best)
+SEGMENT_PROSPECT = 'prospect'
+SEGMENTS = ('champions', 'loyal', 'promising', 'at_risk', 'hibernating', 'needs_attention', SEGMENT_PROSPECT)
+
+# vip_status values the job manages; anything else was set by staff and is kept
+VIP = 'vip'
+REGULAR = 'regular'
+
+def load_rfm(conn, hotel_ids, today):
+    """Customers of a batch of hotels with their stay history as arrays.
+
+    Returns (customer_ids, hotel_index, recency_days, frequency, monetary, current) where
+    hotel_index numbers the hotels 0..n-1, recency is NaN for customers without a stay
+    and current holds the stored (rfm_score, segment, vip_status) per customer.
+    """
+    placeholders = ','.join('?' * len(hotel_ids))
+    # Stays are grouped along idx_reservations_guest_email (hotel_id, lower(guest_email))
+    rows = conn.execute(f'''
+        SELECT c.id, c.hotel_id, ? - stays.last_day, COALESCE(stays.bookings, 0), COALESCE(stays.spent, 0),
+               c.rfm_score, c.segment, c.vip_status
+        FROM customers c
+        LEFT JOIN (
+            SELECT hotel_id, lower(guest_email) AS email, COUNT(*) AS bookings, SUM(total_price) AS spent,
+                   MAX(CAST(julianday(check_out) - {ORDINAL_OFFSET} AS INTEGER)) AS last_day
+            FROM reservations
+            WHERE hotel_id IN ({placeholders}) AND status != 'cancelled' AND check_in <= ?
+            GROUP BY hotel_id, lower(guest_email)
+        ) stays ON stays.hotel_id = c.hotel_id AND stays.email = lower(c.email)
+        WHERE c.hotel_id IN ({placeholders})
+        ORDER BY c.id
+    ''', (today, *hotel_ids, date.fromordinal(today).isoformat(), *hotel_ids)).fetchall()
+    if not rows:
+        empty = np.zeros(0)
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), empty, empty, empty, []
+    customer_ids, hotels, recency, frequency, monetary, *_ = zip(*rows)
+    _, hotel_index = np.unique(np.array(hotels, dtype=np.int64), return_inverse=True)
+    return (
+        np.array(customer_ids, dtype=np.int64), hotel_index,
+        np.array([np.nan if days is None else days for days in recency], dtype=float),
+        np.array(frequency, dtype=float), np.array(monetary, dtype=float),
+        [row[5:] for row in rows]
+    )
+
+def quantile_scores(groups, values, levels=SCORE_LEVELS):
+    """Score values 1..levels by their quantile within their group, for all groups at once.
+
+    Ties share the score of their lowest rank, so equal values always score alike.
+    """
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.lexsort((values, groups))
+    sorted_groups, sorted_values = groups[order], values[order]
+    sizes = np.bincount(groups)
+    group_start = np.concatenate(([0], np.cumsum(sizes)[:-1]))[sorted_groups]
+    position = np.arange(len(values))
+    run_start = np.ones(len(values), dtype=bool)
+    run_start[1:] = (sorted_groups[1:] != sorted_groups[:-1]) | (sorted_values[1:] != sorted_values[:-1])
+    first_of_run = np.maximum.accumulate(np.where(run_start, position, 0))
+    rank = first_of_run - group_start
+    scores = np.empty(len(values), dtype=np.int64)
+    scores[order] = 1 + (rank * levels) // sizes[sorted_groups]
+    return scores
+
+def segment_customers(hotel_index, recency, frequency, monetary):
+    """RFM scores and a segment name per customer"""
+    stayed = ~np.isnan(recency)
+    # Fewer days since the last stay is better, so recency is scored on its negation
+    r = quantile_scores(hotel_index, -np.nan_to_num(recency, nan=np.inf))
+    f = quantile_scores(hotel_index, frequency)
+    m = quantile_scores(hotel_index, monetary)
+    segment = np.select(
+        [
+            ~stayed,
+            (r >= 4) & (f >= 4) & (m >= 4),
+            (r >= 3) & (f >= 4),
+            r >= 4,
+            (r <= 2) & (f >= 3),
+            (r <= 2) & (f <= 2)
+        ],
+        [SEGMENT_PROSPECT, 'champions', 'loyal', 'promising', 'at_risk', 'hibernating'],
+        default='needs_attention'
+    )
+    vip = stayed & (((f >= 4) & (m == SCORE_LEVELS)) | (segment == 'champions'))
+    return r, f, m, segment, vip
+
+def run_segmentation(conn, hotel_ids, today=None):
+    """Score one batch of hotels and write back only the customers whose scores changed"""
+    today = (today or date.today()).toordinal()
+    customer_ids, hotel_index, recency, frequency, monetary, current = load_rfm(conn, hotel_ids, today)
+    r, f, m, segment, vip = segment_customers(hotel_index, recency, frequency, monetary)
+    updates = []
+    for customer_id, rfm, segment_name, is_vip, (old_rfm, old_segment, old_vip) in zip(
+        customer_ids.tolist(), (r * 100 + f * 10 + m).astype(str).tolist(), segment.tolist(), vip.tolist(), current
+    ):
+        vip_status = (VIP if is_vip else REGULAR) if old_vip in (None, VIP, REGULAR) else old_vip
+        if (rfm, segment_name, vip_status) != (old_rfm, old_segment, old_vip):
+            updates.append((rfm, segment_name, vip_status, customer_id))
+    conn.executemany('''
+        UPDATE customers SET rfm_score = ?, segment = ?, vip_status = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', updates)
+    conn.commit()
+    return len(customer_ids), len(updates)
+
+def run_nightly_segmentation(conn, today=None, batch_size=HOTEL_BATCH_SIZE):
+    """Segment the customers of every active hotel in batches to keep memory bounded"""
+    hotel_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM hotels WHERE status = 'active' ORDER BY id"
+    ).fetchall()]
+    scored = updated = 0
+    for start in range(0, len(hotel_ids), batch_size):
+        batch_scored, batch_updated = run_segmentation(conn, hotel_ids[start:start + batch_size], today)
+        scored += batch_scored
+        updated += batch_updated
+    logger.info(f"Nightly segmentation scored {scored} customers of {len(hotel_ids)} hotels, {updated} changed")
+    return scored, updated
+
+def segment_counts(conn, hotel_id):
+    """Customers per segment and VIP count for one hotel, from the segment index"""
+    counts = dict(conn.execute(
+        'SELECT segment, COUNT(*) FROM customers WHERE hotel_id = ? AND segment IS NOT NULL GROUP BY segment',
+        (hotel_id,)
+    ).fetchall())
+    vips = conn.execute(
+        'SELECT COUNT(*) FROM customers WHERE hotel_id = ? AND vip_status = ?', (hotel_id, VIP)
+    ).fetchone()[0]
+    return {'segments': {name: counts.get(name, 0) for name in SEGMENTS}, 'vip': vips}
+
+def segment_members(conn, hotel_id, segment, limit=MEMBER_PAGE_SIZE, after_id=0):
+    """One page of a segment's customers in id order (keyset pagination on the segment index)"""
+    cursor = conn.execute('''
+        SELECT id, email, first_name, last_name, country, vip_status, rfm_score,
+               total_bookings, total_spent, last_stay_date
+        FROM customers
+        WHERE hotel_id = ? AND segment = ? AND id > ?
+        ORDER BY id
+        LIMIT ?
+    ''', (hotel_id, segment, after_id, limit))
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+if __name__ == '__main__':
+    from ultra_comprehensive_system import create_app, shards
+
+    create_app()
+    shards.run_everywhere(run_nightly_segmentation)
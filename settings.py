@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Hotel Settings
+Typed system_settings per hotel, cached in-process and invalidated by a per-hotel version
+"""
+
+import json
+import time
+import logging
+import threading
+
+from caching import LRUCache
+
+logger = logging.getLogger(__name__)
+
+VERSION_CHECK_INTERVAL = 5.0
+MAX_SETTING_KEY_LENGTH = 100
+TRUE_VALUES = ('true', '1', 'yes', 'on')
+FALSE_VALUES = ('false', '0', 'no', 'off', '')
+
+def _parse_boolean(value):
+    """'true' / 'false' and their usual spellings"""
+    value = value.strip().lower()
+    if value not in TRUE_VALUES + FALSE_VALUES:
+        raise ValueError(f'not a boolean: {value}')
+    return value in TRUE_VALUES
+
+def _parse_time(value):
+    """HH:MM, kept as text"""
+    hours, minutes = value.strip().split(':')
+    if not (0 <= int(hours) < 24 and 0 <= int(minutes) < 60 and len(minutes) == 2):
+        raise ValueError(f'not a time of day: {value}')
+    return f'{int(hours):02d}:{minutes}'
+
+# setting_type -> parser of the stored text; unknown types are served as text
+SETTING_TYPES = {
+    'text': str,
+    'boolean': _parse_boolean,
+    'integer': int,
+    'number': float,
+    'json': json.loads,
+    'time': _parse_time,
+}
+
+SETTINGS_SCHEMA = [
+    # Bumped by the triggers below on every settings write; caches compare it to what they loaded
+    '''
+    CREATE TABLE IF NOT EXISTS settings_versions (
+        hotel_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 1,
+        FOREIGN KEY (hotel_id) REFERENCES hotels (id)
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_system_settings_version_insert AFTER INSERT ON system_settings
+    BEGIN
+        INSERT INTO settings_versions (hotel_id) SELECT NEW.hotel_id WHERE NEW.hotel_id IS NOT NULL
+        ON CONFLICT (hotel_id) DO UPDATE SET version = version + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_system_settings_version_update AFTER UPDATE ON system_settings
+    BEGIN
+        INSERT INTO settings_versions (hotel_id) SELECT NEW.hotel_id WHERE NEW.hotel_id IS NOT NULL
+        ON CONFLICT (hotel_id) DO UPDATE SET version = version + 1;
+        INSERT INTO settings_versions (hotel_id) SELECT OLD.hotel_id
+        WHERE OLD.hotel_id IS NOT NULL AND OLD.hotel_id IS NOT NEW.hotel_id
+        ON CONFLICT (hotel_id) DO UPDATE SET version = version + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_system_settings_version_delete AFTER DELETE ON system_settings
+    BEGIN
+        INSERT INTO settings_versions (hotel_id) SELECT OLD.hotel_id WHERE OLD.hotel_id IS NOT NULL
+        ON CONFLICT (hotel_id) DO UPDATE SET version = version + 1;
+    END
+    ''',
+]
+
+class SettingsError(Exception):
+    """Settings update that cannot be applied; carries the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def parse_setting(value, setting_type):
+    """Typed value of a stored setting; raises ValueError when the text does not fit the type"""
+    if value is None:
+        return None
+    return SETTING_TYPES.get(setting_type or 'text', str)(value)
+
+def infer_setting_type(value):
+    """setting_type for a new setting from the JSON value it is created with"""
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, int):
+        return 'integer'
+    if isinstance(value, float):
+        return 'number'
+    if isinstance(value, (dict, list)):
+        return 'json'
+    return 'text'
+
+def serialize_setting(value, setting_type):
+    """Stored text of a value, checked to parse back under its setting_type"""
+    if setting_type == 'json':
+        text = json.dumps(value, separators=(',', ':'))
+    elif isinstance(value, bool):
+        text = 'true' if value else 'false'
+    elif isinstance(value, (dict, list)):
+        raise SettingsError(f'a {setting_type} setting cannot hold a {type(value).__name__}')
+    else:
+        text = str(value)
+    try:
+        parse_setting(text, setting_type)
+    except ValueError:
+        raise SettingsError(f'{text!r} is not a valid {setting_type} value')
+    return text
+
+def settings_version(conn, hotel_id):
+    """Current settings version of a hotel (0 before its first write)"""
+    row = conn.execute('SELECT version FROM settings_versions WHERE hotel_id = ?', (hotel_id,)).fetchone()
+    return row[0] if row else 0
+
+def load_settings(conn, hotel_id):
+    """All settings of a hotel in one query, parsed by setting_type.
+
+    Returns (version, settings). A value that no longer parses under its type is served as
+    the stored text and logged, so one bad row cannot take the hotel's pages down.
+    """
+    version = settings_version(conn, hotel_id)
+    settings = {}
+    for key, value, setting_type in conn.execute(
+        'SELECT setting_key, setting_value, setting_type FROM system_settings WHERE hotel_id = ?', (hotel_id,)
+    ):
+        try:
+            settings[key] = parse_setting(value, setting_type)
+        except ValueError:
+            logger.warning(f"Setting {key} of hotel {hotel_id} is not a valid {setting_type}: {value!r}")
+            settings[key] = value
+    return version, settings
+
+def update_settings(conn, hotel_id, values):
+    """Create, change or (with None) delete several settings in one transaction.
+
+    An existing setting keeps its setting_type and the new value must fit it; a new one
+    takes its type from the value. Nothing is written if any value is rejected. Values
+    that are already stored are left alone, so they neither count nor bump the version.
+    Returns (settings written, settings deleted).
+    """
+    if not isinstance(values, dict) or not values:
+        raise SettingsError('settings must be a non-empty object')
+    for key in values:
+        if not isinstance(key, str) or not key.strip() or len(key) > MAX_SETTING_KEY_LENGTH:
+            raise SettingsError(f'invalid setting key: {key!r}')
+
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None
+    # Read the stored types under the write lock so a concurrent writer cannot change them in between
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        existing = {key: (value, setting_type) for key, value, setting_type in conn.execute(f'''
+            SELECT setting_key, setting_value, setting_type FROM system_settings
+            WHERE hotel_id = ? AND setting_key IN ({",".join("?" * len(values))})
+        ''', (hotel_id, *values))}
+
+        upserts, deletes = [], []
+        for key, value in values.items():
+            stored_value, stored_type = existing.get(key, (None, None))
+            if value is None:
+                if key in existing:
+                    deletes.append((hotel_id, key))
+                continue
+            setting_type = stored_type or infer_setting_type(value)
+            text = serialize_setting(value, setting_type)
+            if key not in existing or text != stored_value:
+                upserts.append((hotel_id, key, text, setting_type))
+        conn.executemany('''
+            INSERT INTO system_settings (hotel_id, setting_key, setting_value, setting_type) VALUES (?, ?, ?, ?)
+            ON CONFLICT (hotel_id, setting_key) DO UPDATE SET
+                setting_value = excluded.setting_value, updated_at = CURRENT_TIMESTAMP
+            WHERE setting_value IS NOT excluded.setting_value
+        ''', upserts)
+        conn.executemany('DELETE FROM system_settings WHERE hotel_id = ? AND setting_key = ?', deletes)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.isolation_level = previous_isolation
+    return len(upserts), len(deletes)
+
+class SettingsStore:
+    """Typed settings per hotel, cached in-process.
+
+    Every settings write bumps the hotel's settings_versions row through triggers, so
+    other workers notice it whoever wrote it. A cached hotel is served without a query
+    for VERSION_CHECK_INTERVAL seconds, then revalidated with one primary-key read and
+    reloaded only if its version moved. Writes made through this store apply at once.
+    """
+
+    def __init__(self, connection_factory, maxsize=4096, version_check_interval=VERSION_CHECK_INTERVAL):
+        self._connect = connection_factory
+        self.hotels = LRUCache(maxsize)
+        self._version_check_interval = version_check_interval
+        self._lock = threading.Lock()
+
+    def get_all(self, hotel_id, conn=None):
+        """Every setting of a hotel as {key: typed value}; treat the dict as read-only.
+
+        Pass the request's open tenant connection, if there is one, so a due version
+        check does not open another.
+        """
+        entry = self.hotels.get(hotel_id)
+        now = time.monotonic()
+        if entry is not None and now - entry['checked_at'] < self._version_check_interval:
+            return entry['settings']
+        own_conn = conn is None
+        if own_conn:
+            conn = self._connect(hotel_id)
+        try:
+            if entry is not None and settings_version(conn, hotel_id) == entry['version']:
+                with self._lock:
+                    entry['checked_at'] = now
+                return entry['settings']
+            version, settings = load_settings(conn, hotel_id)
+        finally:
+            if own_conn:
+                conn.close()
+        self.hotels.set(hotel_id, {'version': version, 'settings': settings, 'checked_at': now})
+        return settings
+
+    def get(self, hotel_id, key, default=None, conn=None):
+        """One typed setting of a hotel"""
+        return self.get_all(hotel_id, conn).get(key, default)
+
+    def version(self, hotel_id):
+        """Settings version the cached copy of a hotel was loaded at, or None"""
+        entry = self.hotels.get(hotel_id)
+        return entry['version'] if entry else None
+
+    def update(self, hotel_id, values):
+        """Bulk update (see update_settings) and drop this process's cached copy"""
+        conn = self._connect(hotel_id)
+        try:
+            written = update_settings(conn, hotel_id, values)
+        finally:
+            conn.close()
+        self.invalidate(hotel_id)
+        return written
+
+    def invalidate(self, hotel_id=None):
+        """Forget one hotel's cached settings, or every hotel's"""
+        if hotel_id is None:
+            self.hotels.clear()
+        else:
+            self.hotels.pop(hotel_id)
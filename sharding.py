@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Tenant Shards
+Routes each hotel to its own SQLite file; the main database stays the global catalog
+
+Usage: python sharding.py split [--hotel-id 7 ...] [--keep-source]
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+
+from caching import LRUCache
+from metrics import InstrumentedConnection
+
+logger = logging.getLogger(__name__)
+
+SHARD_DIRECTORY = os.environ.get('SHARD_DIRECTORY', 'shards')
+MAX_OPEN_SHARDS = int(os.environ.get('MAX_OPEN_SHARDS', 256))
+
+# How long a process trusts its copy of tenant_shards; the split tool waits this out
+SHARD_MAP_TTL = 2.0
+DRAIN_SECONDS = 3.0
+
+# Tenant-owned tables that move to the shard; everything else stays in the catalog.
+# Rollups come after the tables whose triggers feed them, so the copy overwrites what
+# the shard's triggers computed while the source rows were inserted.
+SHARDED_TABLES = (
+    'room_types', 'reservations', 'email_logs', 'customers', 'payments', 'analytics_data',
+    'system_settings', 'rate_recommendations', 'inventory_calendars', 'idempotency_keys',
+    'payment_ledger_daily', 'loyalty_entries', 'loyalty_snapshots', 'guests', 'guest_records',
+    'settings_versions', 'room_type_amenities'
+)
+
+# Indexes over tenant tables that are tables of their own; the shard gets their DDL and
+# the copied rows fill them through the tenant tables' triggers
+SHARD_DERIVED_TABLES = ('reservation_search',)
+
+# Secrets are left out of the shard's reference copy of its hotels row
+HOTEL_SECRET_COLUMNS = ('api_key', 'api_key_hash', 'openai_api_key', 'gmail_credentials')
+
+SHARDING_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS tenant_shards (
+        hotel_id INTEGER PRIMARY KEY,
+        shard_path TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'frozen',
+        rows_copied INTEGER DEFAULT 0,
+        migrated_at TIMESTAMP,
+        schema_version INTEGER,
+        FOREIGN KEY (hotel_id) REFERENCES hotels (id)
+    )
+    ''',
+]
+
+class ShardMigrating(Exception):
+    """Raised while a hotel's data is being moved to its shard"""
+
+    def __init__(self, hotel_id, retry_after=SHARD_MAP_TTL + DRAIN_SECONDS):
+        super().__init__(f"Hotel {hotel_id} is being migrated to its own database")
+        self.hotel_id = hotel_id
+        self.retry_after = retry_after
+
+class ShardConnection(InstrumentedConnection):
+    """SQLite connection whose close() hands it back to the router's pool"""
+
+    router = None
+    shard_path = None
+
+    def close(self):
+        if self.router is None:
+            super().close()
+        else:
+            self.router.release(self)
+
+    def discard(self):
+        """Really close the underlying file handle"""
+        super().close()
+
+def shard_file(hotel_id, shard_directory=SHARD_DIRECTORY):
+    """Path of a hotel's shard database"""
+    return os.path.join(shard_directory, f"hotel_{int(hotel_id)}.db")
+
+class ShardRouter:
+    """Maps hotel ids to shard connections.
+
+    Hotels without an active tenant_shards row are served from the catalog, so
+    splitting can happen one hotel at a time. Shard connections are opened on first
+    use and pooled; at most max_open idle handles are kept, least recently used first out.
+    """
+
+    def __init__(self, catalog_factory, shard_directory=SHARD_DIRECTORY, max_open=MAX_OPEN_SHARDS):
+        self._catalog = catalog_factory
+        self.shard_directory = shard_directory
+        self.max_open = max_open
+        self.shard_map = LRUCache(maxsize=65536, ttl=SHARD_MAP_TTL)
+        self.opened = 0
+        self.in_use = 0
+        self._idle = OrderedDict()
+        self._lock = threading.Lock()
+
+    def shard_for(self, hotel_id):
+        """(shard_path, status) for a hotel, or (None, None) when it lives in the catalog"""
+        route = self.shard_map.get(hotel_id)
+        if route is None:
+            conn = self._catalog()
+            try:
+                row = conn.execute(
+                    'SELECT shard_path, status FROM tenant_shards WHERE hotel_id = ?', (hotel_id,)
+                ).fetchone()
+            finally:
+                conn.close()
+            route = (row[0], row[1]) if row else (None, None)
+            self.shard_map.set(hotel_id, route)
+        return route
+
+    def connect(self, hotel_id):
+        """Connection holding a hotel's data (its shard or the catalog)"""
+        shard_path, status = self.shard_for(hotel_id)
+        if shard_path is None:
+            return self._catalog()
+        if status != 'active':
+            raise ShardMigrating(hotel_id)
+        return self._checkout(shard_path)
+
+    def _checkout(self, shard_path):
+        """Reuse an idle connection to the shard or open a new one"""
+        with self._lock:
+            idle = self._idle.get(shard_path)
+            conn = idle.pop() if idle else None
+            if idle is not None and not idle:
+                del self._idle[shard_path]
+            self.in_use += 1
+        if conn is None:
+            try:
+                conn = open_shard(shard_path)
+            except Exception:
+                with self._lock:
+                    self.in_use -= 1
+                raise
+            conn.router = self
+            with self._lock:
+                self.opened += 1
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the idle pool, closing the least recently used overflow"""
+        if conn.in_transaction:
+            conn.rollback()
+        conn.isolation_level = ''
+        conn.row_factory = sqlite3.Row
+        evicted = []
+        with self._lock:
+            self.in_use -= 1
+            self._idle.setdefault(conn.shard_path, []).append(conn)
+            self._idle.move_to_end(conn.shard_path)
+            while self.idle_count() > self.max_open:
+                shard_path, idle = next(iter(self._idle.items()))
+                evicted.append(idle.pop(0))
+                if not idle:
+                    del self._idle[shard_path]
+        for stale in evicted:
+            stale.discard()
+
+    def idle_count(self):
+        """Open handles currently parked in the pool"""
+        return sum(len(idle) for idle in self._idle.values())
+
+    def close_all(self):
+        """Close every idle shard handle (shutdown, or after fork in a child)"""
+        with self._lock:
+            idle, self._idle = self._idle, OrderedDict()
+        for connections in idle.values():
+            for conn in connections:
+                conn.discard()
+
+    def shard_connections(self):
+        """Yield a connection to every active shard, one at a time (nightly jobs).
+
+        Each shard's copy of its hotels row is refreshed from the catalog first, so jobs
+        see the hotel's current status and currency.
+        """
+        catalog_conn = self._catalog()
+        try:
+            hotel_ids = [row[0] for row in catalog_conn.execute(
+                "SELECT hotel_id FROM tenant_shards WHERE status = 'active' ORDER BY hotel_id"
+            )]
+            for hotel_id in hotel_ids:
+                conn = self.connect(hotel_id)
+                try:
+                    sync_shard_hotel(catalog_conn, conn, hotel_id)
+                except Exception:
+                    conn.close()
+                    raise
+                yield conn
+        finally:
+            catalog_conn.close()
+
+    def all_connections(self):
+        """The catalog followed by every active shard"""
+        yield self._catalog()
+        yield from self.shard_connections()
+
+    def run_everywhere(self, job):
+        """Run a nightly job on the catalog, then on every hotel split into its own shard"""
+        results = []
+        for conn in self.all_connections():
+            try:
+                results.append(job(conn))
+            finally:
+                conn.close()
+        return results
+
+    def stats(self):
+        """Pool counters for monitoring"""
+        with self._lock:
+            return {
+                'idle': self.idle_count(),
+                'in_use': self.in_use,
+                'opened': self.opened,
+                'max_open': self.max_open,
+                'routes_cached': len(self.shard_map)
+            }
+
+def open_shard(shard_path):
+    """Open a shard file with the same settings as the catalog connection"""
+    conn = sqlite3.connect(shard_path, factory=ShardConnection, check_same_thread=False, timeout=30)
+    conn.shard_path = shard_path
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA mmap_size = 268435456')
+    return conn
+
+def _column_names(conn, table, schema='main'):
+    """Column names of a table in declaration order"""
+    return [row[1] for row in conn.execute(f'PRAGMA {schema}.table_info({table})')]
+
+def sync_shard_hotel(catalog_conn, shard_conn, hotel_id):
+    """Refresh a shard's reference copy of its hotels row from the catalog, secrets left out"""
+    columns = [column for column in _column_names(catalog_conn, 'hotels') if column not in HOTEL_SECRET_COLUMNS]
+    row = catalog_conn.execute(f'SELECT {", ".join(columns)} FROM hotels WHERE id = ?', (hotel_id,)).fetchone()
+    if row is None:
+        return False
+    shard_conn.execute(
+        f'INSERT OR REPLACE INTO hotels ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})', tuple(row)
+    )
+    shard_conn.commit()
+    return True
+
+def _add_missing_columns(catalog_conn, shard_conn, table):
+    """Add the catalog's columns of a table that an older shard copy lacks"""
+    present = {row[1] for row in shard_conn.execute(f'PRAGMA table_info({table})')}
+    for _, column, column_type, not_null, default, _ in catalog_conn.execute(f'PRAGMA table_info({table})'):
+        if column in present:
+            continue
+        definition = f' DEFAULT {default}' if default is not None else ''
+        if not_null and default is not None:
+            definition += ' NOT NULL'
+        shard_conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}{definition}')
+
+def copy_shard_schema(catalog_conn, shard_conn):
+    """Create or upgrade the tenant tables, their indexes and triggers in a shard from the catalog's own DDL.
+
+    Missing tables are created and missing columns added; indexes and triggers whose
+    definition changed are recreated, so an older shard ends up with the catalog's schema.
+    """
+    tables = SHARDED_TABLES + SHARD_DERIVED_TABLES + ('hotels',)
+    # The hotels triggers maintain catalog-only tables, so only tenant table triggers are copied
+    rows = catalog_conn.execute(f'''
+        SELECT type, name, sql FROM sqlite_master
+        WHERE tbl_name IN ({",".join("?" * len(tables))}) AND sql IS NOT NULL
+          AND (type IN ('table', 'index') OR (type = 'trigger' AND tbl_name != 'hotels'))
+        ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END, name
+    ''', tables).fetchall()
+    shard_conn.execute('PRAGMA journal_mode=WAL')
+    for object_type, name, sql in rows:
+        existing = shard_conn.execute(
+            'SELECT sql FROM sqlite_master WHERE type = ? AND name = ?', (object_type, name)
+        ).fetchone()
+        if existing is None:
+            shard_conn.execute(sql)
+        elif object_type == 'table':
+            if not sql.startswith('CREATE VIRTUAL'):
+                _add_missing_columns(catalog_conn, shard_conn, name)
+        elif existing[0] != sql:
+            shard_conn.execute(f'DROP {object_type.upper()} {name}')
+            shard_conn.execute(sql)
+    shard_conn.commit()
+
+def migrate_shards(catalog_conn, backfills=()):
+    """Bring every active shard up to the catalog's schema version; returns the shards migrated.
+
+    Shards get their DDL when they are split, so later schema changes reach them here:
+    the shard's schema is upgraded from the catalog's, the backfills run over its rows and
+    tenant_shards records the version it is now at. Shards already current cost nothing.
+    """
+    version = catalog_conn.execute('SELECT version FROM schema_version WHERE id = 1').fetchone()[0]
+    stale = catalog_conn.execute('''
+        SELECT hotel_id, shard_path FROM tenant_shards
+        WHERE status = 'active' AND schema_version IS NOT ?
+        ORDER BY hotel_id
+    ''', (version,)).fetchall()
+    for hotel_id, shard_path in stale:
+        shard_conn = sqlite3.connect(shard_path, timeout=30)
+        try:
+            copy_shard_schema(catalog_conn, shard_conn)
+            cursor = shard_conn.cursor()
+            for backfill in backfills:
+                backfill(cursor)
+            shard_conn.commit()
+        finally:
+            shard_conn.close()
+        catalog_conn.execute('UPDATE tenant_shards SET schema_version = ? WHERE hotel_id = ?', (version, hotel_id))
+        catalog_conn.commit()
+        logger.info(f"Shard of hotel {hotel_id} migrated to schema version {version}")
+    return len(stale)
+
+def split_hotel(catalog_conn, hotel_id, shard_directory=SHARD_DIRECTORY, keep_source=False, drain_seconds=None):
+    """Move one hotel's rows from the catalog into its own shard file while the app runs.
+
+    The hotel is first marked frozen so workers answer its requests with 503 once their
+    cached routes expire; the copy then runs in one write transaction over the catalog
+    with the shard attached, and the route flips to active in that same transaction.
+    Other hotels keep reading and writing throughout.
+    """
+    os.makedirs(shard_directory, exist_ok=True)
+    shard_path = shard_file(hotel_id, shard_directory)
+    catalog_conn.execute('''
+        INSERT INTO tenant_shards (hotel_id, shard_path, status) VALUES (?, ?, 'frozen')
+        ON CONFLICT (hotel_id) DO UPDATE SET shard_path = excluded.shard_path, status = 'frozen'
+    ''', (hotel_id, shard_path))
+    catalog_conn.commit()
+    time.sleep(SHARD_MAP_TTL + DRAIN_SECONDS if drain_seconds is None else drain_seconds)
+
+    shard_conn = sqlite3.connect(shard_path)
+    try:
+        copy_shard_schema(catalog_conn, shard_conn)
+    finally:
+        shard_conn.close()
+
+    isolation_level = catalog_conn.isolation_level
+    catalog_conn.isolation_level = None
+    catalog_conn.execute('ATTACH DATABASE ? AS shard', (shard_path,))
+    try:
+        catalog_conn.execute('BEGIN IMMEDIATE')
+        copied = 0
+        # Columns by name: ADD COLUMN migrations may have left them in a different order
+        for table in SHARDED_TABLES:
+            columns = ', '.join(_column_names(catalog_conn, table))
+            catalog_conn.execute(f'DELETE FROM shard.{table}')
+            copied += catalog_conn.execute(
+                f'INSERT INTO shard.{table} ({columns}) SELECT {columns} FROM main.{table} WHERE hotel_id = ?',
+                (hotel_id,)
+            ).rowcount
+        columns = ', '.join(
+            column for column in _column_names(catalog_conn, 'hotels') if column not in HOTEL_SECRET_COLUMNS
+        )
+        catalog_conn.execute('DELETE FROM shard.hotels')
+        catalog_conn.execute(
+            f'INSERT INTO shard.hotels ({columns}) SELECT {columns} FROM main.hotels WHERE id = ?', (hotel_id,)
+        )
+        if not keep_source:
+            for table in SHARDED_TABLES:
+                catalog_conn.execute(f'DELETE FROM main.{table} WHERE hotel_id = ?', (hotel_id,))
+        catalog_conn.execute('''
+            UPDATE tenant_shards SET status = 'active', rows_copied = ?, migrated_at = CURRENT_TIMESTAMP,
+                schema_version = (SELECT version FROM main.schema_version WHERE id = 1)
+            WHERE hotel_id = ?
+        ''', (copied, hotel_id))
+        catalog_conn.execute('COMMIT')
+    except Exception:
+        if catalog_conn.in_transaction:
+            catalog_conn.execute('ROLLBACK')
+        raise
+    finally:
+        catalog_conn.execute('DETACH DATABASE shard')
+        catalog_conn.isolation_level = isolation_level
+    logger.info(f"Hotel {hotel_id} split into {shard_path} ({copied} rows)")
+    return copied
+
+def split_all(catalog_conn, hotel_ids=None, shard_directory=SHARD_DIRECTORY, keep_source=False):
+    """Split every hotel still living in the catalog (or the given ones)"""
+    if hotel_ids is None:
+        hotel_ids = [row[0] for row in catalog_conn.execute('''
+            SELECT id FROM hotels
+            WHERE id NOT IN (SELECT hotel_id FROM tenant_shards WHERE status = 'active')
+            ORDER BY id
+        ''')]
+    copied = 0
+    for hotel_id in hotel_ids:
+        copied += split_hotel(catalog_conn, hotel_id, shard_directory, keep_source)
+    return copied
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Split the monolithic database into per-hotel shards')
+    parser.add_argument('command', choices=['split'])
+    parser.add_argument('--hotel-id', type=int, action='append', dest='hotel_ids')
+    parser.add_argument('--keep-source', action='store_true', help='leave the copied rows in the catalog')
+    args = parser.parse_args()
+
+    from ultra_comprehensive_system import create_app, get_db_connection
+
+    create_app()
+    conn = get_db_connection()
+    try:
+        rows = split_all(conn, args.hotel_ids, keep_source=args.keep_source)
+        print(f"Copied {rows} rows into {SHARD_DIRECTORY}/")
+    finally:
+        conn.close()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Synthetic Data
+Deterministic multi-tenant data for every core table, written with bulk inserts
+
+Usage: python synthetic_data.py --hotels 100 --reservations 300 --emails 100
+"""
+
+import json
+import uuid
+import random
+import logging
+import argparse
+from datetime import date, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from confirmation_codes import CROCKFORD_ALPHABET, RANDOM_CHARS, day_prefix
+from tenancy import hash_api_key
+
+logger = logging.getLogger(__name__)
+
+SYNTHETIC_PASSWORD = 'synthetic-password'
+INSERT_BATCH_SIZE = 20000
+
+# (name, base price, rooms, capacity)
+ROOM_TYPES = (('Standard', 100, 20, 2), ('Deluxe', 150, 10, 2), ('Suite', 300, 4, 4))
+CURRENCIES = ('EUR', 'EUR', 'USD', 'TRY', 'GBP')
+LANGUAGES = ('en', 'en', 'tr', 'de', 'fr', 'ru')
+COUNTRIES = ('TR', 'DE', 'GB', 'US', 'FR', 'RU', 'NL', 'IT')
+FIRST_NAMES = ('Ayse', 'Mehmet', 'Anna', 'Lukas', 'Emma', 'Oliver', 'Chloe', 'Ivan', 'Elif', 'Jan')
+LAST_NAMES = ('Yilmaz', 'Kaya', 'Muller', 'Schmidt', 'Smith', 'Brown', 'Martin', 'Petrov', 'Demir', 'de Vries')
+EMAIL_TYPES = ('booking_request', 'availability_inquiry', 'modification', 'cancellation', 'general_question')
+EMAIL_SUBJECTS = {
+    'en': 'Room availability for {month}',
+    'tr': '{month} icin oda musaitligi',
+    'de': 'Zimmerverfugbarkeit fur {month}',
+    'fr': 'Disponibilite des chambres pour {month}',
+    'ru': 'Nalichie nomerov na {month}'
+}
+HOTEL_SETTINGS = (
+    ('check_in_time', '14:00', 'time'),
+    ('check_out_time', '11:00', 'time'),
+    ('auto_reply_enabled', 'true', 'boolean'),
+    ('default_language', None, 'text'),
+)
+
+def _timestamp(day, rng):
+    """A reproducible time of day on a given date"""
+    return f"{day.isoformat()} {rng.randint(7, 22):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+
+def _insert(conn, sql, rows):
+    """executemany in bounded batches; returns the row count"""
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        conn.executemany(sql, rows[start:start + INSERT_BATCH_SIZE])
+    return len(rows)
+
+def generate_hotels(conn, rng, hotels, password_hash, offset):
+    """Hotels with API keys, plans, currencies and one shared admin password.
+
+    Only the key hashes are stored; returns (id, currency, language, api_key) rows.
+    """
+    rows, api_keys = [], {}
+    for h in range(offset, offset + hotels):
+        api_key = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        api_keys[f'synthetic{h}'] = api_key
+        rows.append((
+            f'Synthetic Hotel {h}', f'hotel{h}@synthetic.test', f'synthetic{h}', f'admin{h}@synthetic.test',
+            password_hash, 'enterprise' if rng.random() < 0.2 else 'basic', hash_api_key(api_key),
+            rng.choice(CURRENCIES), rng.choice(LANGUAGES), rng.choice(COUNTRIES)
+        ))
+    _insert(conn, '''
+        INSERT INTO hotels (
+            name, email, subdomain, admin_email, admin_password, subscription_plan,
+            api_key_hash, currency, language, country
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    return [
+        (hotel_id, currency, language, api_keys[subdomain])
+        for hotel_id, currency, language, subdomain in conn.execute(f'''
+            SELECT id, currency, language, subdomain FROM hotels
+            WHERE subdomain IN ({",".join("?" * len(rows))}) ORDER BY id
+        ''', [row[2] for row in rows])
+    ]
+
+def generate_dataset(conn, hotels=100, reservations_per_hotel=300, emails_per_hotel=100,
+                     analytics_days=30, seed=42, today=None):
+    """Fill hotels, room_types, reservations, customers, payments, email_logs, analytics_data
+    and system_settings. The same seed and today always produce the same rows."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    offset = conn.execute("SELECT COUNT(*) FROM hotels WHERE subdomain LIKE 'synthetic%'").fetchone()[0]
+    password_hash = generate_password_hash(SYNTHETIC_PASSWORD)
+    counts = {}
+
+    hotel_rows = generate_hotels(conn, rng, hotels, password_hash, offset)
+    counts['hotels'] = len(hotel_rows)
+    hotel_ids = [hotel_id for hotel_id, _, _, _ in hotel_rows]
+
+    counts['room_types'] = _insert(conn, '''
+        INSERT INTO room_types (hotel_id, name, capacity, base_price, weekend_price, peak_season_price, total_rooms)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (hotel_id, name, capacity, price, round(price * 1.2, 2), round(price * 1.5, 2), rooms)
+        for hotel_id in hotel_ids for name, price, rooms, capacity in ROOM_TYPES
+    ])
+    room_types = {}
+    for room_type_id, hotel_id, base_price in conn.execute(f'''
+        SELECT id, hotel_id, base_price FROM room_types
+        WHERE hotel_id IN ({",".join("?" * len(hotel_ids))}) ORDER BY id
+    ''', hotel_ids):
+        room_types.setdefault(hotel_id, []).append((room_type_id, base_price))
+
+    reservation_rows = []
+    guests = {}
+    for hotel_id, currency, _, _ in hotel_rows:
+        # A smaller guest pool than bookings gives repeat guests for the CRM tables
+        pool = [
+            (f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', f'guest{g}.h{hotel_id}@synthetic.test',
+             rng.choice(COUNTRIES), rng.choice(LANGUAGES))
+            for g in range(max(1, int(reservations_per_hotel * 0.6)))
+        ]
+        guests[hotel_id] = pool
+        for _ in range(reservations_per_hotel):
+            room_type_id, base_price = rng.choice(room_types[hotel_id])
+            name, email, country, _ = rng.choice(pool)
+            check_in = today + timedelta(days=rng.randint(-364, 90))
+            nights = rng.randint(1, 5)
+            booked = min(today, check_in - timedelta(days=min(int(rng.expovariate(1 / 21)), 180)))
+            roll = rng.random()
+            if roll < 0.08:
+                status = 'cancelled'
+            elif check_in + timedelta(days=nights) <= today:
+                status = 'no_show' if roll < 0.1 else 'checked_out'
+            else:
+                status = 'confirmed'
+            code = day_prefix(booked) + ''.join(rng.choice(CROCKFORD_ALPHABET) for _ in range(RANDOM_CHARS))
+            reservation_rows.append((
+                hotel_id, room_type_id, code, name, email, country,
+                check_in.isoformat(), (check_in + timedelta(days=nights)).isoformat(),
+                rng.randint(1, 2), rng.choice((0, 0, 0, 1, 2)), round(base_price * nights, 2), currency,
+                'paid' if status in ('checked_out', 'confirmed') and roll < 0.75 else 'pending',
+                rng.choice(('email', 'email', 'website', 'api', 'phone')), status, _timestamp(booked, rng)
+            ))
+    counts['reservations'] = _insert(conn, '''
+        INSERT INTO reservations (
+            hotel_id, room_type_id, confirmation_code, guest_name, guest_email, guest_country,
+            check_in, check_out, adults, children, total_price, currency, payment_status,
+            booking_source, status, created_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', reservation_rows)
+    reservation_ids = dict(conn.execute(f'''
+        SELECT confirmation_code, id FROM reservations
+        WHERE +hotel_id IN ({",".join("?" * len(hotel_ids))})
+    ''', hotel_ids).fetchall())
+
+    customers = {}
+    payment_rows = []
+    for row in reservation_rows:
+        hotel_id, code, email, check_out, total, currency, payment_status = (
+            row[0], row[2], row[4], row[7], row[10], row[11], row[12]
+        )
+        customer = customers.setdefault((hotel_id, email), [0, 0.0, None])
+        if row[14] != 'cancelled':
+            customer[0] += 1
+            customer[1] += total
+            customer[2] = max(customer[2] or check_out, check_out)
+        if payment_status == 'paid':
+            fees = round(total * 0.029 + 0.3, 2)
+            payment_rows.append((
+                hotel_id, reservation_ids[code], total, currency, rng.choice(('card', 'card', 'bank_transfer')),
+                'stripe', f'SYN-{code}', code, 'completed', row[15],
+                fees, round(total - fees, 2)
+            ))
+    counts['payments'] = _insert(conn, '''
+        INSERT INTO payments (
+            hotel_id, reservation_id, amount, currency, payment_method, payment_provider,
+            transaction_id, payment_reference, status, payment_date, fees, net_amount
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', payment_rows)
+
+    customer_rows = []
+    for hotel_id, pool in guests.items():
+        for name, email, country, language in pool:
+            bookings, spent, last_stay = customers.get((hotel_id, email), (0, 0.0, None))
+            first_name, last_name = name.split(' ', 1)
+            customer_rows.append((
+                hotel_id, email, first_name, last_name, country, language, int(spent // 10),
+                'vip' if spent > 2000 else 'regular', int(rng.random() < 0.4), bookings, round(spent, 2), last_stay
+            ))
+    counts['customers'] = _insert(conn, '''
+        INSERT INTO customers (
+            hotel_id, email, first_name, last_name, country, communication_language, loyalty_points,
+            vip_status, marketing_consent, total_bookings, total_spent, last_stay_date
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', customer_rows)
+
+    email_rows = []
+    hotel_reservations = {}
+    for row in reservation_rows:
+        hotel_reservations.setdefault(row[0], []).append(row)
+    for hotel_id, _, hotel_language, _ in hotel_rows:
+        for _ in range(emails_per_hotel):
+            name, email, _, language = rng.choice(guests[hotel_id])
+            language = language if language in EMAIL_SUBJECTS else 'en'
+            reservation = None
+            if hotel_reservations.get(hotel_id) and rng.random() < 0.5:
+                reservation = rng.choice(hotel_reservations[hotel_id])
+            received = today - timedelta(days=rng.randint(0, 89))
+            month = (today + timedelta(days=rng.randint(0, 180))).strftime('%B')
+            email_rows.append((
+                hotel_id, reservation_ids[reservation[2]] if reservation else None,
+                f'thread-{rng.getrandbits(48):012x}',
+                email, f'reservations@synthetic{hotel_id}.test', EMAIL_SUBJECTS[language].format(month=month),
+                f'Hello, this is {name}. {EMAIL_SUBJECTS[language].format(month=month)}?',
+                'Thank you for your message, we will get back to you shortly.', language,
+                round(rng.uniform(-1, 1), 2), 'high' if rng.random() < 0.1 else 'normal', rng.choice(EMAIL_TYPES),
+                int(rng.lognormvariate(6.7, 0.5)), _timestamp(received, rng)
+            ))
+    counts['email_logs'] = _insert(conn, '''
+        INSERT INTO email_logs (
+            hotel_id, reservation_id, thread_id, from_email, to_email, subject, content,
+            response_generated, language_detected, sentiment_score, priority_level, email_type,
+            processing_time_ms, created_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', email_rows)
+
+    counts['analytics_data'] = _insert(conn, '''
+        INSERT INTO analytics_data (hotel_id, metric_name, metric_value, metric_type, time_period, date_recorded)
+        VALUES (?, 'occupancy_rate', ?, 'percentage', 'daily', ?)
+    ''', [
+        (hotel_id, round(rng.uniform(0.35, 0.98), 4), (today - timedelta(days=day)).isoformat())
+        for hotel_id in hotel_ids for day in range(analytics_days, 0, -1)
+    ])
+
+    counts['system_settings'] = _insert(conn, '''
+        INSERT INTO system_settings (hotel_id, setting_key, setting_value, setting_type)
+        VALUES (?, ?, ?, ?)
+    ''', [
+        (hotel_id, key, value if value is not None else language, setting_type)
+        for hotel_id, _, language, _ in hotel_rows for key, value, setting_type in HOTEL_SETTINGS
+    ])
+
+    conn.commit()
+    logger.info(f"Synthetic data: {json.dumps(counts)}")
+    return {'hotel_ids': hotel_ids, 'api_keys': {row[0]: row[3] for row in hotel_rows}, 'rows': counts}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fill the configured database with synthetic tenants')
+    parser.add_argument('--hotels', type=int, default=100)
+    parser.add_argument('--reservations', type=int, default=300, help='reservations per hotel')
+    parser.add_argument('--emails', type=int, default=100, help='emails per hotel')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from ultra_comprehensive_system import create_app, get_db_connection
+
+    create_app()
+    conn = get_db_connection()
+    try:
+        result = generate_dataset(conn, args.hotels, args.reservations, args.emails, seed=args.seed)
+        print(json.dumps(result['rows'], indent=2))
+    finally:
+        conn.close()
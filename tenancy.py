@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Tenant Resolution
+Resolves hotels from session, Host subdomain or X-API-Key through an in-process cache
+"""
+
+import time
+import hashlib
+import logging
+import threading
+
+from caching import LRUCache
+from json_columns import decode_row
+
+logger = logging.getLogger(__name__)
+
+VERSION_CHECK_INTERVAL = 5.0
+UNKNOWN_TENANT_TTL = 30
+
+# Public, non-secret hotel fields kept in the cache
+TENANT_COLUMNS = '''
+    id, name, subdomain, subscription_plan, subscription_status, subscription_expires,
+    currency, timezone, language, branding_colors, custom_logo, status
+'''
+
+TENANCY_SCHEMA = [
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_hotels_api_key_hash ON hotels (api_key_hash)',
+    '''
+    CREATE TABLE IF NOT EXISTS cache_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 1
+    )
+    ''',
+    "INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('hotels', 1)",
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_hotels_version_update AFTER UPDATE ON hotels
+    BEGIN
+        UPDATE cache_versions SET version = version + 1 WHERE name = 'hotels';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_hotels_version_insert AFTER INSERT ON hotels
+    BEGIN
+        UPDATE cache_versions SET version = version + 1 WHERE name = 'hotels';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_hotels_version_delete AFTER DELETE ON hotels
+    BEGIN
+        UPDATE cache_versions SET version = version + 1 WHERE name = 'hotels';
+    END
+    ''',
+]
+
+def hash_api_key(api_key):
+    """SHA-256 hex digest of an API key; keys are random UUIDs so no salt is needed"""
+    return hashlib.sha256(api_key.strip().encode('utf-8')).hexdigest()
+
+def backfill_api_key_hashes(cursor):
+    """Hash API keys of hotels created before api_key_hash existed, then drop every plaintext key.
+
+    Only the hash is needed to resolve a key; the legacy api_key column is left NULL.
+    """
+    rows = cursor.execute(
+        'SELECT id, api_key FROM hotels WHERE api_key IS NOT NULL AND api_key_hash IS NULL'
+    ).fetchall()
+    for hotel_id, api_key in rows:
+        cursor.execute('UPDATE hotels SET api_key_hash = ? WHERE id = ?', (hash_api_key(api_key), hotel_id))
+    cursor.execute('UPDATE hotels SET api_key = NULL WHERE api_key IS NOT NULL AND api_key_hash IS NOT NULL')
+    return len(rows)
+
+def tenant_subdomain(host, base_domain):
+    """Subdomain part of a Host header under base_domain, or None"""
+    host = (host or '').split(':')[0].lower().rstrip('.')
+    suffix = '.' + base_domain.lower()
+    if not host.endswith(suffix):
+        return None
+    subdomain = host[:-len(suffix)]
+    if not subdomain or '.' in subdomain or subdomain == 'www':
+        return None
+    return subdomain
+
+def _tenant_from_row(columns, row):
+    """Cacheable tenant dict with branding colors decoded once"""
+    return decode_row('hotels', zip(columns, row))
+
+class TenantDirectory:
+    """Hotel rows by id, subdomain and API-key hash, cached in-process.
+
+    The hotels triggers bump cache_versions on every change; each process polls that
+    one row at most every VERSION_CHECK_INTERVAL seconds and drops its cache when it moves,
+    so steady-state resolution needs no database round trip.
+    """
+
+    def __init__(self, connection_factory, maxsize=4096, version_check_interval=VERSION_CHECK_INTERVAL):
+        self._connect = connection_factory
+        self.hotels = LRUCache(maxsize)
+        self.aliases = LRUCache(maxsize * 2)
+        self.unknown = LRUCache(1024, ttl=UNKNOWN_TENANT_TTL)
+        self.version = None
+        self._version_check_interval = version_check_interval
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _check_version(self):
+        """Drop cached tenants if any hotels row changed since they were loaded"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self._version_check_interval:
+                return
+            self._checked_at = now
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT version FROM cache_versions WHERE name = 'hotels'").fetchone()
+        finally:
+            conn.close()
+        version = row[0] if row else None
+        if version != self.version:
+            self.invalidate()
+            self.version = version
+
+    def _load(self, where, value):
+        """Load one active hotel by a unique column and cache it under its id"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                f"SELECT {TENANT_COLUMNS} FROM hotels WHERE {where} = ? AND status = 'active'", (value,)
+            )
+            row = cursor.fetchone()
+            columns = [column[0] for column in cursor.description]
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        tenant = _tenant_from_row(columns, row)
+        self.hotels.set(tenant['id'], tenant)
+        return tenant
+
+    def _resolve(self, alias, where, value):
+        """Resolve an alias (subdomain / API-key hash) to a tenant via the alias cache"""
+        self._check_version()
+        hotel_id = self.aliases.get(alias)
+        if hotel_id is not None:
+            tenant = self.hotels.get(hotel_id)
+            if tenant is not None:
+                return tenant
+        if self.unknown.get(alias):
+            return None
+        tenant = self._load(where, value)
+        if tenant is None:
+            self.unknown.set(alias, True)
+            return None
+        self.aliases.set(alias, tenant['id'])
+        return tenant
+
+    def get_hotel(self, hotel_id):
+        """Tenant by hotel id"""
+        self._check_version()
+        tenant = self.hotels.get(hotel_id)
+        if tenant is None:
+            tenant = self._load('id', hotel_id)
+        return tenant
+
+    def by_subdomain(self, subdomain):
+        """Tenant by hotels.subdomain"""
+        subdomain = subdomain.lower()
+        return self._resolve(('subdomain', subdomain), 'subdomain', subdomain)
+
+    def by_api_key(self, api_key):
+        """Tenant by API key, looked up through the api_key_hash index"""
+        key_hash = hash_api_key(api_key)
+        return self._resolve(('api_key', key_hash), 'api_key_hash', key_hash)
+
+    def preload(self):
+        """Cache every active hotel up front (pre-fork warm-up); returns how many were loaded"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT version FROM cache_versions WHERE name = 'hotels'").fetchone()
+            cursor = conn.execute(f"SELECT {TENANT_COLUMNS}, api_key_hash FROM hotels WHERE status = 'active'")
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        self.invalidate()
+        with self._lock:
+            self.version = row[0] if row else None
+            self._checked_at = time.monotonic()
+        for row in rows[:self.hotels.maxsize]:
+            key_hash = row[-1]
+            tenant = _tenant_from_row(columns[:-1], row[:-1])
+            self.hotels.set(tenant['id'], tenant)
+            if tenant.get('subdomain'):
+                self.aliases.set(('subdomain', tenant['subdomain'].lower()), tenant['id'])
+            if key_hash:
+                self.aliases.set(('api_key', key_hash), tenant['id'])
+        return min(len(rows), self.hotels.maxsize)
+
+    def invalidate(self):
+        """Forget every cached tenant (called on version change or local hotel writes)"""
+        self.hotels.clear()
+        self.aliases.clear()
+        self.unknown.clear()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Test Fixtures
+One temporary catalog (and shard directory) per test session
+"""
+
+import os
+import sys
+import uuid
+import tempfile
+
+import pytest
+from flask.testing import FlaskClient
+
+TEST_DIRECTORY = tempfile.mkdtemp(prefix='ybh_tests_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TEST_DIRECTORY, 'test.db')}"
+os.environ['SHARD_DIRECTORY'] = os.path.join(TEST_DIRECTORY, 'shards')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class ClosingClient(FlaskClient):
+    """Test client that closes every response, as a WSGI server does"""
+
+    def open(self, *args, buffered=True, **kwargs):
+        return super().open(*args, buffered=buffered, **kwargs)
+
+@pytest.fixture(scope='session')
+def app():
+    """The application with its schema bootstrapped"""
+    from ultra_comprehensive_system import create_app
+
+    application = create_app()
+    application.test_client_class = ClosingClient
+    return application
+
+@pytest.fixture
+def db(app):
+    """A catalog connection, closed after the test"""
+    from ultra_comprehensive_system import get_db_connection
+
+    conn = get_db_connection()
+    yield conn
+    conn.close()
+
+@pytest.fixture
+def make_hotel(db):
+    """Factory creating a hotel (and one room type) with a unique subdomain; returns its id"""
+    def make_hotel(currency='EUR', plan='basic'):
+        subdomain = f'test{uuid.uuid4().hex[:12]}'
+        hotel_id = db.execute('''
+            INSERT INTO hotels (name, email, subdomain, admin_email, admin_password, subscription_plan, currency)
+            VALUES (?, ?, ?, ?, 'x', ?, ?)
+        ''', (subdomain, f'{subdomain}@test.example', subdomain, f'{subdomain}@test.example', plan, currency)).lastrowid
+        db.execute('''
+            INSERT INTO room_types (hotel_id, name, capacity, base_price, total_rooms) VALUES (?, 'Standard', 2, 100, 10)
+        ''', (hotel_id,))
+        db.commit()
+        return hotel_id
+    return make_hotel
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Admission Control Tests
+"""
+
+import pytest
+
+from admission import AdmissionMiddleware, default_max_in_flight
+from metrics import MetricsRegistry
+
+@pytest.mark.parametrize('env, expected', [
+    ({'GUNICORN_WORKER_CLASS': 'sync', 'GUNICORN_THREADS': '8'}, 1),
+    ({'GUNICORN_WORKER_CLASS': 'gthread', 'GUNICORN_THREADS': '6'}, 6),
+    ({'GUNICORN_WORKER_CLASS': 'gevent', 'GUNICORN_WORKER_CONNECTIONS': '50'}, 50),
+    ({'GUNICORN_WORKER_CLASS': 'sync', 'ADMISSION_MAX_IN_FLIGHT': '3'}, 3),
+])
+def test_in_flight_limit_follows_worker_class(monkeypatch, env, expected):
+    for name in ('GUNICORN_WORKER_CLASS', 'GUNICORN_THREADS', 'GUNICORN_WORKER_CONNECTIONS', 'ADMISSION_MAX_IN_FLIGHT'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    assert default_max_in_flight() == expected
+
+def _streaming_app(chunks):
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return iter(chunks)
+    return app
+
+def test_request_stays_in_flight_until_the_response_is_closed():
+    middleware = AdmissionMiddleware(_streaming_app([b'a', b'b']), max_in_flight=2, metrics=MetricsRegistry())
+    environ = {'PATH_INFO': '/api/rooms', 'REQUEST_METHOD': 'GET'}
+
+    response = middleware(environ, lambda status, headers, exc_info=None: None)
+    assert middleware.in_flight == 1
+    assert list(response) == [b'a', b'b']
+    assert middleware.in_flight == 1
+
+    response.close()
+    assert middleware.in_flight == 0
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Booking Tests
+"""
+
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+from bookings import BookingError, create_reservation
+
+def _payload(room_type_id, guest_name='Test Guest', days_ahead=40):
+    check_in = date.today() + timedelta(days=days_ahead)
+    return {
+        'room_type_id': room_type_id, 'guest_name': guest_name, 'guest_email': 'guest@test.example',
+        'check_in': check_in.isoformat(), 'check_out': (check_in + timedelta(days=2)).isoformat()
+    }
+
+def _room_type(db, hotel_id, total_rooms):
+    db.execute('UPDATE room_types SET total_rooms = ? WHERE hotel_id = ?', (total_rooms, hotel_id))
+    db.commit()
+    return db.execute('SELECT id FROM room_types WHERE hotel_id = ?', (hotel_id,)).fetchone()[0]
+
+def test_concurrent_requests_cannot_both_book_the_last_room(app, db, make_hotel):
+    from ultra_comprehensive_system import get_db_connection
+
+    hotel_id = make_hotel()
+    room_type_id = _room_type(db, hotel_id, 1)
+    start = threading.Barrier(4)
+    outcomes = []
+
+    def book(n):
+        conn = get_db_connection()
+        try:
+            start.wait()
+            create_reservation(conn, hotel_id, _payload(room_type_id, f'Guest {n}'))
+            outcomes.append(201)
+        except BookingError as e:
+            outcomes.append(e.status_code)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=book, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == [201, 409, 409, 409]
+    assert db.execute('SELECT COUNT(*) FROM reservations WHERE room_type_id = ?', (room_type_id,)).fetchone()[0] == 1
+
+def test_retried_request_replays_the_first_reservation(db, make_hotel):
+    hotel_id = make_hotel()
+    room_type_id = _room_type(db, hotel_id, 5)
+    payload = _payload(room_type_id)
+
+    first, replayed_first = create_reservation(db, hotel_id, payload, 'retry-key')
+    second, replayed_second = create_reservation(db, hotel_id, payload, 'retry-key')
+
+    assert (replayed_first, replayed_second) == (False, True)
+    assert second['id'] == first['id'] and second['confirmation_code'] == first['confirmation_code']
+    assert db.execute('SELECT COUNT(*) FROM reservations WHERE room_type_id = ?', (room_type_id,)).fetchone()[0] == 1
+
+def test_reused_key_with_another_request_is_rejected(db, make_hotel):
+    hotel_id = make_hotel()
+    room_type_id = _room_type(db, hotel_id, 5)
+    create_reservation(db, hotel_id, _payload(room_type_id), 'reused-key')
+
+    with pytest.raises(BookingError) as error:
+        create_reservation(db, hotel_id, _payload(room_type_id, 'Someone Else'), 'reused-key')
+
+    assert error.value.status_code == 409
+    assert db.execute('SELECT COUNT(*) FROM reservations WHERE room_type_id = ?', (room_type_id,)).fetchone()[0] == 1
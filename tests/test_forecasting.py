@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Forecasting Tests
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+
+from forecasting import fit_demand_model, forecast_demand, get_stored_forecast, load_stay_nights, run_forecast
+
+TODAY = date(2024, 6, 3).toordinal()  # a Monday
+
+def _reserve(db, hotel_id, room_type_id, check_in, nights, created_at, status='confirmed'):
+    db.execute('''
+        INSERT INTO reservations (hotel_id, room_type_id, confirmation_code, guest_name, guest_email,
+                                  check_in, check_out, status, created_at)
+        VALUES (?, ?, hex(randomblob(6)), 'Test Guest', 'guest@test.example', ?, ?, ?, ?)
+    ''', (hotel_id, room_type_id, check_in.isoformat(), (check_in + timedelta(days=nights)).isoformat(),
+          status, created_at.isoformat()))
+
+def test_reservations_expand_to_nights_with_their_booking_lead(db, make_hotel):
+    hotel_id = make_hotel()
+    room_type_id = db.execute('SELECT id FROM room_types WHERE hotel_id = ?', (hotel_id,)).fetchone()[0]
+    _reserve(db, hotel_id, room_type_id, date(2024, 5, 10), 3, date(2024, 5, 1))
+    _reserve(db, hotel_id, room_type_id, date(2024, 5, 10), 2, date(2024, 5, 1), status='cancelled')
+    db.commit()
+
+    series_index, stay_day, lead = load_stay_nights(
+        db, np.array([room_type_id]), TODAY - 60, TODAY
+    )
+
+    assert series_index.tolist() == [0, 0, 0]
+    assert [date.fromordinal(day) for day in stay_day.tolist()] == [date(2024, 5, 10), date(2024, 5, 11), date(2024, 5, 12)]
+    assert lead.tolist() == [9, 10, 11]
+
+def test_forecast_is_bounded_by_rooms_on_the_books_and_capacity():
+    # Every Monday of the last eight weeks sold 4 rooms, each booked a week ahead
+    mondays = np.array([TODAY - 7 * week for week in range(1, 9)] * 4)
+    series_index = np.zeros(len(mondays), dtype=np.int64)
+    lead = np.full(len(mondays), 7)
+    # Next Monday already has 6 rooms sold
+    stay_day = np.concatenate([mondays, np.full(6, TODAY + 7)])
+    series_index = np.concatenate([series_index, np.zeros(6, dtype=np.int64)])
+    lead = np.concatenate([lead, np.full(6, 14)])
+
+    baseline, pickup = fit_demand_model(series_index, stay_day, lead, 1, TODAY, history_days=56)
+    result = forecast_demand(series_index, stay_day, baseline, pickup, np.array([5]), TODAY, horizon=21)
+
+    assert baseline[0, 0] == 4 and baseline[0, 1:].sum() == 0
+    # Oversold night: capped at capacity. A Monday two weeks out: the usual 4 rooms.
+    assert result['on_books'][0, 7] == 6 and result['forecast'][0, 7] == 5
+    assert result['forecast'][0, 14] == 4
+    # Today nothing more gets booked, and other weekdays never sell
+    assert result['forecast'][0, 0] == 0 and result['forecast'][0, 15:].sum() == 0
+
+def test_stored_forecast_reports_rooms_on_the_books(db, make_hotel):
+    hotel_id = make_hotel()
+    room_type_id = db.execute('SELECT id FROM room_types WHERE hotel_id = ?', (hotel_id,)).fetchone()[0]
+    today = date.today()
+    _reserve(db, hotel_id, room_type_id, today + timedelta(days=3), 2, today)
+    db.commit()
+
+    assert run_forecast(db, [hotel_id], horizon=10) == 10
+    forecast = get_stored_forecast(db, hotel_id, days=10)[room_type_id]
+
+    assert [night['on_books'] for night in forecast] == [0, 0, 0, 1, 1, 0, 0, 0, 0, 0]
+    assert all(night['forecast'] >= night['on_books'] for night in forecast)
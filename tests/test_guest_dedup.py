@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Guest Deduplication Tests
+"""
+
+import sqlite3
+import threading
+
+from guest_dedup import get_guest, make_record, run_dedup, soundex
+
+def _customer(db, hotel_id, name, email, phone=None):
+    first_name, last_name = name.split()
+    customer_id = db.execute('''
+        INSERT INTO customers (hotel_id, email, first_name, last_name, phone) VALUES (?, ?, ?, ?, ?)
+    ''', (hotel_id, email, first_name, last_name, phone)).lastrowid
+    db.commit()
+    return customer_id
+
+def _guest_id(db, customer_id):
+    return db.execute(
+        "SELECT guest_id FROM guest_records WHERE source = 'customer' AND source_id = ?", (customer_id,)
+    ).fetchone()[0]
+
+def test_soundex_collisions_share_a_name_key():
+    assert soundex('robert') == soundex('rupert') == 'R163'
+    assert soundex('ashcraft') == 'A261'
+    assert make_record('customer', 1, 1, 'a@x.example', None, 'Jonathan Smith')[6] == \
+        make_record('customer', 2, 1, 'b@x.example', None, 'Jane Schmidt')[6]
+
+def test_name_key_collision_needs_a_similar_name_and_phone(db, make_hotel):
+    hotel_id = make_hotel()
+    smith = _customer(db, hotel_id, 'Jonathan Smith', 'jsmith@mail.example', '+90 532 111 2233')
+    smyth = _customer(db, hotel_id, 'Jonathan Smyth', 'jonathan@mail.example', '0532 111 2233')
+    schmidt = _customer(db, hotel_id, 'Jane Schmidt', 'jane@mail.example', '0532 999 8877')
+
+    run_dedup(db)
+
+    assert _guest_id(db, smith) == _guest_id(db, smyth)
+    assert _guest_id(db, schmidt) != _guest_id(db, smith)
+
+def test_a_bridging_record_merges_two_guests(db, make_hotel):
+    hotel_id = make_hotel()
+    by_email = _customer(db, hotel_id, 'Ayşe Yılmaz', 'ayse@mail.example')
+    by_phone = _customer(db, hotel_id, 'Ayse Yilmaz', 'ayse.y@other.example', '0532 444 5566')
+    run_dedup(db)
+    first, second = _guest_id(db, by_email), _guest_id(db, by_phone)
+    assert first != second
+
+    # A later booking carries both the address and the phone
+    db.execute('''
+        INSERT INTO reservations (hotel_id, confirmation_code, guest_name, guest_email, guest_phone, check_in, check_out)
+        VALUES (?, ?, 'AYSE YILMAZ', 'Ayse@Mail.example', '+90 532 444 5566', '2024-07-01', '2024-07-02')
+    ''', (hotel_id, f'DEDUP{hotel_id}'))
+    db.commit()
+    totals = run_dedup(db)
+
+    assert totals['merged'] >= 1
+    survivor = get_guest(db, hotel_id, max(first, second))
+    assert survivor['id'] == min(first, second)
+    assert {(record['source'], record['source_id']) for record in survivor['linked_records']} >= {
+        ('customer', by_email), ('customer', by_phone)
+    }
+
+def test_run_waits_for_the_write_lock_before_assigning_guest_ids(app, db, make_hotel):
+    from ultra_comprehensive_system import get_db_connection
+
+    hotel_id = make_hotel()
+    run_dedup(db)
+    _customer(db, hotel_id, 'Zeynep Kaya', 'zeynep@mail.example')
+    holder = get_db_connection()
+    holder.execute('BEGIN IMMEDIATE')
+    # A guest written by another connection while dedup is waiting for the lock
+    holder.execute("INSERT INTO guests (hotel_id, email) VALUES (?, 'other@mail.example')", (hotel_id,))
+    other_guest = holder.execute('SELECT MAX(id) FROM guests').fetchone()[0]
+
+    errors = []
+    thread = threading.Thread(target=_run, args=(get_db_connection, errors))
+    thread.start()
+    thread.join(0.3)
+    holder.commit()
+    holder.close()
+    thread.join()
+
+    assert errors == []
+    assert db.execute("SELECT email FROM guests WHERE id = ?", (other_guest,)).fetchone()[0] == 'other@mail.example'
+    assert db.execute("SELECT COUNT(*) FROM guests WHERE email = 'zeynep@mail.example'").fetchone()[0] == 1
+
+def _run(connect, errors):
+    conn = connect()
+    try:
+        run_dedup(conn)
+    except sqlite3.Error as e:
+        errors.append(e)
+    finally:
+        conn.close()
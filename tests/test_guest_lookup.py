@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Guest Lookup Tests
+"""
+
+import uuid
+
+import sharding
+from guest_lookup import find_by_confirmation_code
+
+def _reservation(db, hotel_id, email='guest@test.example'):
+    code = f'G{uuid.uuid4().hex[:11].upper()}'
+    db.execute('''
+        INSERT INTO reservations (hotel_id, confirmation_code, guest_name, guest_email, check_in, check_out)
+        VALUES (?, ?, 'Test Guest', ?, '2024-06-01', '2024-06-03')
+    ''', (hotel_id, code, email))
+    db.commit()
+    return code
+
+def _subdomain(db, hotel_id):
+    return db.execute('SELECT subdomain FROM hotels WHERE id = ?', (hotel_id,)).fetchone()[0]
+
+def _lookup(app, **params):
+    return app.test_client().get('/api/guest/reservation', query_string=params)
+
+def test_cached_reservation_is_not_served_to_another_hotel(app, db, make_hotel):
+    own_hotel, other_hotel = make_hotel(), make_hotel()
+    code = _reservation(db, own_hotel)
+    assert find_by_confirmation_code(db, code)['hotel_id'] == own_hotel
+
+    response = _lookup(app, code=code, email='guest@test.example', hotel=_subdomain(db, other_hotel))
+
+    assert response.status_code == 404
+
+def test_sharded_hotel_guests_can_look_up_from_the_main_domain(app, db, make_hotel):
+    hotel_id = make_hotel()
+    code = _reservation(db, hotel_id)
+    sharding.split_hotel(db, hotel_id, drain_seconds=0)
+
+    response = _lookup(app, code=code, email='GUEST@test.example', hotel=_subdomain(db, hotel_id))
+
+    assert response.status_code == 200
+    assert response.get_json()['reservation']['confirmation_code'] == code
+
+def test_lookup_without_a_hotel_is_rejected(app, db, make_hotel):
+    code = _reservation(db, make_hotel())
+
+    assert _lookup(app, code=code, email='guest@test.example').status_code == 400
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Inventory Calendar Tests
+"""
+
+from datetime import date, timedelta
+
+from bookings import create_reservation, update_reservation
+from inventory import CALENDAR_DAYS, get_calendar, get_stay_availability, rebuild_inventory
+
+def _book(db, hotel_id, room_type_id, check_in, nights):
+    reservation, _ = create_reservation(db, hotel_id, {
+        'room_type_id': room_type_id, 'guest_name': 'Test Guest', 'guest_email': 'guest@test.example',
+        'check_in': check_in.isoformat(), 'check_out': (check_in + timedelta(days=nights)).isoformat()
+    })
+    return reservation
+
+def _hotel(db, make_hotel):
+    hotel_id = make_hotel()
+    db.execute('UPDATE room_types SET total_rooms = 3, base_price = 80 WHERE hotel_id = ?', (hotel_id,))
+    db.commit()
+    room_type_id = db.execute('SELECT id FROM room_types WHERE hotel_id = ?', (hotel_id,)).fetchone()[0]
+    assert rebuild_inventory(db, [hotel_id]) == 1
+    return hotel_id, room_type_id
+
+def test_bookings_and_cancellations_update_the_calendar_in_place(db, make_hotel):
+    hotel_id, room_type_id = _hotel(db, make_hotel)
+    check_in = date.today() + timedelta(days=10)
+    first = _book(db, hotel_id, room_type_id, check_in, 3)
+    _book(db, hotel_id, room_type_id, check_in + timedelta(days=1), 1)
+
+    calendar = get_calendar(db, hotel_id, check_in, days=4)[room_type_id]
+    assert calendar['sold'] == [1, 2, 1, 0]
+    assert calendar['available'] == [2, 1, 2, 3]
+
+    update_reservation(db, hotel_id, first['confirmation_code'], {'status': 'cancelled'})
+    assert get_calendar(db, hotel_id, check_in, days=4)[room_type_id]['sold'] == [0, 1, 0, 0]
+
+    # The nightly rebuild from the reservation rows agrees with the incremental updates
+    rebuild_inventory(db, [hotel_id])
+    assert get_calendar(db, hotel_id, check_in, days=4)[room_type_id]['sold'] == [0, 1, 0, 0]
+
+def test_stay_availability_is_read_from_the_stored_window(db, make_hotel):
+    hotel_id, room_type_id = _hotel(db, make_hotel)
+    check_in = date.today() + timedelta(days=5)
+    _book(db, hotel_id, room_type_id, check_in, 2)
+
+    stay = get_stay_availability(db, hotel_id, check_in, check_in + timedelta(days=2))[room_type_id]
+    assert stay['available'] == 2
+    assert stay['total_price'] == sum(stay['nightly_rates']) and len(stay['nightly_rates']) == 2
+
+    beyond = date.today() + timedelta(days=CALENDAR_DAYS)
+    assert get_stay_availability(db, hotel_id, beyond, beyond + timedelta(days=1)) == {}
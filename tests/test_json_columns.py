@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - JSON Column Tests
+"""
+
+import json
+
+from json_columns import EMAIL_CLASSIFICATION_SQL, decode_json, emails_by_classification, room_types_with_amenity
+
+def test_malformed_or_misshapen_values_read_as_empty():
+    assert decode_json('room_types', 'amenities', '["WiFi", "Balcony"]') == ['WiFi', 'Balcony']
+    assert decode_json('room_types', 'amenities', '["WiFi"') == []
+    assert decode_json('room_types', 'amenities', '{"wifi": true}') == []
+    assert decode_json('hotels', 'branding_colors', None) == {}
+
+def test_amenity_filter_follows_room_type_updates(db, make_hotel):
+    hotel_id = make_hotel()
+    suite_id = db.execute('''
+        INSERT INTO room_types (hotel_id, name, base_price, amenities) VALUES (?, 'Suite', 250, ?)
+    ''', (hotel_id, json.dumps([' Sea View ', 'WiFi', 'wifi']))).lastrowid
+    db.commit()
+
+    assert [room['id'] for room in room_types_with_amenity(db, hotel_id, 'SEA VIEW')] == [suite_id]
+    assert room_types_with_amenity(db, hotel_id, 'wifi')[0]['amenities'] == [' Sea View ', 'WiFi', 'wifi']
+
+    db.execute("UPDATE room_types SET amenities = '[\"WiFi\"]' WHERE id = ?", (suite_id,))
+    db.commit()
+
+    assert room_types_with_amenity(db, hotel_id, 'sea view') == []
+    assert len(room_types_with_amenity(db, hotel_id)) == 2
+
+def test_emails_by_classification_pages_through_the_index(db, make_hotel):
+    hotel_id = make_hotel()
+    for n, analysis in enumerate(['{"classification": "booking"}', 'not json', '{"classification": "booking"}',
+                                  '{"classification": "complaint"}']):
+        db.execute('''
+            INSERT INTO email_logs (hotel_id, from_email, to_email, subject, ai_analysis) VALUES (?, ?, 'hotel@test.example', ?, ?)
+        ''', (hotel_id, f'guest{n}@test.example', f'Email {n}', analysis))
+    db.commit()
+
+    first_page = emails_by_classification(db, hotel_id, 'booking', limit=1)
+    second_page = emails_by_classification(db, hotel_id, 'booking', limit=1, before_id=first_page[0]['id'])
+
+    assert [email['subject'] for email in first_page + second_page] == ['Email 2', 'Email 0']
+    assert first_page[0]['ai_analysis'] == {'classification': 'booking'}
+    plan = ' '.join(row[3] for row in db.execute(f'''
+        EXPLAIN QUERY PLAN SELECT id FROM email_logs WHERE hotel_id = ? AND {EMAIL_CLASSIFICATION_SQL} = ?
+    ''', (hotel_id, 'booking')))
+    assert 'idx_email_logs_classification' in plan
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Loyalty Ledger Tests
+"""
+
+import pytest
+
+from loyalty import LoyaltyError, compact_loyalty, earn_for_stay, get_balance, get_loyalty, record_entry
+
+def _customer(db, hotel_id, email='member@test.example'):
+    customer_id = db.execute('INSERT INTO customers (hotel_id, email) VALUES (?, ?)', (hotel_id, email)).lastrowid
+    db.commit()
+    return customer_id
+
+def test_burn_cannot_overdraw_the_balance(db, make_hotel):
+    hotel_id = make_hotel()
+    customer_id = _customer(db, hotel_id)
+    assert record_entry(db, hotel_id, customer_id, 100, 'earn') == 100
+    assert record_entry(db, hotel_id, customer_id, 60, 'burn') == 40
+
+    with pytest.raises(LoyaltyError) as error:
+        record_entry(db, hotel_id, customer_id, 50, 'burn')
+
+    assert error.value.status_code == 409
+    assert get_balance(db, customer_id) == 40
+    with pytest.raises(LoyaltyError):
+        record_entry(db, make_hotel(), customer_id, 10, 'earn')
+
+def test_compaction_keeps_balances_and_later_entries_add_on(db, make_hotel):
+    hotel_id = make_hotel()
+    customers = [_customer(db, hotel_id, f'member{n}@test.example') for n in range(3)]
+    for n, customer_id in enumerate(customers):
+        for _ in range(n + 2):
+            record_entry(db, hotel_id, customer_id, 10, 'earn')
+        record_entry(db, hotel_id, customer_id, 5, 'burn')
+    balances = [get_balance(db, customer_id) for customer_id in customers]
+
+    assert compact_loyalty(db, batch_size=4) >= len(customers)
+    assert [get_balance(db, customer_id) for customer_id in customers] == balances == [15, 25, 35]
+    assert compact_loyalty(db) == 0
+
+    record_entry(db, hotel_id, customers[0], 7, 'adjust')
+    loyalty = get_loyalty(db, hotel_id, customers[0])
+    assert loyalty['balance'] == 22
+    assert (loyalty['snapshot']['earned'], loyalty['snapshot']['burned']) == (20, 5)
+    assert db.execute('SELECT loyalty_points FROM customers WHERE id = ?', (customers[0],)).fetchone()[0] == 15
+
+def test_a_stay_earns_once(db, make_hotel):
+    hotel_id = make_hotel()
+    customer_id = _customer(db, hotel_id, 'stayer@test.example')
+    reservation_id = db.execute('''
+        INSERT INTO reservations (hotel_id, confirmation_code, guest_name, guest_email, check_in, check_out, total_price)
+        VALUES (?, ?, 'Stayer', 'Stayer@Test.example', '2024-03-01', '2024-03-04', 455)
+    ''', (hotel_id, f'STAY{hotel_id}')).lastrowid
+    cursor = db.execute('SELECT * FROM reservations WHERE id = ?', (reservation_id,))
+    reservation = dict(zip([column[0] for column in cursor.description], cursor.fetchone()))
+
+    assert earn_for_stay(db, reservation) == 1
+    assert earn_for_stay(db, reservation) == 0
+    db.commit()
+    assert get_balance(db, customer_id) == 45
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Metrics Tests
+"""
+
+import time
+
+from metrics import MetricsMiddleware, MetricsRegistry
+
+def _streaming_app(chunks):
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return chunks
+    return app
+
+def test_streamed_body_is_part_of_the_request_latency():
+    metrics = MetricsRegistry()
+
+    def slow_chunks():
+        yield b'first'
+        time.sleep(0.05)
+        yield b'second'
+
+    middleware = MetricsMiddleware(_streaming_app(slow_chunks()), metrics)
+    response = middleware({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/'}, lambda status, headers, exc_info=None: None)
+    b''.join(response)
+    response.close()
+
+    count, seconds = metrics.requests.totals()
+    assert count == 1 and seconds >= 0.05
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Platform Overview Tests
+"""
+
+import time
+import threading
+
+import platform_overview
+from currency import revenue_report
+from platform_overview import collect_overview, get_platform_overview
+
+def test_overview_revenue_matches_the_hotel_report(app, db, make_hotel):
+    from ultra_comprehensive_system import exchange_rates
+
+    hotel_id = make_hotel()
+    db.executemany('''
+        INSERT INTO payments (hotel_id, amount, currency, status, refund_amount, payment_date, refund_date)
+        VALUES (?, ?, 'EUR', ?, ?, '2024-04-01', '2024-04-02')
+    ''', [(hotel_id, 100.0, 'completed', None), (hotel_id, 80.0, 'partially_refunded', 30.0),
+          (hotel_id, 40.0, 'refunded', 40.0), (hotel_id, 60.0, 'pending', None)])
+    db.commit()
+
+    row = next(row for row in collect_overview(db) if row['hotel_id'] == hotel_id)
+
+    assert row['revenue'] == {'EUR': 150.0}
+    assert revenue_report(db, exchange_rates, hotel_id, 'EUR')['total'] == 150.0
+
+class _Connection:
+    def close(self):
+        pass
+
+def test_concurrent_misses_compute_the_overview_once(monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def slow_collect(conn):
+        calls.append(1)
+        release.wait(5)
+        return [{'hotel_id': 1}]
+
+    platform_overview.overview_cache.clear()
+    monkeypatch.setattr(platform_overview, 'collect_overview', slow_collect)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_platform_overview(_Connection))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    platform_overview.overview_cache.clear()
+
+    assert len(calls) == 1
+    assert results == [[{'hotel_id': 1}]] * 4
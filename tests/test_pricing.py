@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Pricing Tests
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+
+from bookings import create_reservation
+from pricing import (
+    MAX_MULTIPLIER, MIN_MULTIPLIER, base_rate_matrix, get_recommended_rates, recommend_prices, reprice_hotels
+)
+
+def test_rate_card_prefers_peak_season_over_weekend_over_base():
+    room_types = {'base': np.array([100.0]), 'weekend': np.array([120.0]), 'peak': np.array([150.0])}
+
+    # Thursday 30 May to Sunday 2 June 2024
+    rates = base_rate_matrix(room_types, date(2024, 5, 30).toordinal(), 4)
+
+    assert rates.tolist() == [[100.0, 120.0, 150.0, 150.0]]
+
+def test_multiplier_follows_occupancy_and_stays_in_bounds():
+    base = np.full(4, 100.0)
+    on_books = np.array([0.0, 5.0, 10.0, 0.0])
+    expected = np.array([0.0, 5.0, 0.0, 50.0])
+    lead = np.array([30, 30, 30, 1])
+
+    price, occupancy = recommend_prices(base, on_books, expected, 10, lead)
+
+    assert occupancy.tolist() == [0.0, 0.5, 1.0, 0.0]
+    assert price[0] < price[1] < price[2]
+    # Empty, far behind pace and a day out: the floor
+    assert price[3] == 100 * MIN_MULTIPLIER
+    assert price.max() <= 100 * MAX_MULTIPLIER
+
+def test_booking_reprices_its_nights(db, make_hotel):
+    hotel_id = make_hotel()
+    db.execute('UPDATE room_types SET total_rooms = 2 WHERE hotel_id = ?', (hotel_id,))
+    room_type_id = db.execute('SELECT id FROM room_types WHERE hotel_id = ?', (hotel_id,)).fetchone()[0]
+    db.commit()
+    assert reprice_hotels(db, [hotel_id], horizon=60) == 60
+    check_in = date.today() + timedelta(days=20)
+    before = get_recommended_rates(db, hotel_id, room_type_id, check_in, days=3)[room_type_id]
+
+    create_reservation(db, hotel_id, {
+        'room_type_id': room_type_id, 'guest_name': 'Test Guest', 'guest_email': 'guest@test.example',
+        'check_in': check_in.isoformat(), 'check_out': (check_in + timedelta(days=2)).isoformat()
+    })
+    after = get_recommended_rates(db, hotel_id, room_type_id, check_in, days=3)[room_type_id]
+
+    assert [night['occupancy'] for night in after] == [0.5, 0.5, 0.0]
+    assert after[0]['recommended_price'] > before[0]['recommended_price']
+    assert after[2]['recommended_price'] == before[2]['recommended_price']
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Rate Limit Tests
+"""
+
+import sqlite3
+
+from rate_limits import METRIC_API_REQUESTS, PLAN_LIMITS, UsageMeter, billing_period
+
+PUBLIC_BURST = PLAN_LIMITS['basic']['public'][1]
+
+def _statuses(client, path, requests, address):
+    return [client.get(path, environ_base={'REMOTE_ADDR': address}).status_code for _ in range(requests)]
+
+def test_widget_is_limited_by_the_hotel_in_its_url(app, db, make_hotel):
+    hotel_id = make_hotel()
+    subdomain = db.execute('SELECT subdomain FROM hotels WHERE id = ?', (hotel_id,)).fetchone()[0]
+    client = app.test_client()
+
+    # No tenant in the Host header; spreading requests over addresses does not help
+    statuses = [
+        client.get(f'/api/widget/{subdomain}/availability', environ_base={'REMOTE_ADDR': f'10.1.0.{n}'}).status_code
+        for n in range(PUBLIC_BURST + 1)
+    ]
+
+    assert 429 not in statuses[:PUBLIC_BURST]
+    assert statuses[-1] == 429
+
+def test_public_routes_without_a_tenant_are_limited_per_client(app):
+    client = app.test_client()
+
+    statuses = _statuses(client, '/api/widget/no-such-hotel/availability', PUBLIC_BURST + 1, '10.2.0.1')
+
+    assert 429 not in statuses[:PUBLIC_BURST]
+    assert statuses[-1] == 429
+    assert _statuses(client, '/api/widget/no-such-hotel/availability', 1, '10.2.0.2') != [429]
+
+def test_home_page_is_limited_per_client(app):
+    client = app.test_client()
+    page_burst = PLAN_LIMITS['basic']['page'][1]
+
+    statuses = _statuses(client, '/', page_burst + 1, '10.3.0.1')
+
+    assert 429 not in statuses[:page_burst]
+    assert statuses[-1] == 429
+
+def test_failed_flush_keeps_counts_and_event_total():
+    meter = UsageMeter(lambda: sqlite3.connect(':memory:'))
+    for _ in range(3):
+        meter.record(1, METRIC_API_REQUESTS, amount=5)
+
+    assert meter.flush() == 0
+
+    assert meter.pending == 3
+    assert meter.buffered(1, billing_period()) == {METRIC_API_REQUESTS: 15}
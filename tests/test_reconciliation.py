@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Reconciliation Tests
+"""
+
+import io
+import uuid
+
+from guest_lookup import find_by_confirmation_code
+from reconciliation import reconcile_file
+
+def _pending_payment(db, hotel_id, amount=120.0, paid_on='2024-03-01'):
+    """A pending reservation with one pending payment; returns (reference, confirmation code)"""
+    reference, code = f'PAY-{uuid.uuid4().hex[:10]}', f'T{uuid.uuid4().hex[:11].upper()}'
+    reservation_id = db.execute('''
+        INSERT INTO reservations (hotel_id, confirmation_code, guest_name, guest_email, check_in, check_out,
+                                  total_price, payment_status, created_at)
+        VALUES (?, ?, 'Test Guest', 'guest@test.example', '2024-03-10', '2024-03-12', ?, 'pending', ?)
+    ''', (hotel_id, code, amount, paid_on)).lastrowid
+    db.execute('''
+        INSERT INTO payments (hotel_id, reservation_id, amount, currency, payment_reference, status, payment_date)
+        VALUES (?, ?, ?, 'EUR', ?, 'pending', ?)
+    ''', (hotel_id, reservation_id, amount, reference, paid_on))
+    db.commit()
+    return reference, code
+
+def _reconcile(db, hotel_id, text):
+    return reconcile_file(db, io.BytesIO(text.encode()), hotel_id)
+
+def test_file_without_date_column_matches_on_reference_and_amount(db, make_hotel):
+    hotel_id = make_hotel()
+    reference, _ = _pending_payment(db, hotel_id)
+
+    report = _reconcile(db, hotel_id, f'reference,amount\n{reference},120.00\nUNKNOWN-1,5.00\n')
+
+    assert report['matched_payments'] == 1
+    assert report['unmatched_by_reason'] == {'unknown_reference': 1}
+    status = db.execute('SELECT status FROM payments WHERE payment_reference = ?', (reference,)).fetchone()[0]
+    assert status == 'completed'
+
+def test_unreadable_amount_or_date_is_reported_invalid(db, make_hotel):
+    hotel_id = make_hotel()
+    bad_amount, _ = _pending_payment(db, hotel_id)
+    bad_date, _ = _pending_payment(db, hotel_id)
+
+    report = _reconcile(db, hotel_id, f'reference,amount,date\n{bad_amount},12O.00,2024-03-01\n{bad_date},120.00,soon\n')
+
+    assert report['matched'] == 0
+    assert report['unmatched_by_reason'] == {'invalid': 2}
+    assert db.execute('''
+        SELECT COUNT(*) FROM payments WHERE payment_reference IN (?, ?) AND status = 'pending'
+    ''', (bad_amount, bad_date)).fetchone()[0] == 2
+
+def test_reconciled_reservation_is_not_served_stale_from_cache(db, make_hotel):
+    hotel_id = make_hotel()
+    reference, code = _pending_payment(db, hotel_id)
+    assert find_by_confirmation_code(db, code)['payment_status'] == 'pending'
+
+    _reconcile(db, hotel_id, f'reference,amount,date\n{reference},120.00,2024-03-02\n')
+
+    assert find_by_confirmation_code(db, code)['payment_status'] == 'paid'
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Reservation Search Tests
+"""
+
+import pytest
+
+from reservation_search import search_query, search_reservations
+
+def _reservation(db, hotel_id, name, email='guest@test.example', phone=None):
+    reservation_id = db.execute('''
+        INSERT INTO reservations (hotel_id, confirmation_code, guest_name, guest_email, guest_phone, check_in, check_out)
+        VALUES (?, hex(randomblob(6)), ?, ?, ?, '2024-08-01', '2024-08-03')
+    ''', (hotel_id, name, email, phone)).lastrowid
+    db.commit()
+    return reservation_id
+
+@pytest.mark.parametrize('typed', ['yilmaz', 'YILMAZ', 'Yılmaz', 'YıLMAZ', 'ılmaz'])
+def test_turkish_spellings_find_each_other(db, make_hotel, typed):
+    hotel_id = make_hotel()
+    found = _reservation(db, hotel_id, 'Ayşe YILMAZ')
+    _reservation(db, hotel_id, 'Ayse Kaya')
+
+    assert [row['id'] for row in search_reservations(db, hotel_id, typed)] == [found]
+
+def test_dotted_capital_i_and_other_letters_fold(db, make_hotel):
+    hotel_id = make_hotel()
+    found = _reservation(db, hotel_id, 'İsmail Çağlar Öztürk', email='ismail.ozturk@test.example')
+
+    for typed in ('ismail caglar', 'İSMAİL', 'ÇAĞLAR öztürk', 'ozturk@'):
+        assert [row['id'] for row in search_reservations(db, hotel_id, typed)] == [found], typed
+
+def test_search_is_scoped_to_the_hotel_and_follows_renames(db, make_hotel):
+    hotel_id, other_hotel = make_hotel(), make_hotel()
+    found = _reservation(db, hotel_id, 'Şükrü Güneş', phone='+90 (532) 111-22-33')
+    _reservation(db, other_hotel, 'Şükrü Güneş')
+
+    assert [row['id'] for row in search_reservations(db, hotel_id, 'sukru gunes')] == [found]
+    assert [row['id'] for row in search_reservations(db, hotel_id, '0532 111 22 33')] == [found]
+
+    db.execute("UPDATE reservations SET guest_name = 'Şükrü Doğan' WHERE id = ?", (found,))
+    db.commit()
+    assert search_reservations(db, hotel_id, 'güneş') == []
+    assert [row['id'] for row in search_reservations(db, hotel_id, 'dogan')] == [found]
+
+def test_short_terms_are_not_searched():
+    assert search_query('ab') is None
+    assert search_query('Ay Yılmaz') == '{name email phone code} : "Yilmaz"'
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Revenue Tests
+"""
+
+import pytest
+
+from currency import revenue_report, store_rates
+
+@pytest.fixture
+def rates(app):
+    from ultra_comprehensive_system import exchange_rates
+
+    exchange_rates.cache.clear()
+    yield exchange_rates
+    exchange_rates.cache.clear()
+
+def _payments(db, hotel_id, payments):
+    """Insert (amount, currency, status, refund_amount) payments taken on 2024-03-01, refunded on 2024-03-05"""
+    db.executemany('''
+        INSERT INTO payments (hotel_id, amount, currency, status, refund_amount, payment_date, refund_date)
+        VALUES (?, ?, ?, ?, ?, '2024-03-01', CASE WHEN ? IS NOT NULL THEN '2024-03-05' END)
+    ''', [(hotel_id, amount, currency, status, refund, refund) for amount, currency, status, refund in payments])
+    db.commit()
+
+def test_revenue_excludes_refunded_money(db, make_hotel, rates):
+    hotel_id = make_hotel()
+    _payments(db, hotel_id, [
+        (100.0, 'EUR', 'completed', None),
+        (50.0, 'EUR', 'refunded', 50.0),
+        (80.0, 'EUR', 'partially_refunded', 30.0),
+        (70.0, 'EUR', 'pending', None),
+    ])
+
+    report = revenue_report(db, rates, hotel_id, 'EUR')
+
+    assert report['total'] == 150.0
+    assert report['by_currency']['EUR'] == {'gross': 230.0, 'refunds': 80.0, 'converted': 150.0, 'payments': 3}
+    assert report['daily'] == [{'date': '2024-03-01', 'revenue': 230.0}, {'date': '2024-03-05', 'revenue': -80.0}]
+
+def test_dashboard_revenue_is_converted_net_of_refunds(app, db, make_hotel, rates):
+    hotel_id = make_hotel(currency='TRY')
+    store_rates(db, '2024-03-01', {'TRY': 30.0}, 'test')
+    store_rates(db, '2024-03-05', {'TRY': 32.0}, 'test')
+    _payments(db, hotel_id, [
+        (100.0, 'EUR', 'completed', None),
+        (50.0, 'EUR', 'refunded', 50.0),
+    ])
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['hotel_id'] = hotel_id
+    response = client.get('/admin/dashboard')
+
+    # 150 EUR taken at 30, 50 EUR paid back at 32
+    assert response.status_code == 200
+    assert '2900 TRY' in response.get_data(as_text=True)
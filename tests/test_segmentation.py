@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Segmentation Tests
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+
+from segmentation import SEGMENT_PROSPECT, quantile_scores, run_segmentation, segment_counts, segment_members
+
+def test_scores_are_quantiles_within_each_hotel_and_ties_share_them():
+    groups = np.array([0, 0, 0, 0, 0, 1, 1])
+    values = np.array([4.0, 2.0, 1.0, 2.0, 3.0, 5.0, 5.0])
+
+    assert quantile_scores(groups, values).tolist() == [5, 2, 1, 2, 4, 1, 1]
+
+def test_nightly_run_segments_customers_and_keeps_staff_vip_status(db, make_hotel):
+    hotel_id = make_hotel()
+    today = date.today()
+    for n in range(10):
+        email = f'guest{n}@test.example'
+        db.execute('INSERT INTO customers (hotel_id, email, first_name, vip_status) VALUES (?, ?, ?, ?)',
+                   (hotel_id, email, f'Guest{n}', 'gold' if n == 0 else 'regular'))
+        # Guest n stayed n times, most recently n weeks ago and spending 100 per stay; guest 9 never did
+        for stay in range(n if n < 9 else 0):
+            check_in = today - timedelta(days=7 * (10 - n) + 30 * stay)
+            db.execute('''
+                INSERT INTO reservations (hotel_id, confirmation_code, guest_name, guest_email, check_in, check_out, total_price)
+                VALUES (?, hex(randomblob(6)), 'Guest', ?, ?, ?, 100)
+            ''', (hotel_id, email.upper(), check_in.isoformat(), (check_in + timedelta(days=1)).isoformat()))
+    db.commit()
+
+    assert run_segmentation(db, [hotel_id]) == (10, 10)
+    assert run_segmentation(db, [hotel_id]) == (10, 0)
+
+    counts = segment_counts(db, hotel_id)
+    assert sum(counts['segments'].values()) == 10
+    assert [member['email'] for member in segment_members(db, hotel_id, SEGMENT_PROSPECT)] == [
+        'guest0@test.example', 'guest9@test.example'
+    ]
+    best = db.execute('SELECT segment, vip_status FROM customers WHERE hotel_id = ? AND email = ?',
+                      (hotel_id, 'guest8@test.example')).fetchone()
+    assert tuple(best) == ('champions', 'vip')
+    assert db.execute("SELECT vip_status FROM customers WHERE hotel_id = ? AND email = 'guest0@test.example'",
+                      (hotel_id,)).fetchone()[0] == 'gold'
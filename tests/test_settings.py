@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Settings Tests
+"""
+
+import pytest
+
+from settings import SettingsError, SettingsStore, settings_version, update_settings
+
+def test_another_workers_update_is_seen_after_the_version_check(app, db, make_hotel):
+    from ultra_comprehensive_system import get_tenant_connection
+
+    hotel_id = make_hotel()
+    writer = SettingsStore(get_tenant_connection)
+    reader = SettingsStore(get_tenant_connection, version_check_interval=0)
+    writer.update(hotel_id, {'check_in_time': '14:00', 'max_guests': 4})
+    assert reader.get(hotel_id, 'max_guests') == 4
+
+    writer.update(hotel_id, {'max_guests': 6, 'check_in_time': None})
+
+    assert reader.get(hotel_id, 'max_guests') == 6
+    assert reader.get(hotel_id, 'check_in_time') is None
+
+def test_unchanged_values_are_not_counted_or_versioned(db, make_hotel):
+    hotel_id = make_hotel()
+    assert update_settings(db, hotel_id, {'currency_symbol': '€', 'pets_allowed': True}) == (2, 0)
+    version = settings_version(db, hotel_id)
+
+    assert update_settings(db, hotel_id, {'currency_symbol': '€', 'pets_allowed': True, 'missing': None}) == (0, 0)
+    assert settings_version(db, hotel_id) == version
+    assert update_settings(db, hotel_id, {'currency_symbol': '₺', 'pets_allowed': None}) == (1, 1)
+    assert settings_version(db, hotel_id) > version
+
+def test_rejected_value_writes_nothing(db, make_hotel):
+    hotel_id = make_hotel()
+    update_settings(db, hotel_id, {'max_guests': 4})
+
+    with pytest.raises(SettingsError):
+        update_settings(db, hotel_id, {'late_checkout': True, 'max_guests': 'many'})
+
+    assert not db.in_transaction
+    assert db.execute('SELECT COUNT(*) FROM system_settings WHERE hotel_id = ?', (hotel_id,)).fetchone()[0] == 1
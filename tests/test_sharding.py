@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Shard Tests
+"""
+
+import os
+import uuid
+import sqlite3
+from datetime import date, timedelta
+
+import sharding
+import ultra_comprehensive_system as system
+from reservation_search import search_reservations
+from tenancy import hash_api_key
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+def test_schema_bump_reaches_shards_split_earlier(db, make_hotel, monkeypatch):
+    hotel_id = make_hotel()
+    db.execute('''
+        INSERT INTO reservations (hotel_id, confirmation_code, guest_name, guest_email, check_in, check_out)
+        VALUES (?, ?, 'Ayşe Yılmaz', 'ayse@test.example', '2024-05-01', '2024-05-03')
+    ''', (hotel_id, f'SHARD{hotel_id}'))
+    db.commit()
+    sharding.split_hotel(db, hotel_id, drain_seconds=0)
+    shard_path = db.execute('SELECT shard_path FROM tenant_shards WHERE hotel_id = ?', (hotel_id,)).fetchone()[0]
+    assert db.execute('SELECT schema_version FROM tenant_shards WHERE hotel_id = ?',
+                      (hotel_id,)).fetchone()[0] == system.SCHEMA_VERSION
+
+    # Make the shard look like it was split before search and customer segments existed
+    shard = sqlite3.connect(shard_path)
+    shard.execute('DROP TABLE reservation_search')
+    for (trigger,) in shard.execute("SELECT name FROM sqlite_master WHERE name LIKE 'trg_reservations_search_%'").fetchall():
+        shard.execute(f'DROP TRIGGER {trigger}')
+    shard.execute('DROP INDEX idx_customers_segment')
+    shard.execute('ALTER TABLE customers DROP COLUMN segment')
+    shard.commit()
+    shard.close()
+    db.execute('UPDATE tenant_shards SET schema_version = ? WHERE hotel_id = ?', (system.SCHEMA_VERSION - 1, hotel_id))
+    db.commit()
+
+    # ...and ship a release that adds a tenant table and a column
+    monkeypatch.setattr(system, 'SCHEMA_VERSION', system.SCHEMA_VERSION + 1)
+    monkeypatch.setattr(system, 'FEATURE_SCHEMAS', system.FEATURE_SCHEMAS + [[
+        'CREATE TABLE IF NOT EXISTS guest_notes (id INTEGER PRIMARY KEY, hotel_id INTEGER, note TEXT)'
+    ]])
+    monkeypatch.setattr(system, 'SCHEMA_COLUMN_ADDITIONS',
+                        system.SCHEMA_COLUMN_ADDITIONS + [('reservations', 'vip_flag', 'INTEGER DEFAULT 0')])
+    monkeypatch.setattr(sharding, 'SHARDED_TABLES', sharding.SHARDED_TABLES + ('guest_notes',))
+
+    assert system.bootstrap_database() is True
+
+    shard = sqlite3.connect(shard_path)
+    try:
+        assert 'vip_flag' in _columns(shard, 'reservations')
+        assert 'segment' in _columns(shard, 'customers')
+        assert _columns(shard, 'guest_notes') == {'id', 'hotel_id', 'note'}
+        assert search_reservations(shard, hotel_id, 'yilmaz')[0]['guest_name'] == 'Ayşe Yılmaz'
+    finally:
+        shard.close()
+    assert db.execute('SELECT schema_version FROM tenant_shards WHERE hotel_id = ?',
+                      (hotel_id,)).fetchone()[0] == system.SCHEMA_VERSION
+
+    # Routes read the shard through the router with the new schema in place
+    conn = system.get_tenant_connection(hotel_id)
+    try:
+        assert conn.execute('SELECT COUNT(*) FROM guest_notes').fetchone()[0] == 0
+    finally:
+        conn.close()
+    assert system.bootstrap_database() is False
+
+def _book(app, api_key, room_type_id):
+    check_in = date.today() + timedelta(days=30)
+    return app.test_client().post('/api/reservations', headers={'X-API-Key': api_key}, json={
+        'room_type_id': room_type_id, 'guest_name': 'Test Guest', 'guest_email': 'guest@test.example',
+        'check_in': check_in.isoformat(), 'check_out': (check_in + timedelta(days=2)).isoformat()
+    })
+
+def test_shard_bookings_use_the_catalog_currency(app, db, make_hotel):
+    hotel_id = make_hotel(currency='EUR')
+    api_key = str(uuid.uuid4())
+    db.execute('UPDATE hotels SET api_key_hash = ? WHERE id = ?', (hash_api_key(api_key), hotel_id))
+    room_type_id = db.execute('SELECT id FROM room_types WHERE hotel_id = ?', (hotel_id,)).fetchone()[0]
+    db.commit()
+    sharding.split_hotel(db, hotel_id, drain_seconds=0)
+
+    db.execute("UPDATE hotels SET currency = 'TRY' WHERE id = ?", (hotel_id,))
+    db.commit()
+    system.tenants.invalidate()
+    response = _book(app, api_key, room_type_id)
+
+    assert response.status_code == 201
+    assert response.get_json()['reservation']['currency'] == 'TRY'
+
+def test_nightly_jobs_see_the_catalog_hotel_row(db, make_hotel):
+    hotel_id = make_hotel()
+    sharding.split_hotel(db, hotel_id, drain_seconds=0)
+    db.execute("UPDATE hotels SET status = 'suspended', currency = 'GBP' WHERE id = ?", (hotel_id,))
+    db.commit()
+
+    shard_path = db.execute('SELECT shard_path FROM tenant_shards WHERE hotel_id = ?', (hotel_id,)).fetchone()[0]
+    for conn in system.shards.shard_connections():
+        conn.close()
+
+    shard = sqlite3.connect(shard_path)
+    try:
+        assert shard.execute('SELECT status, currency, api_key_hash FROM hotels').fetchall() == [('suspended', 'GBP', None)]
+    finally:
+        shard.close()
+
+def test_split_copies_columns_by_name(db, make_hotel):
+    hotel_id = make_hotel()
+    db.execute('UPDATE room_types SET base_price = 175 WHERE hotel_id = ?', (hotel_id,))
+    db.commit()
+
+    # A shard whose room_types columns were declared in another order
+    columns = [(row[1], row[2]) for row in db.execute('PRAGMA table_info(room_types)')]
+    os.makedirs(sharding.SHARD_DIRECTORY, exist_ok=True)
+    shard = sqlite3.connect(sharding.shard_file(hotel_id))
+    shard.execute(f"CREATE TABLE room_types ({', '.join(f'{name} {kind}' for name, kind in reversed(columns))})")
+    shard.commit()
+    shard.close()
+
+    sharding.split_hotel(db, hotel_id, drain_seconds=0)
+
+    shard = sqlite3.connect(sharding.shard_file(hotel_id))
+    try:
+        assert shard.execute('SELECT hotel_id, name, base_price FROM room_types').fetchall() == [(hotel_id, 'Standard', 175)]
+    finally:
+        shard.close()
+
+def test_run_everywhere_visits_the_catalog_and_each_shard(db, make_hotel):
+    hotel_id = make_hotel()
+    sharding.split_hotel(db, hotel_id, drain_seconds=0)
+    shard_count = db.execute("SELECT COUNT(*) FROM tenant_shards WHERE status = 'active'").fetchone()[0]
+
+    hotels = system.shards.run_everywhere(lambda conn: [row[0] for row in conn.execute('SELECT id FROM hotels')])
+
+    assert len(hotels) == 1 + shard_count
+    assert hotel_id in hotels[0] and [hotel_id] in hotels[1:]
+    assert system.shards.in_use == 0
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YourBookingHub.org - Tenancy Tests
+"""
+
+import uuid
+
+import ultra_comprehensive_system as system
+from synthetic_data import generate_dataset
+
+def test_new_hotels_store_only_the_key_hash(app, db):
+    dataset = generate_dataset(db, hotels=2, reservations_per_hotel=1, emails_per_hotel=0, analytics_days=0,
+                               seed=uuid.uuid4().int)
+    hotel_id = dataset['hotel_ids'][0]
+
+    assert db.execute('SELECT COUNT(api_key) FROM hotels WHERE id IN (?, ?)', dataset['hotel_ids']).fetchone()[0] == 0
+    response = app.test_client().get('/api/usage', headers={'X-API-Key': dataset['api_keys'][hotel_id]})
+    assert response.status_code == 200
+
+def test_migration_hashes_and_drops_plaintext_keys(app, db, make_hotel):
+    hotel_id = make_hotel()
+    api_key = str(uuid.uuid4())
+    db.execute('UPDATE hotels SET api_key = ?, api_key_hash = NULL WHERE id = ?', (api_key, hotel_id))
+    db.execute('UPDATE schema_version SET version = ?', (system.SCHEMA_VERSION - 1,))
+    db.commit()
+
+    assert system.bootstrap_database() is True
+
+    assert db.execute('SELECT COUNT(api_key) FROM hotels').fetchone()[0] == 0
+    system.tenants.invalidate()
+    assert system.tenants.by_api_key(api_key)['id'] == hotel_id
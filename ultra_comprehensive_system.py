@@ -13,11 +13,48 @@ import sqlite3
 import json
 import hashlib
 import uuid
+import time
 from datetime import datetime, timedelta
 from decimal import Decimal
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, send_file
+from flask import Flask, render_template, render_template_string, request, jsonify, redirect, url_for, flash, session, send_file, g
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import generate_password_hash, check_password_hash
 import re
+import atexit
+from functools import wraps
+
+from forecasting import HORIZON_DAYS, get_stored_forecast
+from pricing import PRICING_SCHEMA, get_recommended_rates
+from prefork import CachedStringEnvironment, warm_up
+from health import ReadinessProbe, check_database, check_pool, check_queue
+from inventory import INVENTORY_SCHEMA, get_calendar, get_channel_ari, get_stay_availability
+from admission import AdmissionMiddleware
+from bookings import BOOKING_SCHEMA, BookingError, create_reservation, update_reservation
+from currency import CURRENCY_SCHEMA, ExchangeRateStore, revenue_report
+from ledger import LEDGER_SCHEMA, backfill_payment_ledger, ledger_report, month_range
+from confirmation_codes import generate_confirmation_code
+from guest_dedup import GUEST_DEDUP_SCHEMA, get_guest, guest_stats
+from guest_lookup import find_by_booking_date, find_by_confirmation_code, find_by_guest_email
+from json_columns import (
+    EMAIL_PAGE_SIZE, JSON_COLUMNS_SCHEMA, backfill_room_type_amenities, emails_by_classification,
+    room_types_with_amenity
+)
+from lazy_imports import lazy_import
+from loyalty import LOYALTY_SCHEMA, LoyaltyError, backfill_loyalty_ledger, get_loyalty, record_entry
+from metrics import PROMETHEUS_CONTENT_TYPE, connection_factory, instrument_app, registry as metrics_registry
+from platform_overview import OVERVIEW_PAGE_SIZE, get_platform_overview, overview_page
+from reconciliation import reconcile_file
+from reservation_search import (
+    MAX_SEARCH_LIMIT, RESERVATION_SEARCH_SCHEMA, SEARCH_LIMIT, backfill_reservation_search, search_reservations
+)
+from rate_limits import (
+    DEFAULT_PLAN, METRIC_API_REQUESTS, USAGE_SCHEMA, TokenBucketLimiter, UsageMeter, billing_period, classify_route,
+    get_usage
+)
+from segmentation import SEGMENTS, segment_counts, segment_members
+from settings import SETTINGS_SCHEMA, SettingsError, SettingsStore
+from sharding import SHARDING_SCHEMA, ShardMigrating, ShardRouter, migrate_shards
+from tenancy import TENANCY_SCHEMA, TenantDirectory, backfill_api_key_hashes, hash_api_key, tenant_subdomain
 
 # Configure comprehensive logging
 logging.basicConfig(
@@ -30,14 +67,92 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'ultra-comprehensive-secret-key-2024')
 
+# Inline templates are compiled once per process instead of on every render
+app.jinja_environment = CachedStringEnvironment
+
+# Request latency, SQL and template timings, exported at /metrics
+instrument_app(app)
+
+# Client addresses (anonymous rate limits) come from X-Forwarded-For set by this many proxies
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
+# Outermost: shed low-priority requests before they reach routing or the metrics timer
+app.wsgi_app = AdmissionMiddleware(app.wsgi_app)
+
+# Public hotel sites live at <subdomain>.<TENANT_BASE_DOMAIN>
+TENANT_BASE_DOMAIN = os.environ.get('TENANT_BASE_DOMAIN', 'yourbookinghub.org')
+
+# The hotel account at this subdomain operates the platform and sees every tenant
+PLATFORM_ADMIN_SUBDOMAIN = os.environ.get('PLATFORM_ADMIN_SUBDOMAIN', 'admin')
+
+# SQLite database location (only sqlite:/// URLs are honoured here)
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///ultra_comprehensive_hotel.db')
+DATABASE_PATH = DATABASE_URL[len('sqlite:///'):] if DATABASE_URL.startswith('sqlite:///') else 'ultra_comprehensive_hotel.db'
+
+# Columns added after the first release; applied to existing databases on startup
+SCHEMA_COLUMN_ADDITIONS = [
+    ('room_types', 'total_rooms', 'INTEGER DEFAULT 10'),
+    ('hotels', 'api_key_hash', 'TEXT'),
+    ('customers', 'rfm_score', 'TEXT'),
+    ('customers', 'segment', 'TEXT'),
+    ('tenant_shards', 'schema_version', 'INTEGER'),
+]
+
+# Secondary indexes for tenant-scoped lookups
+SCHEMA_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_reservations_room_stay ON reservations (room_type_id, check_in)',
+    'CREATE INDEX IF NOT EXISTS idx_analytics_metric ON analytics_data (hotel_id, metric_name, date_recorded)',
+    'CREATE INDEX IF NOT EXISTS idx_reservations_guest_email ON reservations (hotel_id, lower(guest_email))',
+    'CREATE INDEX IF NOT EXISTS idx_reservations_payment_reference ON reservations (payment_reference)',
+    'CREATE INDEX IF NOT EXISTS idx_payments_reference ON payments (payment_reference)',
+    'CREATE INDEX IF NOT EXISTS idx_payments_reservation ON payments (reservation_id)',
+    'CREATE INDEX IF NOT EXISTS idx_customers_segment ON customers (hotel_id, segment)',
+    'CREATE INDEX IF NOT EXISTS idx_customers_vip ON customers (hotel_id, vip_status)',
+]
+
+# Bump whenever a table, column, index or feature schema changes; boots at the
+# current version skip all DDL
+SCHEMA_VERSION = 12
+
+# Tables owned by feature modules
+FEATURE_SCHEMAS = [
+    PRICING_SCHEMA,
+    INVENTORY_SCHEMA,
+    BOOKING_SCHEMA,
+    TENANCY_SCHEMA,
+    USAGE_SCHEMA,
+    SHARDING_SCHEMA,
+    CURRENCY_SCHEMA,
+    LEDGER_SCHEMA,
+    LOYALTY_SCHEMA,
+    GUEST_DEDUP_SCHEMA,
+    RESERVATION_SEARCH_SCHEMA,
+    SETTINGS_SCHEMA,
+    JSON_COLUMNS_SCHEMA,
+]
+
+# Fill derived tables and columns from existing rows; each is a no-op once done. They run
+# against the catalog and, after a schema change, against every shard
+SCHEMA_BACKFILLS = [
+    backfill_api_key_hashes,
+    backfill_payment_ledger,
+    backfill_loyalty_ledger,
+    backfill_reservation_search,
+    backfill_room_type_amenities,
+]
+
 # Ultra Comprehensive Database Schema
 def init_comprehensive_database():
     """Initialize comprehensive database with all tables"""
     try:
-        db_path = 'ultra_comprehensive_hotel.db'
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(DATABASE_PATH)
         cursor = conn.cursor()
         
+        # WAL lets dashboard reads proceed while a booking holds the write lock
+        cursor.execute('PRAGMA journal_mode=WAL')
+        
         # Hotels table with comprehensive fields
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS hotels (
@@ -88,6 +203,7 @@ def init_comprehensive_database():
                 maximum_stay INTEGER DEFAULT 30,
                 advance_booking_days INTEGER DEFAULT 365,
                 cancellation_policy TEXT,
+                total_rooms INTEGER DEFAULT 10,
                 is_active BOOLEAN DEFAULT 1,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (hotel_id) REFERENCES hotels (id)
@@ -257,6 +373,35 @@ def init_comprehensive_database():
             )
         ''')
         
+        # Bring databases created by earlier versions up to date
+        for table, column, definition in SCHEMA_COLUMN_ADDITIONS:
+            existing_columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')]
+            # Feature tables not created yet get the column from their CREATE TABLE below
+            if existing_columns and column not in existing_columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        
+        for index_sql in SCHEMA_INDEXES:
+            cursor.execute(index_sql)
+        
+        for feature_schema in FEATURE_SCHEMAS:
+            for statement in feature_schema:
+                cursor.execute(statement)
+        
+        for backfill in SCHEMA_BACKFILLS:
+            backfill(cursor)
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            INSERT INTO schema_version (id, version) VALUES (1, ?)
+            ON CONFLICT (id) DO UPDATE SET version = excluded.version, applied_at = CURRENT_TIMESTAMP
+        ''', (SCHEMA_VERSION,))
+        
         # Create comprehensive admin user
         cursor.execute('SELECT COUNT(*) FROM hotels WHERE subdomain = ?', ('admin',))
         if cursor.fetchone()[0] == 0:
@@ -266,7 +411,7 @@ def init_comprehensive_database():
                 INSERT INTO hotels (
                     name, email, subdomain, admin_email, admin_password, 
                     phone, website, address, city, country, 
-                    subscription_plan, api_key, timezone, currency, language
+                    subscription_plan, api_key_hash, timezone, currency, language
                 )
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
@@ -281,13 +426,15 @@ def init_comprehensive_database():
                 'San Francisco',
                 'USA',
                 'enterprise',
-                api_key,
+                hash_api_key(api_key),
                 'PST',
                 'USD',
                 'en'
             ))
             
             hotel_id = cursor.lastrowid
+            # Only the hash is stored, so this is the one chance to read the key
+            logger.warning(f"Platform admin API key (shown once, store it now): {api_key}")
             
             # Add sample room types
             room_types = [
@@ -316,20 +463,157 @@ def init_comprehensive_database():
         logger.error(f"Database initialization failed: {e}")
         return False
 
-# Initialize comprehensive database
-init_comprehensive_database()
+def get_schema_version(conn):
+    """Schema version recorded in the database, or None for new and pre-versioning files"""
+    try:
+        row = conn.execute('SELECT version FROM schema_version WHERE id = 1').fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
 
-# Utility functions
-def generate_confirmation_code():
-    """Generate unique confirmation code"""
-    return f"YBH{datetime.now().strftime('%Y%m%d')}{str(uuid.uuid4())[:8].upper()}"
+def bootstrap_database():
+    """Create or migrate the catalog, then any shard behind it; returns True if DDL ran"""
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        current = get_schema_version(conn) == SCHEMA_VERSION
+    finally:
+        conn.close()
+    if not current and not init_comprehensive_database():
+        raise RuntimeError(f"Database initialization failed for {DATABASE_PATH}")
+    conn = sqlite3.connect(DATABASE_PATH, timeout=30)
+    try:
+        shards_migrated = migrate_shards(conn, SCHEMA_BACKFILLS)
+    finally:
+        conn.close()
+    return not current or shards_migrated > 0
 
+# Utility functions
 def get_db_connection():
     """Get database connection"""
-    conn = sqlite3.connect('ultra_comprehensive_hotel.db')
+    # One connection per caller and thread (sqlite3 enforces it); wait out concurrent writers
+    conn = sqlite3.connect(DATABASE_PATH, factory=connection_factory(), timeout=30)
     conn.row_factory = sqlite3.Row
+    # Memory-map the database file so inventory calendar blobs are read from the page cache
+    conn.execute('PRAGMA mmap_size = 268435456')
     return conn
 
+# Hotels split out of the catalog are served from their own shard file
+shards = ShardRouter(get_db_connection)
+atexit.register(shards.close_all)
+
+def get_tenant_connection(hotel_id):
+    """Get connection to the database holding a hotel's data"""
+    return shards.connect(hotel_id)
+
+@app.errorhandler(ShardMigrating)
+def shard_migrating(e):
+    """Ask clients to retry while a hotel moves to its own database"""
+    response = jsonify({'error': 'Hotel data is being migrated, retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(int(e.retry_after + 0.999))
+    return response
+
+# Tenant resolution
+tenants = TenantDirectory(get_db_connection)
+
+# Typed system_settings per hotel, read from wherever the hotel's data lives
+hotel_settings = SettingsStore(get_tenant_connection)
+
+# Daily exchange rates live in the catalog; revenue rollups live with each hotel's data
+exchange_rates = ExchangeRateStore(get_db_connection)
+
+@app.before_request
+def resolve_tenant():
+    """Attach the request's hotel (g.tenant) and authenticated hotel id (g.hotel_id)"""
+    g.tenant = None
+    g.hotel_id = None
+    
+    api_key = request.headers.get('X-API-Key')
+    if api_key:
+        g.tenant = tenants.by_api_key(api_key)
+        if g.tenant is None:
+            return jsonify({'error': 'Invalid API key'}), 401
+        g.hotel_id = g.tenant['id']
+    elif 'hotel_id' in session:
+        g.hotel_id = session['hotel_id']
+        g.tenant = tenants.get_hotel(g.hotel_id)
+    else:
+        # A subdomain identifies the public hotel site but never authenticates
+        subdomain = tenant_subdomain(request.host, TENANT_BASE_DOMAIN)
+        if subdomain:
+            g.tenant = tenants.by_subdomain(subdomain)
+
+def tenant_required(view):
+    """Require an API key or admin session for the route"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if g.get('hotel_id') is None:
+            return jsonify({'error': 'Authentication required'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def platform_admin_required(view):
+    """Require the platform operator's API key or admin session"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if g.get('hotel_id') is None:
+            return jsonify({'error': 'Authentication required'}), 401
+        if not g.tenant or g.tenant['subdomain'] != PLATFORM_ADMIN_SUBDOMAIN:
+            return jsonify({'error': 'Platform admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+# Per-tenant rate limits and usage metering
+rate_limiter = TokenBucketLimiter()
+usage_meter = UsageMeter(get_db_connection)
+atexit.register(usage_meter.flush)
+
+@app.before_request
+def enforce_rate_limits():
+    """Reject requests beyond the tenant's plan limits for the route class.
+
+    Public routes name their hotel in the URL when the Host does not; public routes and
+    pages that still have no tenant share a per-client-address bucket at the default plan.
+    """
+    route_class = classify_route(request.path, request.method)
+    g.route_class = route_class
+    if route_class is None:
+        return None
+    if g.tenant is None and route_class == 'public' and (request.view_args or {}).get('subdomain'):
+        g.tenant = tenants.by_subdomain(request.view_args['subdomain'])
+    if g.tenant is not None:
+        bucket, plan = g.tenant['id'], g.tenant['subscription_plan']
+    elif route_class in ('public', 'page'):
+        bucket, plan = ('client', request.remote_addr), DEFAULT_PLAN
+    else:
+        return None
+    
+    allowed, retry_after, remaining = rate_limiter.acquire(bucket, plan, route_class)
+    g.rate_limit_remaining = remaining
+    if not allowed:
+        response = jsonify({'error': 'Rate limit exceeded', 'route_class': route_class})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+        return response
+    return None
+
+@app.after_request
+def meter_usage(response):
+    """Count API usage per tenant and flush counters in batches"""
+    if g.get('route_class') and 'rate_limit_remaining' in g:
+        response.headers['X-RateLimit-Remaining'] = str(g.rate_limit_remaining)
+    if g.get('route_class') not in (None, 'page') and g.get('tenant') is not None:
+        if response.status_code != 429:
+            usage_meter.record(g.tenant['id'], METRIC_API_REQUESTS)
+    usage_meter.maybe_flush()
+    return response
+
+# Readiness checks, cached so probes stay cheap under load
+readiness = ReadinessProbe()
+readiness.register('database', lambda: check_database(get_db_connection), critical=True)
+readiness.register('shard_pool', lambda: check_pool(shards))
+readiness.register('usage_buffer', lambda: check_queue(lambda: usage_meter.pending, usage_meter.flush_threshold * 2))
+
 # Main Routes
 @app.route('/')
 def index():
@@ -974,9 +1258,8 @@ def ultra_admin_dashboard():
     if 'hotel_id' not in session:
         return redirect(url_for('admin_login'))
     
+    conn = get_tenant_connection(session['hotel_id'])
     try:
-        conn = get_db_connection()
-        
         # Get comprehensive statistics
         stats = {}
         stats['total_emails'] = conn.execute(
@@ -994,10 +1277,12 @@ def ultra_admin_dashboard():
             (session['hotel_id'],)
         ).fetchone()[0] or 0
         
-        stats['total_revenue'] = conn.execute(
-            'SELECT COALESCE(SUM(amount), 0) FROM payments WHERE hotel_id = ? AND status = "completed"',
-            (session['hotel_id'],)
-        ).fetchone()[0] or 0
+        # All-time revenue net of refunds in the hotel's own currency, converted at each day's rate
+        hotel = tenants.get_hotel(session['hotel_id'])
+        revenue = revenue_report(conn, exchange_rates, session['hotel_id'], hotel['currency'] if hotel else None)
+        stats['total_revenue'] = revenue['total']
+        stats['revenue_currency'] = revenue['currency']
+        stats['unconverted_revenue'] = revenue['unconverted']
         
         # Get recent activity
         recent_emails = conn.execute('''
@@ -1016,8 +1301,6 @@ def ultra_admin_dashboard():
             ORDER BY name
         ''', (session['hotel_id'],)).fetchall()
         
-        conn.close()
-        
         return render_template_string('''
 <!DOCTYPE html>
 <html lang="en">
@@ -1115,9 +1398,9 @@ def ultra_admin_dashboard():
             
             <div class="bg-gradient-to-br from-orange-500 to-orange-600 p-8 rounded-xl text-white stat-card">
                 <div class="flex items-center justify-between mb-4">
-                    <div class="text-4xl"><i class="fas fa-dollar-sign"></i></div>
+                    <div class="text-4xl"><i class="fas fa-coins"></i></div>
                     <div class="text-right">
-                        <div class="text-3xl font-bold">${{ "%.0f"|format(stats.total_revenue) }}</div>
+                        <div class="text-3xl font-bold">{{ "%.0f"|format(stats.total_revenue) }} {{ stats.revenue_currency }}</div>
                         <div class="text-orange-100">Revenue</div>
                     </div>
                 </div>
@@ -1267,6 +1550,8 @@ def ultra_admin_dashboard():
         logger.error(f"Dashboard error: {e}")
         flash('Dashboard loading failed')
         return redirect(url_for('admin_login'))
+    finally:
+        conn.close()
 
 @app.route('/admin/logout')
 def admin_logout():
@@ -1274,15 +1559,30 @@ def admin_logout():
     session.clear()
     return redirect(url_for('index'))
 
+@app.route('/health/live')
+def liveness_check():
+    """Liveness: the process is up and serving; no dependencies checked"""
+    return jsonify({'status': 'alive', 'uptime_seconds': round(time.time() - metrics_registry.started)})
+
+@app.route('/health/ready')
+def readiness_check():
+    """Readiness: dependency checks (cached briefly); 503 takes the instance out of rotation"""
+    result = readiness.status()
+    return jsonify(result), 200 if result['ready'] else 503
+
 @app.route('/health')
 def health_check():
     """Ultra comprehensive health check"""
+    request_count, request_seconds = metrics_registry.requests.totals()
+    readiness_result = readiness.status()
+    database = readiness_result['checks']['database']
     return jsonify({
-        'status': 'healthy',
+        'status': 'healthy' if readiness_result['status'] == 'ok' else readiness_result['status'],
         'service': 'YourBookingHub.org Ultra Comprehensive System',
         'version': '2.0.0',
         'deployment': 'render',
-        'database': 'connected',
+        'database': 'connected' if database['status'] != 'fail' else 'unavailable',
+        'database_latency_ms': database.get('latency_ms'),
         'features': {
             'multi_tenant': True,
             'ai_processing': True,
@@ -1297,20 +1597,27 @@ def health_check():
         },
         'supported_languages': ['Turkish', 'English', 'German', 'French', 'Russian'],
         'system_metrics': {
-            'uptime': '99.9%',
-            'response_time': '45ms',
+            'uptime_seconds': round(time.time() - metrics_registry.started),
+            'requests_served': request_count,
+            'avg_response_time_ms': round(request_seconds / request_count * 1000, 2) if request_count else None,
             'features_count': 50,
             'tenant_support': 'unlimited'
         },
         'timestamp': datetime.now().isoformat()
-    })
+    }), 200 if readiness_result['ready'] else 503
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint (per worker process)"""
+    return metrics_registry.render(), 200, {'Content-Type': PROMETHEUS_CONTENT_TYPE}
 
 @app.route('/api/status')
 def api_status():
     """Ultra comprehensive API status"""
+    readiness_result = readiness.status()
     return jsonify({
         'platform': 'YourBookingHub.org Ultra Comprehensive System',
-        'status': 'operational',
+        'status': {'ok': 'operational', 'degraded': 'degraded'}.get(readiness_result['status'], 'unavailable'),
         'version': '2.0.0',
         'features': {
             'core_system': True,
@@ -1339,12 +1646,565 @@ def api_status():
         },
         'api_endpoints': {
             'health': '/health',
+            'liveness': '/health/live',
+            'readiness': '/health/ready',
+            'metrics': '/metrics',
             'status': '/api/status',
             'admin': '/admin',
-            'dashboard': '/admin/dashboard'
+            'dashboard': '/admin/dashboard',
+            'forecast': '/api/analytics/forecast',
+            'pricing': '/api/pricing/rates',
+            'inventory_calendar': '/api/inventory/calendar',
+            'channel_ari': '/api/channel/ari',
+            'widget_availability': '/api/widget/<subdomain>/availability',
+            'reservations': '/api/reservations',
+            'reservation_lookup': '/api/reservations/lookup',
+            'guest_reservation': '/api/guest/reservation',
+            'usage': '/api/usage',
+            'platform_overview': '/api/platform/overview'
         }
     })
 
+@app.route('/api/analytics/forecast')
+@tenant_required
+def api_demand_forecast():
+    """Stored occupancy and demand forecast for the logged-in hotel"""
+    days = max(1, min(request.args.get('days', HORIZON_DAYS, type=int), HORIZON_DAYS))
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        forecasts = get_stored_forecast(conn, g.hotel_id, days=days)
+        return jsonify({
+            'hotel_id': g.hotel_id,
+            'days': days,
+            'room_types': forecasts
+        })
+    except Exception as e:
+        logger.error(f"Forecast lookup error: {e}")
+        return jsonify({'error': 'Forecast lookup failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/pricing/rates')
+@tenant_required
+def api_recommended_rates():
+    """Precomputed dynamic-pricing recommendations for the logged-in hotel"""
+    days = max(1, min(request.args.get('days', 30, type=int), 365))
+    room_type_id = request.args.get('room_type_id', type=int)
+    try:
+        start_date = parse_date_arg('start')
+    except ValueError:
+        return jsonify({'error': 'start must be YYYY-MM-DD'}), 400
+    
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        rates = get_recommended_rates(conn, g.hotel_id, room_type_id, start_date, days)
+        return jsonify({
+            'hotel_id': g.hotel_id,
+            'days': days,
+            'room_types': rates
+        })
+    except Exception as e:
+        logger.error(f"Rate lookup error: {e}")
+        return jsonify({'error': 'Rate lookup failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/reports/revenue')
+@tenant_required
+def api_revenue_report():
+    """Revenue for a date range from the daily rollup, in the hotel's or a requested currency"""
+    try:
+        start_date = parse_date_arg('start')
+        end_date = parse_date_arg('end')
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD'}), 400
+    if start_date and end_date and end_date < start_date:
+        return jsonify({'error': 'end must not be before start'}), 400
+    currency = request.args.get('currency') or (g.tenant or {}).get('currency')
+    
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        return jsonify(revenue_report(conn, exchange_rates, g.hotel_id, currency, start_date, end_date))
+    except Exception as e:
+        logger.error(f"Revenue report error: {e}")
+        return jsonify({'error': 'Revenue report failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/reports/ledger')
+@tenant_required
+def api_ledger_report():
+    """Gross, fees, net and refunds for a month or date range, by method and provider"""
+    try:
+        if 'month' in request.args:
+            month = datetime.strptime(request.args['month'], '%Y-%m')
+            start_date, end_date = month_range(month.year, month.month)
+        else:
+            end_date = parse_date_arg('end', datetime.now().date())
+            start_date = parse_date_arg('start', end_date.replace(day=1))
+    except ValueError:
+        return jsonify({'error': 'month must be YYYY-MM, start and end YYYY-MM-DD'}), 400
+    if end_date < start_date:
+        return jsonify({'error': 'end must not be before start'}), 400
+    
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        daily = request.args.get('daily', 'false').lower() == 'true'
+        return jsonify(ledger_report(conn, g.hotel_id, start_date, end_date, daily))
+    except Exception as e:
+        logger.error(f"Ledger report error: {e}")
+        return jsonify({'error': 'Ledger report failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/payments/reconcile', methods=['POST'])
+@tenant_required
+def api_reconcile_payments():
+    """Match an uploaded provider settlement CSV against the hotel's payments and reservations"""
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'error': 'Upload the settlement CSV as the file field'}), 400
+    dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+    
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        return jsonify(reconcile_file(conn, upload.stream, g.hotel_id, dry_run))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Reconciliation error: {e}")
+        return jsonify({'error': 'Reconciliation failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/customers/segments')
+@tenant_required
+def api_customer_segments():
+    """Customer counts per RFM segment from the nightly segmentation"""
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        return jsonify(dict(segment_counts(conn, g.hotel_id), hotel_id=g.hotel_id))
+    except Exception as e:
+        logger.error(f"Segment counts error: {e}")
+        return jsonify({'error': 'Segment lookup failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/customers/segments/<segment>')
+@tenant_required
+def api_customer_segment_members(segment):
+    """One page of the customers in a segment; pass the last id as ?after= for the next page"""
+    if segment not in SEGMENTS:
+        return jsonify({'error': f"Unknown segment, expected one of: {', '.join(SEGMENTS)}"}), 404
+    limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+    after_id = request.args.get('after', 0, type=int)
+    
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        customers = segment_members(conn, g.hotel_id, segment, limit, after_id)
+        return jsonify({
+            'hotel_id': g.hotel_id,
+            'segment': segment,
+            'customers': customers,
+            'next_after': customers[-1]['id'] if len(customers) == limit else None
+        })
+    except Exception as e:
+        logger.error(f"Segment members error: {e}")
+        return jsonify({'error': 'Segment lookup failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/customers/<int:customer_id>/loyalty')
+@tenant_required
+def api_customer_loyalty(customer_id):
+    """Loyalty balance and most recent entries of a customer"""
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        return jsonify(get_loyalty(conn, g.hotel_id, customer_id))
+    except LoyaltyError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        logger.error(f"Loyalty lookup error: {e}")
+        return jsonify({'error': 'Loyalty lookup failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/customers/<int:customer_id>/loyalty', methods=['POST'])
+@tenant_required
+def api_record_loyalty(customer_id):
+    """Earn, burn or adjust a customer's points: {"type": "burn", "points": 500, "reference": "..."}"""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'JSON body required'}), 400
+    
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        balance = record_entry(
+            conn, g.hotel_id, customer_id, payload.get('points'), payload.get('type'), payload.get('reference')
+        )
+        return jsonify({'customer_id': customer_id, 'balance': balance}), 201
+    except LoyaltyError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        logger.error(f"Loyalty entry error: {e}")
+        return jsonify({'error': 'Loyalty entry failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/guests/stats')
+@tenant_required
+def api_guest_stats():
+    """Distinct guests after deduplication next to the raw CRM counts"""
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        return jsonify(guest_stats(conn, g.hotel_id))
+    except Exception as e:
+        logger.error(f"Guest stats error: {e}")
+        return jsonify({'error': 'Guest lookup failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/guests/<int:guest_id>')
+@tenant_required
+def api_guest_profile(guest_id):
+    """A deduplicated guest with every customer, reservation and email record linked to it"""
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        guest = get_guest(conn, g.hotel_id, guest_id)
+        if guest is None:
+            return jsonify({'error': 'Guest not found'}), 404
+        return jsonify({'guest': guest})
+    except Exception as e:
+        logger.error(f"Guest lookup error: {e}")
+        return jsonify({'error': 'Guest lookup failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/reservations/search')
+@tenant_required
+def api_search_reservations():
+    """Staff type-ahead over guest name, email, phone and confirmation code (?q=, ?limit=)"""
+    limit = max(1, min(request.args.get('limit', SEARCH_LIMIT, type=int), MAX_SEARCH_LIMIT))
+    
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        reservations = search_reservations(conn, g.hotel_id, request.args.get('q', ''), limit)
+        return jsonify({'reservations': reservations, 'count': len(reservations)})
+    except Exception as e:
+        logger.error(f"Reservation search error: {e}")
+        return jsonify({'error': 'Search failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/settings')
+@tenant_required
+def api_get_settings():
+    """Every setting of the hotel, typed by setting_type"""
+    try:
+        settings = hotel_settings.get_all(g.hotel_id)
+        return jsonify({'settings': settings, 'version': hotel_settings.version(g.hotel_id)})
+    except ShardMigrating:
+        raise
+    except Exception as e:
+        logger.error(f"Settings error: {e}")
+        return jsonify({'error': 'Settings lookup failed'}), 500
+
+@app.route('/api/settings', methods=['PUT'])
+@tenant_required
+def api_update_settings():
+    """Bulk update in one transaction: {"settings": {key: value, ...}}; null deletes a key"""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'JSON body required'}), 400
+    
+    try:
+        written, deleted = hotel_settings.update(g.hotel_id, payload.get('settings'))
+        settings = hotel_settings.get_all(g.hotel_id)
+        return jsonify({
+            'settings': settings, 'version': hotel_settings.version(g.hotel_id),
+            'written': written, 'deleted': deleted
+        })
+    except SettingsError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except ShardMigrating:
+        raise
+    except Exception as e:
+        logger.error(f"Settings update error: {e}")
+        return jsonify({'error': 'Settings update failed'}), 500
+
+@app.route('/api/room-types')
+@tenant_required
+def api_room_types():
+    """Active room types with decoded amenities and images; ?amenity= filters through its index"""
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        room_types = room_types_with_amenity(conn, g.hotel_id, request.args.get('amenity') or None)
+        return jsonify({'room_types': room_types, 'count': len(room_types)})
+    except Exception as e:
+        logger.error(f"Room types error: {e}")
+        return jsonify({'error': 'Room type lookup failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/emails')
+@tenant_required
+def api_emails_by_classification():
+    """Newest emails with an AI classification (?classification=complaint); ?before= pages back"""
+    classification = request.args.get('classification', '').strip()
+    if not classification:
+        return jsonify({'error': 'classification is required'}), 400
+    limit = max(1, min(request.args.get('limit', EMAIL_PAGE_SIZE, type=int), 500))
+    before_id = request.args.get('before', type=int)
+    
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        emails = emails_by_classification(conn, g.hotel_id, classification, limit, before_id)
+        return jsonify({
+            'classification': classification,
+            'emails': emails,
+            'next_before': emails[-1]['id'] if len(emails) == limit else None
+        })
+    except Exception as e:
+        logger.error(f"Email lookup error: {e}")
+        return jsonify({'error': 'Email lookup failed'}), 500
+    finally:
+        conn.close()
+
+def parse_date_arg(name, default=None):
+    """Parse a YYYY-MM-DD query argument; raises ValueError when malformed"""
+    if name not in request.args:
+        return default
+    return datetime.strptime(request.args[name], '%Y-%m-%d').date()
+
+@app.route('/api/inventory/calendar')
+@tenant_required
+def api_inventory_calendar():
+    """Availability calendar sliced from the materialized inventory store"""
+    days = max(1, min(request.args.get('days', 365, type=int), 365))
+    try:
+        start_date = parse_date_arg('start')
+    except ValueError:
+        return jsonify({'error': 'start must be YYYY-MM-DD'}), 400
+    
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        calendar = get_calendar(conn, g.hotel_id, start_date, days)
+        return jsonify({'hotel_id': g.hotel_id, 'room_types': calendar})
+    except Exception as e:
+        logger.error(f"Inventory calendar error: {e}")
+        return jsonify({'error': 'Calendar lookup failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/channel/ari')
+@tenant_required
+def api_channel_ari():
+    """Availability and rates feed for channel-manager sync"""
+    days = max(1, min(request.args.get('days', 365, type=int), 365))
+    try:
+        start_date = parse_date_arg('start')
+    except ValueError:
+        return jsonify({'error': 'start must be YYYY-MM-DD'}), 400
+    
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        rows = get_channel_ari(conn, g.hotel_id, start_date, days)
+        return jsonify({'hotel_id': g.hotel_id, 'ari': rows})
+    except Exception as e:
+        logger.error(f"Channel ARI error: {e}")
+        return jsonify({'error': 'ARI lookup failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/widget/<subdomain>/availability')
+def api_widget_availability(subdomain):
+    """Public booking-widget availability for a stay"""
+    try:
+        check_in = parse_date_arg('check_in')
+        check_out = parse_date_arg('check_out')
+    except ValueError:
+        return jsonify({'error': 'check_in and check_out must be YYYY-MM-DD'}), 400
+    if not check_in or not check_out or check_out <= check_in:
+        return jsonify({'error': 'check_in and check_out are required and check_out must follow check_in'}), 400
+    
+    hotel = tenants.by_subdomain(subdomain)
+    if not hotel:
+        return jsonify({'error': 'Hotel not found'}), 404
+    
+    conn = get_tenant_connection(hotel['id'])
+    try:
+        availability = get_stay_availability(conn, hotel['id'], check_in, check_out)
+        return jsonify({
+            'check_in': check_in.isoformat(),
+            'check_out': check_out.isoformat(),
+            'currency': hotel['currency'],
+            'room_types': availability
+        })
+    except Exception as e:
+        logger.error(f"Widget availability error: {e}")
+        return jsonify({'error': 'Availability lookup failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/reservations', methods=['POST'])
+@tenant_required
+def api_create_reservation():
+    """Create a reservation; safe against overbooking and retried requests"""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'JSON body required'}), 400
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key and len(idempotency_key) > 255:
+        return jsonify({'error': 'Idempotency-Key is too long'}), 400
+    
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        reservation, replayed = create_reservation(
+            conn, g.hotel_id, payload, idempotency_key, g.tenant['currency'] if g.tenant else None
+        )
+        return jsonify({'reservation': reservation, 'replayed': replayed}), 200 if replayed else 201
+    except BookingError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        logger.error(f"Reservation error: {e}")
+        return jsonify({'error': 'Reservation failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/reservations/<confirmation_code>', methods=['PATCH'])
+@tenant_required
+def api_update_reservation(confirmation_code):
+    """Update reservation status (e.g. cancel) or guest details"""
+    changes = request.get_json(silent=True)
+    if not isinstance(changes, dict):
+        return jsonify({'error': 'JSON body required'}), 400
+    
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        reservation = update_reservation(conn, g.hotel_id, confirmation_code, changes)
+        return jsonify({'reservation': reservation})
+    except BookingError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        logger.error(f"Reservation update error: {e}")
+        return jsonify({'error': 'Reservation update failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/reservations/lookup')
+@tenant_required
+def api_lookup_reservations():
+    """Staff lookup by confirmation code, guest email or booking-date range"""
+    try:
+        booked_from = parse_date_arg('booked_from')
+        booked_to = parse_date_arg('booked_to')
+    except ValueError:
+        return jsonify({'error': 'booked_from and booked_to must be YYYY-MM-DD'}), 400
+    
+    conn = get_tenant_connection(g.hotel_id)
+    try:
+        if request.args.get('code'):
+            reservation = find_by_confirmation_code(conn, request.args['code'], g.hotel_id)
+            reservations = [reservation] if reservation else []
+        elif request.args.get('email'):
+            reservations = find_by_guest_email(conn, g.hotel_id, request.args['email'])
+        elif booked_from:
+            booked_to = booked_to or booked_from + timedelta(days=1)
+            reservations = find_by_booking_date(conn, g.hotel_id, booked_from, booked_to)
+        else:
+            return jsonify({'error': 'Provide code, email or booked_from'}), 400
+        return jsonify({'reservations': reservations, 'count': len(reservations)})
+    except Exception as e:
+        logger.error(f"Reservation lookup error: {e}")
+        return jsonify({'error': 'Lookup failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/guest/reservation')
+def api_guest_reservation():
+    """Guest self-service lookup; requires both confirmation code and email.
+
+    The hotel comes from its subdomain, or from the hotel parameter on the main domain;
+    it picks the shard and scopes the lookup, so a code never matches another tenant.
+    """
+    code = request.args.get('code', '')
+    email = request.args.get('email', '').strip().lower()
+    if not code or not email:
+        return jsonify({'error': 'code and email are required'}), 400
+    hotel = g.tenant or (tenants.by_subdomain(request.args['hotel']) if request.args.get('hotel') else None)
+    if hotel is None:
+        return jsonify({'error': 'hotel is required outside the hotel site'}), 400
+    
+    conn = get_tenant_connection(hotel['id'])
+    try:
+        reservation = find_by_confirmation_code(conn, code, hotel['id'])
+        if not reservation or reservation['guest_email'].strip().lower() != email:
+            return jsonify({'error': 'Reservation not found'}), 404
+        return jsonify({'reservation': reservation})
+    except Exception as e:
+        logger.error(f"Guest lookup error: {e}")
+        return jsonify({'error': 'Lookup failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/usage')
+@tenant_required
+def api_usage():
+    """Metered usage for a billing period (YYYY-MM, default current month)"""
+    period = request.args.get('period') or billing_period()
+    if not re.fullmatch(r'\d{4}-\d{2}', period):
+        return jsonify({'error': 'period must be YYYY-MM'}), 400
+    
+    conn = get_db_connection()
+    try:
+        usage = get_usage(conn, usage_meter, g.hotel_id, period)
+        return jsonify({
+            'hotel_id': g.hotel_id,
+            'period': period,
+            'subscription_plan': g.tenant['subscription_plan'] if g.tenant else None,
+            'usage': usage
+        })
+    except Exception as e:
+        logger.error(f"Usage lookup error: {e}")
+        return jsonify({'error': 'Usage lookup failed'}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/platform/overview')
+@platform_admin_required
+def api_platform_overview():
+    """Emails, reservations, revenue and AI latency for every hotel, in pages"""
+    after_id = request.args.get('after', 0, type=int)
+    limit = request.args.get('limit', OVERVIEW_PAGE_SIZE, type=int)
+    try:
+        overview = get_platform_overview(get_db_connection)
+        return jsonify(overview_page(overview, after_id, limit))
+    except Exception as e:
+        logger.error(f"Platform overview error: {e}")
+        return jsonify({'error': 'Platform overview failed'}), 500
+
+def create_app():
+    """Application factory: bring the schema up to date, then return the configured app"""
+    started = time.perf_counter()
+    migrated = bootstrap_database()
+    logger.info(
+        f"Schema {'migrated to' if migrated else 'already at'} version {SCHEMA_VERSION} "
+        f"({(time.perf_counter() - started) * 1000:.1f}ms)"
+    )
+    return app
+
+def reset_after_fork():
+    """Per-process state a forked worker must not share with the master (gunicorn post_fork)"""
+    # SQLite handles must not cross a fork; the worker opens its own on first use
+    shards.close_all()
+    usage_meter.discard()
+    readiness.invalidate()
+
+def warm_up_workers():
+    """Pre-fork warm-up for a preloading server: compiled templates, numpy and the tenant cache"""
+    shards.close_all()
+    return warm_up(app, tenants, modules=(lazy_import('numpy'),))
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file